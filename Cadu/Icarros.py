@@ -10,6 +10,9 @@ from tqdm import tqdm
 BASE_URL = "https://www.icarros.com.br"
 JSON_PATH = "data/icarros_dados_completos.json"
 SUPORTE_PATH = "data/versoes_processadas.json"
+# Arquivos append-only: cada linha é um registro JSON, gravado em O(1)
+MODELOS_JSONL_PATH = "data/icarros_modelos.jsonl"
+SUPORTE_JSONL_PATH = "data/versoes_processadas.jsonl"
 
 def get_html(url, retries=5, wait_range=(2, 5)):
     """
@@ -42,12 +45,12 @@ def get_html(url, retries=5, wait_range=(2, 5)):
 
 def resetar_suporte():
     """
-    Reseta o arquivo de suporte, criando um JSON vazio para versões processadas.
+    Reseta o arquivo de suporte, criando um log vazio para versões processadas.
     """
-    dados_iniciais = {"versoes": []}
-    with open(SUPORTE_PATH, "w", encoding="utf-8") as f:
-        json.dump(dados_iniciais, f, ensure_ascii=False, indent=4)
-    print(f"🧹 Arquivo {SUPORTE_PATH} resetado.")
+    open(SUPORTE_JSONL_PATH, "w", encoding="utf-8").close()
+    if os.path.exists(SUPORTE_PATH):
+        os.remove(SUPORTE_PATH)
+    print(f"🧹 Arquivo {SUPORTE_JSONL_PATH} resetado.")
 
 def inicializar_json_principal_e_suporte():
     """
@@ -66,33 +69,72 @@ def inicializar_json_principal_e_suporte():
         resetar_suporte()
     else:
         print(f"ℹ️ Arquivo {JSON_PATH} já existe. Não será resetado.")
-        if not os.path.exists(SUPORTE_PATH):
+        if not os.path.exists(SUPORTE_PATH) and not os.path.exists(SUPORTE_JSONL_PATH):
             resetar_suporte()
 
+def ler_jsonl(caminho):
+    """
+    Lê um arquivo JSONL linha a linha, ignorando linhas truncadas.
+
+    Args:
+        caminho (str): Caminho do arquivo JSONL.
+
+    Yields:
+        dict: Um registro por linha.
+    """
+    if not os.path.exists(caminho):
+        return
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                yield json.loads(linha)
+            except json.JSONDecodeError:
+                print(f"⚠️ Linha inválida ignorada em {caminho}")
+
+def acrescentar_jsonl(caminho, registro):
+    """
+    Acrescenta um registro ao final de um arquivo JSONL, sem reler o arquivo.
+
+    Args:
+        caminho (str): Caminho do arquivo JSONL.
+        registro (dict): Registro a ser gravado.
+    """
+    with open(caminho, "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
 def carregar_versoes_processadas():
     """
-    Carrega o JSON de suporte contendo as versões já processadas.
+    Carrega as versões já processadas em um conjunto indexado por (versão, URL).
+    Inclui o JSON de suporte legado, se existir, e o log JSONL.
 
     Returns:
-        dict: Dados do arquivo de suporte.
+        set: Pares (nome da versão, URL da ficha técnica) já processados.
     """
-    with open(SUPORTE_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def salvar_versao_processada(nome, url):
+    processadas = set()
+    if os.path.exists(SUPORTE_PATH):
+        with open(SUPORTE_PATH, "r", encoding="utf-8") as f:
+            for registro in json.load(f).get("versoes", []):
+                processadas.add((registro["versao"], registro["url"]))
+    for registro in ler_jsonl(SUPORTE_JSONL_PATH):
+        processadas.add((registro["versao"], registro["url"]))
+    return processadas
+
+def salvar_versao_processada(nome, url, processadas):
     """
     Salva uma nova versão processada no suporte.
 
     Args:
         nome (str): Nome da versão.
         url (str): URL da ficha técnica da versão.
+        processadas (set): Conjunto em memória das versões já processadas.
     """
-    dados = carregar_versoes_processadas()
-    registro = {"versao": nome, "url": url}
-    if registro not in dados["versoes"]:
-        dados["versoes"].append(registro)
-        with open(SUPORTE_PATH, "w", encoding="utf-8") as f:
-            json.dump(dados, f, ensure_ascii=False, indent=4)
+    chave = (nome, url)
+    if chave not in processadas:
+        acrescentar_jsonl(SUPORTE_JSONL_PATH, {"versao": nome, "url": url})
+        processadas.add(chave)
         print(f"✅ Versão '{nome}' registrada no suporte.")
     else:
         print(f"ℹ️ Versão '{nome}' já consta no suporte.")
@@ -188,22 +230,42 @@ def interpretar_td(td):
 
 def salvar_incremental(dado_modelo):
     """
-    Salva incrementalmente os dados de um modelo no JSON principal.
+    Salva incrementalmente os dados de um modelo no log JSONL de modelos.
+    O JSON principal é atualizado uma única vez por `consolidar_json_principal`.
 
     Args:
         dado_modelo (dict): Dados do modelo a serem salvos.
     """
+    acrescentar_jsonl(MODELOS_JSONL_PATH, dado_modelo)
+    print(f"✅ Modelo {dado_modelo['modelo']} salvo no log de modelos.")
+
+def consolidar_json_principal():
+    """
+    Incorpora ao JSON principal os modelos acumulados no log JSONL e esvazia o log.
+    Executado uma vez ao final (ou no início, para recuperar uma execução interrompida).
+
+    Returns:
+        int: Quantidade de modelos incorporados.
+    """
+    novos_modelos = list(ler_jsonl(MODELOS_JSONL_PATH))
+    if not novos_modelos:
+        return 0
+
     with open(JSON_PATH, "r", encoding="utf-8") as f:
         dados_existentes = json.load(f)
 
-    dados_existentes["dados"].append(dado_modelo)
+    dados_existentes["dados"].extend(novos_modelos)
     dados_existentes["total_modelos"] = len(dados_existentes["dados"])
-    dados_existentes["paginas_acessadas"] += 1
+    dados_existentes["paginas_acessadas"] += len(novos_modelos)
 
-    with open(JSON_PATH, "w", encoding="utf-8") as f:
+    caminho_tmp = JSON_PATH + ".tmp"
+    with open(caminho_tmp, "w", encoding="utf-8") as f:
         json.dump(dados_existentes, f, ensure_ascii=False, indent=4)
+    os.replace(caminho_tmp, JSON_PATH)
+    open(MODELOS_JSONL_PATH, "w", encoding="utf-8").close()
 
-    print(f"✅ Modelo {dado_modelo['modelo']} salvo no JSON principal.")
+    print(f"📚 {len(novos_modelos)} modelos incorporados ao JSON principal.")
+    return len(novos_modelos)
 
 def coletar_dados_completos(limit=None):
     """
@@ -213,7 +275,7 @@ def coletar_dados_completos(limit=None):
         limit (int, optional): Limite de modelos para coletar.
     """
     modelos_urls = coletar_links_modelos(limit)
-    suporte = carregar_versoes_processadas()
+    processadas = carregar_versoes_processadas()
 
     for url in modelos_urls:
         print(f"\n📦 Coletando modelo: {url}")
@@ -235,8 +297,7 @@ def coletar_dados_completos(limit=None):
             nome_versao = versao["versao"]
             url_ficha = versao["ficha_tecnica_url"]
 
-            registro = {"versao": nome_versao, "url": url_ficha}
-            if registro in suporte["versoes"]:
+            if (nome_versao, url_ficha) in processadas:
                 print(f"ℹ️ Versão '{nome_versao}' já processada. Ignorando...")
                 continue
 
@@ -275,8 +336,7 @@ def coletar_dados_completos(limit=None):
 
             versao["ficha_tecnica"] = secoes
             novas_versoes.append(versao)
-            salvar_versao_processada(nome_versao, url_ficha)
-            suporte["versoes"].append(registro)
+            salvar_versao_processada(nome_versao, url_ficha, processadas)
 
             time.sleep(random.uniform(0.5, 1.5))
 
@@ -299,6 +359,10 @@ if __name__ == "__main__":
         os.makedirs("data")
 
     inicializar_json_principal_e_suporte()
-    coletar_dados_completos(limit=None)
+    consolidar_json_principal()
+    try:
+        coletar_dados_completos(limit=None)
+    finally:
+        consolidar_json_principal()
 
     print(f"✅ Coleta finalizada. Arquivo principal salvo em: {JSON_PATH}")
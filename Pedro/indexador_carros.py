@@ -1,25 +1,18 @@
 import json
+import os
 import re
 import string
 from collections import defaultdict
 import nltk
 from nltk.corpus import stopwords
-from nltk.stem import RSLPStemmer
+
+from tfidf_seminovos import construir_artefatos
+from preprocessamento_lote import preprocessar_lote
 
 # Baixar recursos necessários (se ainda não tiver)
 nltk.download("stopwords")
 
 stop_words = set(stopwords.words("portuguese"))
-stemmer = RSLPStemmer()
-
-# Função de limpeza e pré-processamento de texto
-def clean_text(text):
-    text = text.lower()
-    text = re.sub(f"[{re.escape(string.punctuation)}]", " ", text)
-    tokens = re.findall(r'\b\w+\b', text)  
-    tokens = [t for t in tokens if t not in stop_words and len(t) > 2]
-    stems = [stemmer.stem(token) for token in tokens]
-    return stems
 
 # Carregando os dados do JSON
 with open("data/carros_seminovos_com_detalhes.json", "r", encoding="utf-8") as f:
@@ -29,20 +22,29 @@ inverted_index = defaultdict(set)
 doc_id_map = {}
 doc_counter = 0
 
-# Construção do índice e metadados
-for carro in carros:
-    doc_id = f"doc_{doc_counter}"
-    doc_counter += 1
-
-    texto = " ".join([
+textos = [
+    " ".join([
         carro.get("titulo", ""),
         carro.get("descricao", ""),
         carro.get("preco", ""),
         carro.get("anunciante", ""),
         " ".join(f"{k} {v}" for k, v in carro.get("detalhes", {}).items())
     ])
+    for carro in carros
+]
+
+# Pré-processamento em lote (mesmo resultado de clean_text, com stemming por palavra distinta)
+termos_por_carro = preprocessar_lote(
+    textos, stemmer="rslp", stop_words=stop_words,
+    limpeza=f"[{re.escape(string.punctuation)}]", substituto=" ",
+    padrao_token=r"\b\w+\b", tamanho_minimo=3,
+)
+
+# Construção do índice e metadados
+for carro, termos in zip(carros, termos_por_carro):
+    doc_id = f"doc_{doc_counter}"
+    doc_counter += 1
 
-    termos = clean_text(texto)
     for termo in termos:
         inverted_index[termo].add(doc_id)
 
@@ -65,4 +67,9 @@ with open("indice_invertido.json", "w", encoding="utf-8") as f:
 with open("metadados_documentos.json", "w", encoding="utf-8") as f:
     json.dump(doc_id_map, f, ensure_ascii=False, indent=2)
 
+# Artefatos TF-IDF do buscador_seminovos.py (matriz CSR + vocabulário/IDF)
+tempo_tfidf = construir_artefatos(documentos=list(doc_id_map.values()))
+
 print("✅ Índice invertido e metadados salvos com sucesso.")
+print(f"🧮 Artefatos TF-IDF gravados em {tempo_tfidf:.2f} s")
+print(f"📦 indice_invertido.json: {os.path.getsize('indice_invertido.json') / 1024:.2f} KB")
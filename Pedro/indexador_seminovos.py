@@ -1,6 +1,7 @@
 import json
 import pandas as pd
 import re
+import os
 import time
 import sys
 from collections import defaultdict
@@ -10,6 +11,11 @@ from nltk.corpus import stopwords
 from nltk.stem.snowball import SnowballStemmer
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+# bitmaps.py é o de aleks/ (no container, o Dockerfile o copia para junto deste arquivo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aleks"))
+from bitmaps import IndiceBitmap, OPERADORES
+from preprocessamento_lote import preprocessar_lote
+
 # Baixar recursos do NLTK
 nltk.download('stopwords')
 
@@ -37,7 +43,7 @@ df = pd.DataFrame(data)
 
 # Texto base para representação vetorial
 df['texto'] = df[CAMPO_BUSCA].apply(lambda x: ' '.join(map(str, x)), axis=1)
-df['tokens'] = df['texto'].apply(preprocess)
+df['tokens'] = preprocessar_lote(df['texto'], stemmer='snowball', stop_words=stop_words)
 df['texto_limpo'] = df['tokens'].apply(lambda tokens: ' '.join(tokens))
 
 # --- TF-IDF Vetorização ---
@@ -61,6 +67,9 @@ for idx, tokens in enumerate(df['tokens']):
     for token in tokens:
         inverted_index[token].add(idx)
 
+# Postings como bitmaps sobre o índice da linha no DataFrame
+indice_bitmap = IndiceBitmap.construir(inverted_index.items(), [str(i) for i in range(len(df))])
+
 end_inv = time.time()
 print(f"Indexação concluída em {end_inv - start_inv:.2f} segundos")
 print(f"Tamanho do índice: {len(inverted_index)} termos")
@@ -71,27 +80,50 @@ df_export = df[['titulo', 'descricao', 'preco', 'tokens', 'texto_limpo']]
 df_export.to_json(OUTPUT_JSON, orient='records', force_ascii=False, indent=2)
 print(f"\nDados limpos exportados para '{OUTPUT_JSON}' com sucesso.")
 
-# --- Busca interativa (AND) ---
+# --- Busca interativa (AND por padrão, aceita AND/OR/NOT e parênteses) ---
+def remover_operandos_vazios(tokens):
+    # Palavras que só tinham stopwords somem no pré-processamento: tira os operadores
+    # que ficaram sem operando e os parênteses vazios, em vez de deixar a consulta inválida
+    tokens = list(tokens)
+    mudou = True
+    while mudou:
+        mudou = False
+        for i, token in enumerate(tokens):
+            anterior = tokens[i - 1] if i else None
+            seguinte = tokens[i + 1] if i + 1 < len(tokens) else None
+            sem_direita = seguinte in (None, ')', 'AND', 'OR')
+            if token in ('AND', 'OR') and (sem_direita or anterior in (None, '(', 'AND', 'OR', 'NOT')):
+                del tokens[i]
+            elif token == 'NOT' and sem_direita:
+                del tokens[i]
+            elif token == '(' and seguinte == ')':
+                del tokens[i:i + 2]
+            else:
+                continue
+            mudou = True
+            break
+    return tokens
+
+def preparar_consulta(consulta):
+    # Pré-processa só as palavras; operadores e parênteses ficam como estão
+    tokens = []
+    for parte in re.findall(r'\(|\)|[^\s()]+', consulta):
+        tokens.extend([parte] if parte in OPERADORES or parte in '()' else preprocess(parte))
+    return ' '.join(remover_operandos_vazios(tokens))
+
 print("\nDigite termos para buscar veículos (digite 'sair' para encerrar):")
 while True:
     consulta = input("> ")
     if consulta.lower() in ('sair', 'exit', 'q'):
         break
 
-    tokens_consulta = preprocess(consulta)
-    resultados = None
-
-    for token in tokens_consulta:
-        if token in inverted_index:
-            if resultados is None:
-                resultados = inverted_index[token].copy()
-            else:
-                resultados &= inverted_index[token]
-        else:
-            resultados = set()
-            break
+    try:
+        resultados = indice_bitmap.consultar(preparar_consulta(consulta)).docs()
+    except ValueError as e:
+        print(f"⚠️ {e}")
+        continue
 
-    if resultados:
+    if len(resultados):
         print(f"\n{len(resultados)} resultados encontrados:")
         for i in resultados:
             print(f"- {df.iloc[i]['titulo']} | {df.iloc[i]['descricao']} | {df.iloc[i]['preco']}")
@@ -0,0 +1,75 @@
+# Pré-processamento em lote para os indexadores de seminovos
+#
+# Em vez de limpar e fazer o stemming linha a linha (df.apply), o texto é
+# tratado com operações vetorizadas do pandas (lower, replace, split) e o
+# stemmer roda uma única vez por palavra distinta do vocabulário; o resultado
+# volta para cada documento por dicionário. Arquivos grandes são divididos em
+# chunks processados em paralelo.
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from nltk.stem import RSLPStemmer
+from nltk.stem.snowball import SnowballStemmer
+
+TAMANHO_CHUNK = 20000   # documentos por chunk (e mínimo p/ usar processos)
+PROCESSOS = os.cpu_count() or 1
+
+# Um stemmer (e um cache de stems) por processo
+_stemmers = {}
+_cache_stems = {}
+
+def _obter_stemmer(nome):
+    if nome not in _stemmers:
+        _stemmers[nome] = RSLPStemmer() if nome == "rslp" else SnowballStemmer("portuguese")
+        _cache_stems[nome] = {}
+    return _stemmers[nome], _cache_stems[nome]
+
+def _preprocessar_chunk(textos, stemmer, stop_words, limpeza, substituto, padrao_token, tamanho_minimo):
+    serie = pd.Series(textos, dtype=object).fillna("").astype(str).str.lower()
+    serie = serie.str.replace(limpeza, substituto, regex=True)
+    tokens = serie.str.findall(padrao_token) if padrao_token else serie.str.split()
+
+    # Uma linha por token, com o índice do documento de origem
+    explodido = tokens.explode().dropna()
+    explodido = explodido[~explodido.isin(stop_words)]
+    if tamanho_minimo:
+        explodido = explodido[explodido.str.len() >= tamanho_minimo]
+
+    # Stemming só do vocabulário distinto
+    stem, cache = _obter_stemmer(stemmer)
+    for palavra in explodido.unique():
+        if palavra not in cache:
+            cache[palavra] = stem.stem(palavra)
+    stems = explodido.map(cache)
+
+    # explode mantém a ordem: os tokens de cada documento são uma fatia contígua
+    docs = stems.index.to_numpy()
+    valores = stems.to_numpy()
+    limites = np.searchsorted(docs, np.arange(len(textos) + 1))
+    return [valores[limites[i]:limites[i + 1]].tolist() for i in range(len(textos))]
+
+def preprocessar_lote(textos, stemmer="snowball", stop_words=(), limpeza=r"[^a-zà-ú0-9\s]", substituto="",
+                      padrao_token=None, tamanho_minimo=0, processos=PROCESSOS, tamanho_chunk=TAMANHO_CHUNK):
+    """
+    Lista de tokens (stems) de cada texto, na ordem de entrada.
+
+    Args:
+        textos: Sequência de textos (lista ou Series).
+        stemmer (str): "snowball" ou "rslp".
+        stop_words: Palavras removidas antes do stemming.
+        limpeza (str): Regex dos caracteres trocados por `substituto`.
+        padrao_token (str): Regex dos tokens (findall); None = separar por espaços.
+        tamanho_minimo (int): Descarta tokens menores que isso.
+        processos (int): Processos usados quando há mais de um chunk.
+    """
+    textos = list(textos)
+    stop_words = set(stop_words)
+    args = (stemmer, stop_words, limpeza, substituto, padrao_token, tamanho_minimo)
+    chunks = [textos[i:i + tamanho_chunk] for i in range(0, len(textos), tamanho_chunk)]
+    if processos <= 1 or len(chunks) <= 1:
+        return [tokens for chunk in chunks for tokens in _preprocessar_chunk(chunk, *args)]
+    with ProcessPoolExecutor(max_workers=min(processos, len(chunks))) as executor:
+        partes = executor.map(_preprocessar_chunk, chunks, *([a] * len(chunks) for a in args))
+        return [tokens for parte in partes for tokens in parte]
@@ -0,0 +1,132 @@
+# Artefatos TF-IDF do buscador de seminovos
+#
+# O ajuste do TfidfVectorizer é feito uma vez (no indexador) e gravado em disco:
+#   - tfidf_matriz.npz ........ matriz documentos x termos (CSR, linhas normalizadas L2)
+#   - tfidf_vocabulario.json .. termos na ordem das colunas + vetor IDF
+# O buscador só carrega esses arquivos e pontua a consulta pelo produto esparso
+# restrito às colunas dos termos da consulta.
+#
+# Uso: python tfidf_seminovos.py   (regrava os artefatos a partir de metadados_documentos.json)
+import json
+import os
+import re
+import time
+
+import numpy as np
+from scipy import sparse
+
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem.snowball import SnowballStemmer
+
+from preprocessamento_lote import preprocessar_lote
+
+# Baixar stopwords se necessário
+nltk.download('stopwords', quiet=True)
+
+# CONFIG
+ARQUIVO_JSON = 'metadados_documentos.json'
+ARQUIVO_MATRIZ = 'tfidf_matriz.npz'
+ARQUIVO_VOCABULARIO = 'tfidf_vocabulario.json'
+CAMPO_BUSCA = ['titulo', 'descricao', 'preco', 'anunciante']
+MAX_FEATURES = 1000
+# Mesmo padrão de tokens do TfidfVectorizer (palavras com 2+ caracteres)
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Pré-processamento (consulta; os documentos usam a versão em lote, com o mesmo resultado)
+stop_words = set(stopwords.words('portuguese'))
+stemmer = SnowballStemmer("portuguese")
+
+def preprocess(texto):
+    texto = texto.lower()
+    texto = re.sub(r'[^a-zà-ú0-9\s]', '', texto)
+    tokens = texto.split()
+    tokens = [stemmer.stem(t) for t in tokens if t not in stop_words]
+    return tokens
+
+def carregar_documentos(caminho=ARQUIVO_JSON):
+    """Lista de documentos (dicts) na mesma ordem das linhas da matriz."""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = list(data.values())
+    return data
+
+def texto_documento(doc):
+    return ' '.join(str(doc.get(campo, '')) for campo in CAMPO_BUSCA)
+
+def construir_artefatos(caminho_json=ARQUIVO_JSON, documentos=None):
+    """Ajusta o TF-IDF e grava matriz + vocabulário/IDF. Retorna o tempo gasto."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    inicio = time.time()
+    if documentos is None:
+        documentos = carregar_documentos(caminho_json)
+    tokens = preprocessar_lote([texto_documento(doc) for doc in documentos], stemmer='snowball', stop_words=stop_words)
+    textos = [' '.join(t) for t in tokens]
+
+    vectorizer = TfidfVectorizer(max_features=MAX_FEATURES)
+    X = vectorizer.fit_transform(textos).tocsr()
+
+    termos = vectorizer.get_feature_names_out().tolist()
+    sparse.save_npz(ARQUIVO_MATRIZ, X)
+    with open(ARQUIVO_VOCABULARIO, 'w', encoding='utf-8') as f:
+        json.dump({'termos': termos, 'idf': vectorizer.idf_.tolist(), 'campos': CAMPO_BUSCA,
+                   'origem': os.path.basename(caminho_json)}, f, ensure_ascii=False)
+    return time.time() - inicio
+
+def artefatos_atualizados(caminho_json=ARQUIVO_JSON):
+    """Artefatos existem e são mais novos que o JSON de origem."""
+    if not (os.path.exists(ARQUIVO_MATRIZ) and os.path.exists(ARQUIVO_VOCABULARIO)):
+        return False
+    origem = os.path.getmtime(caminho_json)
+    return min(os.path.getmtime(ARQUIVO_MATRIZ), os.path.getmtime(ARQUIVO_VOCABULARIO)) >= origem
+
+class IndiceTfidf:
+    def __init__(self, X, termos, idf):
+        # Colunas contíguas (CSC): a consulta só lê as colunas dos seus termos
+        self.X = X.tocsc()
+        self.vocabulario = {t: i for i, t in enumerate(termos)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+
+    @classmethod
+    def carregar(cls):
+        X = sparse.load_npz(ARQUIVO_MATRIZ)
+        with open(ARQUIVO_VOCABULARIO, 'r', encoding='utf-8') as f:
+            vocab = json.load(f)
+        return cls(X, vocab['termos'], vocab['idf'])
+
+    @classmethod
+    def carregar_ou_construir(cls, caminho_json=ARQUIVO_JSON):
+        if not artefatos_atualizados(caminho_json):
+            construir_artefatos(caminho_json)
+        return cls.carregar()
+
+    def vetor_consulta(self, query):
+        """(colunas, pesos) da consulta: tf x idf normalizado L2, igual ao vectorizer.transform."""
+        contagem = {}
+        for token in TOKEN_PATTERN.findall(' '.join(preprocess(query))):
+            col = self.vocabulario.get(token)
+            if col is not None:
+                contagem[col] = contagem.get(col, 0) + 1
+        if not contagem:
+            return None, None
+        cols = np.fromiter(contagem.keys(), dtype=np.int64, count=len(contagem))
+        pesos = np.fromiter(contagem.values(), dtype=np.float64, count=len(contagem)) * self.idf[cols]
+        return cols, pesos / np.linalg.norm(pesos)
+
+    def buscar(self, query, top_k=5):
+        cols, pesos = self.vetor_consulta(query)
+        if cols is None:
+            return []
+        # Cosseno = produto escalar (linhas da matriz já normalizadas), só nas colunas da consulta
+        scores = self.X[:, cols] @ pesos
+        candidatos = np.flatnonzero(scores > 0)
+        if len(candidatos) > top_k:
+            candidatos = candidatos[np.argpartition(-scores[candidatos], top_k - 1)[:top_k]]
+        candidatos = candidatos[np.argsort(-scores[candidatos], kind='stable')]
+        return [(int(i), float(scores[i])) for i in candidatos]
+
+if __name__ == '__main__':
+    tempo = construir_artefatos()
+    print(f"✅ Artefatos TF-IDF gravados em {ARQUIVO_MATRIZ} e {ARQUIVO_VOCABULARIO} ({tempo:.2f} s)")
@@ -6,36 +6,124 @@ from bs4 import BeautifulSoup
 import time
 import json
 import random
+import os
+import sys
+import queue
+import signal
+import argparse
+import collections
+import multiprocessing
+import multiprocessing.connection
+from contextlib import contextmanager
 
 # Variável global para contar as páginas coletadas (escala)
 pages_collected = 0
 
+# Configuração do pool de navegadores
+POOL_SIZE = 1                  # nº de instâncias do Chrome mantidas abertas
+MAX_PAGINAS_POR_BROWSER = 50   # recicla o navegador após esse nº de páginas
+
+# Coleta paralela por modelo (cada processo tem seu próprio navegador)
+NUM_WORKERS = 4
+ARQUIVO_SAIDA_COMPLETO = "data/results_webmotors_full_content.json"
+ARQUIVO_CHECKPOINT = "data/checkpoint_modelos.jsonl"   # 1 linha por modelo concluído
+ARQUIVO_CHECKPOINT_JOBS = "data/checkpoint_jobs.json"   # marcas e modelos já listados
+SALVAR_A_CADA = 20                                      # regrava o JSON final a cada N modelos
+ESPERA_RESULTADO = 30       # s sem resultado até conferir se algum worker morreu
+TENTATIVAS_POR_JOB = 2      # vezes que um modelo volta à fila quando o worker morre com ele
+
 # Exceção personalizada para acesso negado
 class AccessDeniedException(Exception):
     pass
 
-def get_html(url, headless=True, retries=3, wait_range=(8, 12)):
+class BrowserPool:
+    """
+    Pool de instâncias do undetected-chromedriver reaproveitadas entre páginas.
+    Cada instância é reciclada (fechada e recriada sob demanda) após
+    `max_paginas` páginas ou quando ocorre qualquer erro durante o uso.
+    """
+    def __init__(self, tamanho=POOL_SIZE, headless=True, max_paginas=MAX_PAGINAS_POR_BROWSER):
+        self.headless = headless
+        self.max_paginas = max_paginas
+        self.slots = [{"driver": None, "paginas": 0} for _ in range(tamanho)]
+        self.livres = queue.Queue()
+        for slot in self.slots:
+            self.livres.put(slot)
+
+    def _novo_driver(self):
+        options = uc.ChromeOptions()
+        options.headless = self.headless
+        return uc.Chrome(options=options)
+
+    def _descartar(self, slot):
+        if slot["driver"] is not None:
+            try:
+                slot["driver"].quit()
+            except Exception:
+                pass
+        slot["driver"], slot["paginas"] = None, 0
+
+    @contextmanager
+    def emprestar(self):
+        """Empresta um driver do pool, criando-o na primeira utilização."""
+        slot = self.livres.get()
+        try:
+            if slot["driver"] is None:
+                slot["driver"] = self._novo_driver()
+            yield slot["driver"]
+            slot["paginas"] += 1
+            if slot["paginas"] >= self.max_paginas:
+                self._descartar(slot)
+        except Exception:
+            # navegador possivelmente travado/bloqueado: recria na próxima vez
+            self._descartar(slot)
+            raise
+        finally:
+            self.livres.put(slot)
+
+    def fechar(self):
+        """Encerra todas as instâncias abertas."""
+        for slot in self.slots:
+            self._descartar(slot)
+
+_pool = None
+
+def get_pool(headless=True, tamanho=POOL_SIZE):
+    """Retorna o pool global de navegadores, criando-o (com `tamanho` instâncias) na primeira chamada."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool(tamanho=tamanho, headless=headless)
+    return _pool
+
+def fechar_pool():
+    global _pool
+    if _pool is not None:
+        _pool.fechar()
+        _pool = None
+
+def get_html(url, headless=True, retries=3, wait_range=(8, 12), pool=None):
     """
     Obtém o HTML da página especificada, implementando um mecanismo de retry
     em caso de "Access Denied" ou outros erros.
+    O navegador é emprestado do pool (reaproveitado entre páginas) em vez de
+    ser aberto e fechado a cada URL.
     Incrementa o contador global de páginas coletadas para medir a escala.
     """
     global pages_collected
+    pool = pool or get_pool(headless)
     attempt = 0
     while attempt < retries:
-        options = uc.ChromeOptions()
-        options.headless = headless
-        driver = uc.Chrome(options=options)
         try:
-            driver.get(url)
-            # Aguarda um tempo aleatório para simular comportamento humano
-            time.sleep(random.uniform(*wait_range))
-            html = driver.page_source
-            pages_collected += 1
-            # Verifica se a página indica acesso negado
-            if "Access Denied" in html or "acesso negado" in html:
-                raise AccessDeniedException("Access Denied ao acessar: " + url)
-            return html
+            with pool.emprestar() as driver:
+                driver.get(url)
+                # Aguarda um tempo aleatório para simular comportamento humano
+                time.sleep(random.uniform(*wait_range))
+                html = driver.page_source
+                pages_collected += 1
+                # Verifica se a página indica acesso negado
+                if "Access Denied" in html or "acesso negado" in html:
+                    raise AccessDeniedException("Access Denied ao acessar: " + url)
+                return html
         except AccessDeniedException as ade:
             print(f"Tentativa {attempt+1} de {retries} falhou com Access Denied para {url}. Retentando...")
             attempt += 1
@@ -44,8 +132,6 @@ def get_html(url, headless=True, retries=3, wait_range=(8, 12)):
             print(f"Tentativa {attempt+1} de {retries} falhou com erro: {str(e)}. Retentando...")
             attempt += 1
             time.sleep(random.uniform(5, 10))
-        finally:
-            driver.quit()
     raise AccessDeniedException("Todas as tentativas falharam para a URL: " + url)
 
 def coletar_marcas():
@@ -99,13 +185,13 @@ def coletar_marcas():
     
     return dados_marcas
 
-def coletar_anos_e_precos(url):
+def coletar_anos_e_precos(url, pool=None):
     """
     Coleta os anos disponíveis e os preços para um determinado modelo.
     Na página do modelo, as informações de ano e preço já aparecem juntas.
     Retorna uma lista de dicionários com o ano, a URL associada e o preço.
     """
-    html = get_html(url, headless=True, retries=3)
+    html = get_html(url, headless=True, retries=3, pool=pool)
     soup = BeautifulSoup(html, 'html.parser')
     
     cards_div = soup.find("div", class_="cards-list")
@@ -131,33 +217,38 @@ def coletar_anos_e_precos(url):
     
     return anos
 
-def coletar_carros_por_marca(url):
+def coletar_modelos_da_marca(url, pool=None):
     """
-    Coleta os modelos de carros para uma marca específica.
-    Na página da marca, extrai os modelos (nome e URL) e, para cada modelo,
-    coleta os anos disponíveis e os preços correspondentes.
-    Retorna uma lista de dicionários com os dados do modelo e suas informações.
+    Extrai apenas a lista de modelos (nome e URL) da página de uma marca.
     """
-    html = get_html(url, headless=True, retries=3)
+    html = get_html(url, headless=True, retries=3, pool=pool)
     soup = BeautifulSoup(html, 'html.parser')
-    modelos = soup.find_all("li", class_="brand-items__item")
     
-    carros = []
-    for modelo in modelos:
+    modelos = []
+    for modelo in soup.find_all("li", class_="brand-items__item"):
         nome_tag = modelo.find("h3", class_="brand-items__label")
         link = modelo.find("a")
-        
-        carro = {
+        modelos.append({
             "modelo": nome_tag.get_text(strip=True) if nome_tag else "N/D",
             "url": link["href"] if link and link.has_attr("href") else "N/D",
-        }
-        
+        })
+    return modelos
+
+def coletar_carros_por_marca(url, pool=None):
+    """
+    Coleta os modelos de carros para uma marca específica.
+    Na página da marca, extrai os modelos (nome e URL) e, para cada modelo,
+    coleta os anos disponíveis e os preços correspondentes.
+    Retorna uma lista de dicionários com os dados do modelo e suas informações.
+    """
+    carros = []
+    for carro in coletar_modelos_da_marca(url, pool=pool):
         if carro["url"] != "N/D":
             print(f"  Coletando anos e preços para o modelo: {carro['modelo']}")
-            carro["anos_e_precos"] = coletar_anos_e_precos(carro["url"])
+            carro["anos"] = coletar_anos_e_precos(carro["url"], pool=pool)
             time.sleep(random.uniform(3, 6))
         else:
-            carro["anos_e_precos"] = []
+            carro["anos"] = []
         
         carros.append(carro)
     
@@ -169,7 +260,8 @@ def coletar_dados_completos():
     1. Coleta todas as marcas (clicando em "Ver todas as marcas").
     2. Para cada marca, coleta os modelos disponíveis.
     3. Para cada modelo, coleta os anos disponíveis e os preços.
-    Retorna um dicionário com os metadados de escala e os dados coletados.
+    Retorna a lista de marcas, cada uma com seus "carros", no mesmo formato
+    de `montar_resultado` (versão paralela).
     """
     marcas = coletar_marcas()
     if not marcas:
@@ -178,28 +270,224 @@ def coletar_dados_completos():
     dados_completos = []
     for marca in marcas:
         print(f"Coletando modelos para a marca: {marca['marca']}")
-        modelos = coletar_carros_por_marca(marca["url"])
-        marca["modelos"] = modelos
+        marca["carros"] = coletar_carros_por_marca(marca["url"])
         dados_completos.append(marca)
         time.sleep(random.uniform(3, 6))
     
     return dados_completos
 
+# ---------------------- coleta paralela por modelo ----------------------
+def _worker(conexao):
+    """Processo worker: recebe modelos pelo pipe e coleta com 1 navegador próprio, fechado no finally."""
+    # terminate() manda SIGTERM, que mataria o processo sem passar pelo finally (e o Chrome ficaria aberto)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(1))
+    try:
+        get_pool(headless=True, tamanho=1)
+        for job in iter(conexao.recv, None):
+            conexao.send(_coletar_modelo(job))
+    finally:
+        fechar_pool()
+
+def _coletar_modelo(job):
+    """Executado no worker: coleta anos/preços de um (marca, modelo)."""
+    paginas_antes = pages_collected
+    try:
+        job["anos"] = coletar_anos_e_precos(job["url"])
+        job["erro"] = None
+    except Exception as e:
+        job["anos"], job["erro"] = [], str(e)
+    job["paginas"] = pages_collected - paginas_antes
+    time.sleep(random.uniform(3, 6))
+    return job
+
+def carregar_checkpoint(caminho=ARQUIVO_CHECKPOINT):
+    """Lê os modelos já concluídos (JSONL), tolerando uma última linha truncada."""
+    concluidos = {}
+    if os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    job = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue
+                concluidos[job["url"]] = job
+    return concluidos
+
+def carregar_checkpoint_jobs(caminho=ARQUIVO_CHECKPOINT_JOBS):
+    """Marcas e modelos por marca já listados numa execução anterior (ou vazio)."""
+    if os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    return {"marcas": [], "modelos": {}}
+
+def salvar_checkpoint_jobs(checkpoint, caminho=ARQUIVO_CHECKPOINT_JOBS):
+    tmp = caminho + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp, caminho)
+
+def montar_resultado(marcas, concluidos, paginas):
+    """Agrupa os modelos concluídos por marca no formato de results_webmotors_full_content.json."""
+    por_marca = {}
+    for job in concluidos.values():
+        por_marca.setdefault(job["marca_url"], []).append(
+            {"modelo": job["modelo"], "url": job["url"], "anos": job["anos"]})
+    dados = [{"marca": m["marca"], "url": m["url"], "logo": m["logo"],
+              "carros": por_marca.get(m["url"], [])} for m in marcas]
+    return {"meta": {"paginas_coletadas": paginas}, "dados": dados}
+
+def salvar_resultado(resultado, caminho=ARQUIVO_SAIDA_COMPLETO):
+    tmp = caminho + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=4)
+    os.replace(tmp, caminho)
+
+def coletar_dados_completos_paralelo(num_workers=NUM_WORKERS):
+    """
+    Versão paralela de `coletar_dados_completos`:
+    1. Coleta as marcas e, para cada uma, a lista de modelos (processo principal).
+       As listas ficam em checkpoint_jobs.json e não são refeitas ao retomar.
+    2. Entrega os jobs (marca, modelo), um por vez, a `num_workers` processos
+       por pipes, cada um com seu próprio navegador (fechado pelo próprio
+       worker ao terminar, inclusive quando a coleta é interrompida).
+       Um worker que morre é substituído e o modelo que ele coletava volta à
+       fila (até TENTATIVAS_POR_JOB vezes, depois conta como falha).
+    3. Cada modelo concluído é anexado ao checkpoint e mesclado ao JSON final;
+       numa nova execução os modelos do checkpoint são pulados.
+    """
+    os.makedirs(os.path.dirname(ARQUIVO_CHECKPOINT), exist_ok=True)
+    checkpoint_jobs = carregar_checkpoint_jobs()
+    if not checkpoint_jobs["marcas"]:
+        checkpoint_jobs["marcas"] = coletar_marcas()
+        salvar_checkpoint_jobs(checkpoint_jobs)
+    marcas = checkpoint_jobs["marcas"]
+    if not marcas:
+        return {}
+    
+    concluidos = carregar_checkpoint()
+    print(f"Checkpoint: {len(concluidos)} modelos já concluídos.")
+    
+    jobs = []
+    for marca in marcas:
+        if marca["url"] not in checkpoint_jobs["modelos"]:
+            print(f"Listando modelos da marca: {marca['marca']}")
+            checkpoint_jobs["modelos"][marca["url"]] = coletar_modelos_da_marca(marca["url"])
+            salvar_checkpoint_jobs(checkpoint_jobs)
+        for carro in checkpoint_jobs["modelos"][marca["url"]]:
+            if carro["url"] != "N/D" and carro["url"] not in concluidos:
+                jobs.append({"marca": marca["marca"], "marca_url": marca["url"], **carro})
+    fechar_pool()   # o navegador do processo principal não é mais necessário
+    print(f"{len(jobs)} modelos na fila para {num_workers} workers.")
+    
+    paginas = pages_collected
+    fila = collections.deque(jobs)
+    pendentes = {job["url"]: job for job in jobs}
+    tentativas = dict.fromkeys(pendentes, 0)
+    # 1 pipe por worker: o processo principal sabe qual modelo cada um está coletando
+    workers = {}                   # conexão -> [processo, job em coleta ou None]
+    
+    def iniciar_worker():
+        conexao, conexao_worker = multiprocessing.Pipe()
+        processo = multiprocessing.Process(target=_worker, args=(conexao_worker,))
+        processo.start()
+        conexao_worker.close()     # sem a cópia do principal, a morte do worker vira EOFError no recv
+        workers[conexao] = [processo, None]
+    
+    feitos = 0
+    def registrar_falha(job, motivo):
+        nonlocal feitos
+        pendentes.pop(job["url"], None)
+        feitos += 1
+        print(f"  [{feitos}/{len(jobs)}] falhou ({motivo}): {job['marca']} {job['modelo']}")
+    
+    def worker_morreu(conexao):
+        """Troca o worker morto e devolve à fila o modelo que ele coletava (ou desiste dele)."""
+        processo, job = workers.pop(conexao)
+        processo.join()
+        conexao.close()
+        print(f"  worker {processo.pid} morreu (exitcode {processo.exitcode}); iniciando outro")
+        if job is not None:
+            tentativas[job["url"]] += 1
+            if tentativas[job["url"]] < TENTATIVAS_POR_JOB:
+                fila.appendleft(job)
+            else:
+                registrar_falha(job, "worker morreu")
+        iniciar_worker()
+    
+    for _ in range(num_workers):
+        iniciar_worker()
+    try:
+        with open(ARQUIVO_CHECKPOINT, "a", encoding="utf-8") as ckpt:
+            while pendentes:
+                for conexao, estado in list(workers.items()):
+                    if estado[1] is None and fila:
+                        estado[1] = fila.popleft()
+                        conexao.send(estado[1])
+                # espera com timeout: um worker que morre não deixa o principal bloqueado
+                prontas = multiprocessing.connection.wait(list(workers), timeout=ESPERA_RESULTADO)
+                if not prontas:
+                    for conexao, (processo, _) in list(workers.items()):
+                        if not processo.is_alive():
+                            worker_morreu(conexao)
+                    continue
+                for conexao in prontas:
+                    try:
+                        job = conexao.recv()
+                    except (EOFError, OSError):
+                        worker_morreu(conexao)
+                        continue
+                    workers[conexao][1] = None
+                    paginas += job.pop("paginas")
+                    if job.pop("erro"):
+                        registrar_falha(job, "erro")
+                        continue
+                    pendentes.pop(job["url"], None)
+                    feitos += 1
+                    ckpt.write(json.dumps(job, ensure_ascii=False) + "\n")
+                    ckpt.flush()
+                    concluidos[job["url"]] = job
+                    print(f"  [{feitos}/{len(jobs)}] {job['marca']} {job['modelo']}: {len(job['anos'])} anos")
+                    if feitos % SALVAR_A_CADA == 0:
+                        salvar_resultado(montar_resultado(marcas, concluidos, paginas))
+        for conexao in workers:
+            conexao.send(None)     # None: fim da fila para cada worker
+    finally:
+        for processo, _ in workers.values():
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()   # só sobra worker vivo se a coleta foi interrompida
+                processo.join()
+    
+    resultado = montar_resultado(marcas, concluidos, paginas)
+    salvar_resultado(resultado)
+    print(f"Dados salvos em {ARQUIVO_SAIDA_COMPLETO}")
+    return resultado
+
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-w", "--workers", type=int, default=1,
+                    help="nº de processos para a coleta por modelo (1 = sequencial)")
+    ap.add_argument("-n", "--navegadores", type=int, default=POOL_SIZE,
+                    help="nº de instâncias do Chrome no pool do processo principal (cada worker usa 1)")
+    args = ap.parse_args()
+    get_pool(headless=True, tamanho=max(1, args.navegadores))
+    if args.workers > 1:
+        try:
+            coletar_dados_completos_paralelo(args.workers)
+        finally:
+            fechar_pool()
+        raise SystemExit
+    
     try:
+        # mesmo arquivo e formato da coleta paralela (-w), lido pelo representacao_indexacao.py
+        os.makedirs(os.path.dirname(ARQUIVO_SAIDA_COMPLETO), exist_ok=True)
         dados = coletar_dados_completos()
-        resultado_final = {
-            "meta": {
-                "paginas_coletadas": pages_collected
-            },
-            "dados": dados
-        }
-        with open("dados_webmotors.json", "w", encoding="utf-8") as f:
-            json.dump(resultado_final, f, ensure_ascii=False, indent=4)
-        print("Dados salvos em dados_webmotors.json")
+        salvar_resultado({"meta": {"paginas_coletadas": pages_collected}, "dados": dados})
+        print(f"Dados salvos em {ARQUIVO_SAIDA_COMPLETO}")
         print(f"Total de páginas coletadas: {pages_collected}")
     except AccessDeniedException as ade:
-        erro = {"error": str(ade)}
-        with open("dados_webmotors.json", "w", encoding="utf-8") as f:
-            json.dump(erro, f, ensure_ascii=False, indent=4)
-        print(json.dumps(erro, indent=4))
+        # não sobrescreve o resultado de uma coleta anterior com o erro
+        print(json.dumps({"error": str(ade)}, indent=4))
+        raise SystemExit(1)
+    finally:
+        fechar_pool()
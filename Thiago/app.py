@@ -18,9 +18,21 @@ import ir_measures
 import re
 
 # ================== CONFIG & HELPERS =================================
-ENGINE = SearchEngine()
 st.set_page_config(page_title="Busca FIPE/WebMotors", page_icon="🚗", layout="wide")
 
+@st.cache_resource
+def carregar_engine(backend="python"):
+    """Um único motor por modo de pontuação: o cache de consultas sobrevive aos reruns do Streamlit."""
+    try:
+        return SearchEngine(backend=backend)
+    except ValueError as e:          # sem data/indice_bm25f.json (rode representacao_indexacao.py)
+        st.warning(f"{e} – usando BM25 simples.")
+        return SearchEngine()
+
+MODOS = {"BM25F (pesos por campo)": "bm25f", "BM25": "python"}
+modo = st.sidebar.radio("Pontuação", list(MODOS))
+ENGINE = carregar_engine(MODOS[modo])
+
 def sanitize(text: str) -> str:
     """Remove espaços para obedecer ao formato TREC (qid/doc_id single‑token)."""
     return re.sub(r"\s+", "_", text)
@@ -37,6 +49,9 @@ with tab_busca:
     with st.sidebar:
         st.header("⚙️ Configuração")
         topk_busca = st.slider("Quantos resultados?", 5, 50, 10)
+        info = ENGINE.cache_info()
+        st.caption(f"Cache de consultas: {info['hits']} hits / {info['misses']} misses "
+                   f"({info['size']}/{info['maxsize']} entradas)")
 
     consulta = st.text_input("Digite sua consulta:", placeholder='ex.: "hilux 2022 diesel"')
 
@@ -66,7 +81,7 @@ with tab_busca:
 
             with st.expander("Como interpretar o Score?", expanded=False):
                 st.markdown(
-                    """O **Score** vem da fórmula BM25. Documentos com a mesma combinação de termos
+                    """O **Score** vem da fórmula BM25 (ou BM25F, que dá pesos diferentes a marca e modelo). Documentos com a mesma combinação de termos
                     (marca, modelo, etc.) podem empatar. Neste caso aplicamos um pequeno ajuste que
                     favorece o **ano exato** quando a consulta termina com um ano."""
                 )
@@ -108,10 +123,10 @@ with tab_eval:
 
         # ------------------ run ---------------------------------------
         run_rows = []
-        for q in queries:
-            res = ENGINE.search(q, topk_eval)
+        # workers=1: fork dentro do servidor Streamlit (multithread) pode travar os processos filhos
+        for q, res in ENGINE.batch(queries, topk_eval, workers=1):
             for rank, r in enumerate(res, 1):
-                run_rows.append([sanitize(q), 0, sanitize(r["url"]), rank, r["score"], "bm25"])
+                run_rows.append([sanitize(q), 0, sanitize(r["url"]), rank, r["score"], ENGINE.modelo])
         run_df = pd.DataFrame(run_rows, columns=["qid", "iter", "doc", "rank", "score", "tag"])
         st.write(f"Run gerado com **{len(run_df)} linhas**.")
 
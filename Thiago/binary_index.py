@@ -0,0 +1,154 @@
+# binary_index.py ------------------------------------------------------
+# Formato binário compacto do índice BM25 (alternativa ao indice_bm25.json)
+#
+#   header ... magic, N, avgdl, k1/b dos limites, nº termos e offsets das seções
+#   lens ..... N × uint32 (tamanho de cada documento, doc-id inteiro)
+#   termos ... tabela ordenada: (off_str, len_str, df, off_post, len_post, max_score)
+#   strings .. termos em UTF-8 concatenados (mesma ordem da tabela)
+#   postings . por termo: pares varint (delta do doc-id, tf)
+#   meta ..... (N+1) × uint64 offsets + JSON UTF-8 de cada documento
+#
+# O leitor abre o arquivo com mmap: nada é decodificado na carga, os
+# postings são lidos sob demanda e os metadados só dos documentos exibidos.
+# ---------------------------------------------------------------------
+
+import json, math, mmap, struct, sys
+
+MAGIC   = b"BM25BIN2"
+HEADER  = struct.Struct("<8sIdddIQQQQQ") # magic N avgdl k1 b n_termos off_lens off_termos off_str off_post off_meta
+TERMO   = struct.Struct("<IHIQId")       # off_str len_str df off_post len_post max_score
+OFFSET  = struct.Struct("<Q")
+
+# ---------- varint ----------
+def encode_varint(n, out):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def encode_postings(pares):
+    """pares (doc_id, tf) ordenados por doc_id → bytes (delta + tf em varint)."""
+    out, anterior = bytearray(), 0
+    for doc, tf in pares:
+        encode_varint(doc - anterior, out)
+        encode_varint(tf, out)
+        anterior = doc
+    return bytes(out)
+
+def decode_postings(buf):
+    """Gera (doc_id, tf) a partir do bloco varint de um termo."""
+    i, n, doc = 0, len(buf), 0
+    while i < n:
+        val = shift = 0
+        while True:
+            byte = buf[i]; i += 1
+            val |= (byte & 0x7F) << shift
+            if byte < 0x80: break
+            shift += 7
+        doc += val
+        tf = shift = 0
+        while True:
+            byte = buf[i]; i += 1
+            tf |= (byte & 0x7F) << shift
+            if byte < 0x80: break
+            shift += 7
+        yield doc, tf
+
+# ---------- escrita ----------
+def doc_num(did):
+    """'doc_17' → 17 (ids gerados por representacao_indexacao.py)."""
+    return int(did.rsplit("_", 1)[1])
+
+def write_index(path, inverted, doc_len, doc_meta, N, avgdl, k1=1.5, b=0.75):
+    """Grava o índice no formato binário a partir das estruturas do indexador."""
+    termos = sorted((t for t in inverted if not t.startswith("_")), key=lambda t: t.encode("utf-8"))
+
+    lens = bytearray()
+    for i in range(N):
+        lens += struct.pack("<I", doc_len.get(f"doc_{i}", 0))
+
+    tabela, strings, postings = bytearray(), bytearray(), bytearray()
+    for t in termos:
+        entry = inverted[t]
+        bt    = t.encode("utf-8")
+        bloco = encode_postings(sorted((doc_num(d), tf) for d, tf in entry["postings"].items()))
+        tabela += TERMO.pack(len(strings), len(bt), len(entry["postings"]), len(postings), len(bloco),
+                             entry.get("max_score", math.nan))   # NaN = limite ausente
+        strings += bt
+        postings += bloco
+
+    meta_offsets, meta_blob = bytearray(), bytearray()
+    for i in range(N):
+        meta_offsets += OFFSET.pack(len(meta_blob))
+        meta_blob += json.dumps(doc_meta.get(f"doc_{i}", {}), ensure_ascii=False).encode("utf-8")
+    meta_offsets += OFFSET.pack(len(meta_blob))
+
+    off_lens   = HEADER.size
+    off_termos = off_lens + len(lens)
+    off_str    = off_termos + len(tabela)
+    off_post   = off_str + len(strings)
+    off_meta   = off_post + len(postings)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, N, avgdl, k1, b, len(termos), off_lens, off_termos, off_str, off_post, off_meta))
+        for sec in (lens, tabela, strings, postings, meta_offsets, meta_blob):
+            f.write(sec)
+
+# ---------- leitura (mmap) ----------
+class _Postings:
+    """Visão preguiçosa dos postings de um termo (interface de dict.items())."""
+    __slots__ = ("buf", "df")
+    def __init__(self, buf, df): self.buf, self.df = buf, df
+    def items(self): return decode_postings(self.buf)
+    def __len__(self): return self.df
+
+class _Meta:
+    """Metadados decodificados sob demanda: meta[doc_id] → dict."""
+    def __init__(self, mm, off, N):
+        self.mm, self.N = mm, N
+        self.offs = memoryview(mm)[off:off + (N + 1) * OFFSET.size].cast("Q")
+        self.base = off + (N + 1) * OFFSET.size
+    def __getitem__(self, doc):
+        ini, fim = self.offs[doc], self.offs[doc + 1]
+        return json.loads(self.mm[self.base + ini:self.base + fim].decode("utf-8"))
+    def __len__(self): return self.N
+
+class BinaryIndex:
+    """Índice binário aberto via mmap; expõe get(termo) no mesmo formato do JSON."""
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise ValueError("binary_index: formato suportado apenas em little-endian")
+        self._f = open(path, "rb")
+        self.mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.N, self.avgdl, self.k1, self.b, self.n_termos, off_lens, self.off_termos,
+         self.off_str, self.off_post, off_meta) = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: não é um índice BM25 binário")
+        self.lens = memoryview(self.mm)[off_lens:off_lens + 4 * self.N].cast("I")
+        self.meta = _Meta(self.mm, off_meta, self.N)
+
+    def _termo(self, i):
+        return TERMO.unpack_from(self.mm, self.off_termos + i * TERMO.size)
+
+    def _busca(self, termo):
+        """Busca binária na tabela de termos (ordenada por bytes UTF-8)."""
+        alvo, lo, hi = termo.encode("utf-8"), 0, self.n_termos - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            rec = self._termo(mid)
+            atual = self.mm[self.off_str + rec[0]:self.off_str + rec[0] + rec[1]]
+            if atual == alvo: return rec
+            if atual < alvo: lo = mid + 1
+            else: hi = mid - 1
+        return None
+
+    def get(self, termo, default=None):
+        rec = self._busca(termo)
+        if rec is None: return default
+        _, _, df, off, n, max_score = rec
+        buf = memoryview(self.mm)[self.off_post + off:self.off_post + off + n]
+        return {"df": df, "postings": _Postings(buf, df),
+                "max_score": None if math.isnan(max_score) else max_score}
+
+    def close(self):
+        try: self.lens.release(); self.meta.offs.release(); self.mm.close()
+        finally: self._f.close()   # o arquivo fecha mesmo se o mmap ainda tiver views exportadas
@@ -3,7 +3,7 @@ Gera um esboço de qrels.csv com os top-5 resultados
 para cada query de queries.txt. Depois basta editar o
 campo `rel` (0 = irrelevante, 1 = relevante) manualmente.
 """
-import csv, pandas as pd
+import csv, os, pandas as pd
 from search import SearchEngine   # seu motor BM25
 
 TOPK = 5
@@ -14,8 +14,7 @@ with open("queries.txt", encoding="utf-8") as f:
     queries = [q.strip() for q in f if q.strip()]
 
 rows = []
-for q in queries:
-    res = engine.search(q, topk=TOPK)
+for q, res in engine.batch(queries, topk=TOPK, workers=os.cpu_count()):
     for r in res:
         rows.append([q, r["url"], ""])
 
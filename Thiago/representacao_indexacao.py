@@ -1,5 +1,13 @@
-import json, re, string, math
+import json, re, string, math, argparse
 from collections import defaultdict, Counter
+from binary_index import write_index
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--bin", action="store_true",
+                help="também grava data/indice_bm25.bin (formato compacto p/ mmap)")
+ap.add_argument("--entrada", default="data/results_webmotors_full_content.json",
+                help="JSON bruto do crawler (ex.: data/results_webmotors_main_brands.json)")
+args = ap.parse_args()
 
 # ------------------------ utilidades de texto ------------------------
 stop_words = {
@@ -18,14 +26,37 @@ def clean_text(txt):
     return [simple_stem(t) for t in tokens if len(t) > 2 and t not in stop_words]
 # ---------------------------------------------------------------------
 
+# ---------- BM25F: campos, pesos e b por campo ----------
+# Os termos de cada campo são contados separadamente. O tf "pseudo" de cada
+# posting (soma ponderada dos tf normalizados por campo) já sai calculado,
+# então a consulta BM25F custa o mesmo que a BM25 comum. Esses dados vão para
+# um arquivo à parte (data/indice_bm25f.json), lido só pelo backend bm25f:
+# o índice BM25 comum continua do mesmo tamanho.
+# Ano e preço não são campos: o clean_text descarta números (e "preços
+# disponíveis" é stopword), então esses campos nunca teriam termos.
+CAMPOS    = ("marca", "modelo")
+PESOS_F   = {"marca": 2.0, "modelo": 3.0}
+B_CAMPOS  = {"marca": 0.3, "modelo": 0.75}
+
+def pseudo_tf(tfs, lens, avg, pesos=PESOS_F, bs=B_CAMPOS):
+    """Σ_c peso_c · tf_c / (1 - b_c + b_c · len_c / avglen_c)"""
+    total = 0.0
+    for c, tf, ln in zip(CAMPOS, tfs, lens):
+        if tf:
+            total += pesos[c] * tf / (1 - bs[c] + bs[c] * ln / avg[c] if avg[c] else 1)
+    return total
+# ---------------------------------------------------------------------
+
 # ---------- leitura do JSON bruto (ajuste o caminho se precisar) -----
-with open("data/results_webmotors_full_content.json", encoding="utf-8") as f:
+with open(args.entrada, encoding="utf-8") as f:
     raw = json.load(f)
 # ---------------------------------------------------------------------
 
 inverted = defaultdict(lambda: {"postings": {}})  # termo → {df, postings{doc:tf}}
 doc_meta   = {}          # doc_id → marca/modelo/ano/preço/url
 doc_len    = {}          # doc_id → |D|
+doc_len_f  = {}          # doc_id → [|D| por campo]
+tf_campos  = defaultdict(dict)  # termo → {doc: [tf por campo]} (só p/ o BM25F)
 doc_id     = 0
 
 for marca in raw["dados"]:
@@ -40,6 +71,8 @@ for marca in raw["dados"]:
             tf    = Counter(terms)
             if not tf:     # documento vazio? pula
                 continue
+            termos_campo = [clean_text(str(v)) for v in (m_nome, modelo)]
+            tf_campo     = [Counter(t) for t in termos_campo]
 
             did = f"doc_{doc_id}"
             doc_id += 1
@@ -48,10 +81,12 @@ for marca in raw["dados"]:
             doc_meta[did] = {"marca": m_nome, "modelo": modelo,
                              "ano": ano, "preco": preco, "url": url}
             doc_len[did]  = sum(tf.values())
+            doc_len_f[did] = [len(t) for t in termos_campo]
 
             # atualiza índice invertido
             for term, freq in tf.items():
                 inverted[term]["postings"][did] = freq
+                tf_campos[term][did] = [c[term] for c in tf_campo]
 
 # calcula df para cada termo
 for term, entry in inverted.items():
@@ -61,7 +96,22 @@ for term, entry in inverted.items():
 N      = len(doc_meta)
 avgdl  = sum(doc_len.values()) / N
 
-inverted["_stats"] = {"N": N, "avgdl": avgdl}
+# limite superior (max_score) de cada termo, usado pelo MaxScore do search.py
+K1, B = 1.5, 0.75      # mesmos defaults do SearchEngine
+for term, entry in inverted.items():
+    idf = math.log1p((N - entry["df"] + .5) / (entry["df"] + .5))
+    entry["max_score"] = max(
+        idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * doc_len[d] / avgdl))
+        for d, tf in entry["postings"].items())
+
+# tf pseudo do BM25F com os pesos/b padrão (o SearchEngine recalcula se receber outros)
+avg_f = {c: sum(l[i] for l in doc_len_f.values()) / N for i, c in enumerate(CAMPOS)}
+bm25f = {"campos": list(CAMPOS), "pesos": PESOS_F, "b": B_CAMPOS, "avglen": avg_f, "lens": doc_len_f,
+         "termos": {term: {"campos": campos,
+                           "ptf": {d: round(pseudo_tf(tfs, doc_len_f[d], avg_f), 6) for d, tfs in campos.items()}}
+                    for term, campos in tf_campos.items()}}
+
+inverted["_stats"] = {"N": N, "avgdl": avgdl, "k1": K1, "b": B}
 inverted["_lens"]  = doc_len           # comprimento de cada documento
 
 # --------------------- grava arquivos ---------------------
@@ -71,5 +121,12 @@ with open("data/indice_bm25.json", "w", encoding="utf-8") as f:
 with open("data/metadados_documentos.json", "w", encoding="utf-8") as f:
     json.dump(doc_meta, f, ensure_ascii=False, indent=2)
 
+with open("data/indice_bm25f.json", "w", encoding="utf-8") as f:
+    json.dump(bm25f, f, ensure_ascii=False)
+
+if args.bin:
+    write_index("data/indice_bm25.bin", inverted, doc_len, doc_meta, N, avgdl, K1, B)
+    print("Índice binário gravado em data/indice_bm25.bin")
+
 print(f"Índice gerado com {len(inverted)-2} termos e {N} documentos ✅")
 print(f"avgdl = {avgdl:.2f}")
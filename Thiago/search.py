@@ -6,15 +6,28 @@ search.py – busca BM25 (query única, lote ou REPL)
 • query única ........... python search.py "onix 2020 automático" -k 15
 • lote (arquivo) ........ python search.py -f consultas.txt -o saida.csv -k 20
 • modo interativo ....... python search.py           # entra num loop
+• índice binário ........ python search.py --idx data/indice_bm25.bin "onix"
+• backend NumPy ......... python search.py --backend numpy "onix"   (requer numpy)
+• top-k com poda ........ python search.py --backend maxscore "chevrolet onix"
+• lote paralelo ......... python search.py -f consultas.txt -o saida.csv -j 8
+• BM25F (por campo) ..... python search.py --backend bm25f --pesos marca=2 --pesos modelo=3 "onix"
 """
 
-import json, math, re, string, argparse, csv, sys
-from collections import defaultdict
+import json, math, re, string, argparse, csv, sys, heapq, os, multiprocessing, threading
+from itertools import chain, islice
+from bisect import bisect_left
+from collections import defaultdict, Counter, OrderedDict
+from binary_index import BinaryIndex, doc_num
 try:
     from tabulate import tabulate
     TABS = True
 except ImportError:
     TABS = False
+try:
+    import numpy as np
+    HAS_NP = True
+except ImportError:
+    HAS_NP = False
 
 # ---------- preprocessing (igual ao index) ----------
 STOP = {"de","a","o","que","e","do","da","em","um","para","é","com","não",
@@ -27,19 +40,296 @@ def preprocess(txt):
     return [stem_pt(t) for t in txt.split() if len(t)>2 and t not in STOP]
 
 # ---------- motor BM25 ----------
+# empates de score são desfeitos pelo doc-id em todos os backends (resultados reproduzíveis)
+def _ordem_doc(d): return d if isinstance(d, int) else doc_num(d)
+
+CACHE_SIZE     = 1024   # nº de consultas distintas no cache LRU (0 desliga)
+CACHE_TOPK_MIN = 50     # numa falta, calcula ao menos este top-k (maior valor do slider do app)
+
 class SearchEngine:
     def __init__(self, idx="data/indice_bm25.json", meta="data/metadados_documentos.json",
-                 k1=1.5, b=0.75):
-        self.idx   = json.load(open(idx, encoding="utf-8"))
-        self.meta  = json.load(open(meta, encoding="utf-8"))
-        self.N     = self.idx["_stats"]["N"]
-        self.avgdl = self.idx["_stats"]["avgdl"]
-        self.lens  = self.idx["_lens"]
+                 k1=1.5, b=0.75, backend="python", cache_size=CACHE_SIZE, pesos=None, b_campos=None,
+                 bm25f="data/indice_bm25f.json"):
+        # guardado p/ recriar o motor em workers que não herdam memória (spawn)
+        self.args = dict(idx=idx, meta=meta, k1=k1, b=b, backend=backend, cache_size=cache_size,
+                         pesos=pesos, b_campos=b_campos, bm25f=bm25f)
         self.k1, self.b = k1, b
+        self.backend = backend
+        # cache LRU: termos normalizados → (k calculado, resultados)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = self.cache_misses = 0
+        # o app Streamlit divide um motor entre as threads das sessões: recarga, cache e ranking
+        # passam por esta trava (reentrante: _carregar chama close)
+        self.trava = threading.RLock()
+        self.idx = None
+        self._carregar()
+
+    def _assinatura_arquivos(self):
+        """(mtime, tamanho) dos arquivos do índice; muda quando o índice é regravado."""
+        arqs = [self.args["idx"]] if self.args["idx"].endswith(".bin") else [self.args["idx"], self.args["meta"]]
+        if self.args["backend"] == "bm25f": arqs.append(self.args["bm25f"])
+        return tuple((st.st_mtime_ns, st.st_size) for st in map(os.stat, arqs))
+
+    def _carregar(self):
+        idx, meta, k1, b, backend = (self.args[c] for c in ("idx", "meta", "k1", "b", "backend"))
+        self.assinatura = self._assinatura_arquivos()
+        self.close()                                   # recarga: libera o mmap do índice anterior
+        if idx.endswith(".bin"):
+            # formato compacto: mmap, doc-ids inteiros, metadados embutidos
+            self.idx   = BinaryIndex(idx)
+            self.meta  = self.idx.meta
+            self.N     = self.idx.N
+            self.avgdl = self.idx.avgdl
+            self.lens  = self.idx.lens
+        else:
+            with open(idx, encoding="utf-8") as f: self.idx = json.load(f)
+            with open(meta, encoding="utf-8") as f: self.meta = json.load(f)
+            self.N     = self.idx["_stats"]["N"]
+            self.avgdl = self.idx["_stats"]["avgdl"]
+            self.lens  = self.idx["_lens"]
+        if backend == "numpy": self._init_numpy()
+        elif backend == "maxscore":
+            self.ms_cache = {}
+            # k1/b com que o indexador calculou os max_score gravados
+            st = self.idx if isinstance(self.idx, BinaryIndex) else self.idx["_stats"]
+            self.ub_params = (st.k1, st.b) if isinstance(st, BinaryIndex) else (st.get("k1"), st.get("b"))
+        elif backend == "bm25f": self._init_bm25f()
+        elif backend != "python": raise ValueError(f"backend desconhecido: {backend}")
+
+    # ---------- backend NumPy ----------
+    def _init_numpy(self):
+        """Pré-calcula a normalização por documento; postings viram arrays sob demanda."""
+        if not HAS_NP: raise ImportError("backend 'numpy' requer: pip install numpy")
+        if isinstance(self.idx, BinaryIndex):
+            self.doc_keys = None                      # doc-id já é a posição
+            dl = np.asarray(self.lens, dtype=np.float64)
+            self.doc_nums = np.arange(len(dl))
+        else:
+            self.doc_keys = list(self.lens)           # posição → "doc_N"
+            self.doc_pos  = {d: i for i, d in enumerate(self.doc_keys)}
+            dl = np.fromiter(self.lens.values(), dtype=np.float64, count=len(self.doc_keys))
+            self.doc_nums = np.fromiter(map(doc_num, self.doc_keys), dtype=np.int64, count=len(self.doc_keys))
+        self.norm = self.k1 * (1 - self.b + self.b * dl / self.avgdl)
+        self.np_cache = {}                            # termo → (docs, pesos BM25)
+
+    def _np_postings(self, t):
+        """Postings do termo como (docs int32, peso BM25 float64); peso é estático por (termo, doc)."""
+        if t in self.np_cache: return self.np_cache[t]
+        entry = self.idx.get(t)
+        if not entry:
+            self.np_cache[t] = None
+            return None
+        pares = entry["postings"].items()
+        if self.doc_keys is None:
+            flat = np.fromiter((x for p in pares for x in p), dtype=np.int64, count=2 * entry["df"])
+            docs, tfs = flat[0::2].astype(np.int32), flat[1::2].astype(np.float64)
+        else:
+            pares = list(pares)
+            docs = np.fromiter((self.doc_pos[d] for d, _ in pares), dtype=np.int32, count=len(pares))
+            tfs  = np.fromiter((tf for _, tf in pares), dtype=np.float64, count=len(pares))
+        idf = math.log1p((self.N - entry["df"] + .5)/(entry["df"] + .5))
+        # mesma ordem de operações do backend python: scores idênticos bit a bit (empates iguais)
+        pesos = idf * (tfs * (self.k1 + 1) / (tfs + self.norm[docs]))
+        self.np_cache[t] = (docs, pesos)
+        return self.np_cache[t]
+
+    def _score_query_np(self, terms, topk):
+        scores = np.zeros(len(self.norm))
+        for t in terms:
+            post = self._np_postings(t)
+            if post is None: continue
+            docs, pesos = post
+            scores[docs] += pesos                     # docs únicos dentro de um termo
+        cand = np.flatnonzero(scores)
+        if len(cand) > topk:
+            # o k-ésimo score corta os candidatos, mas todos os empatados com ele ficam p/ o desempate
+            corte = np.partition(scores[cand], len(cand) - topk)[len(cand) - topk]
+            cand = cand[scores[cand] >= corte]
+        # score decrescente, empate pelo doc-id (igual aos outros backends)
+        cand = cand[np.lexsort((self.doc_nums[cand], -scores[cand]))[:topk]]
+        key = (lambda i: int(i)) if self.doc_keys is None else (lambda i: self.doc_keys[i])
+        return [(key(i), float(scores[i])) for i in cand]
+
+    # ---------- backend MaxScore (document-at-a-time + poda) ----------
+    def _ms_postings(self, t):
+        """Postings ordenados por doc-id inteiro: (docs, tfs, idf, limite superior)."""
+        if t in self.ms_cache: return self.ms_cache[t]
+        entry = self.idx.get(t)
+        if not entry:
+            self.ms_cache[t] = None
+            return None
+        if isinstance(self.idx, BinaryIndex):
+            pares = list(entry["postings"].items())            # já ordenados
+        else:
+            pares = sorted((doc_num(d), tf) for d, tf in entry["postings"].items())
+        docs = [d for d, _ in pares]
+        tfs  = [tf for _, tf in pares]
+        idf  = math.log1p((self.N - entry["df"] + .5)/(entry["df"] + .5))
+        ub   = entry.get("max_score")
+        if ub is None or self.ub_params != (self.k1, self.b):
+            # índice antigo ou parâmetros diferentes: calcula o limite percorrendo a lista
+            ub = max(self._bm25(idf, tf, d) for d, tf in pares)
+        self.ms_cache[t] = (docs, tfs, idf, ub)
+        return self.ms_cache[t]
+
+    def _bm25(self, idf, tf, doc):
+        dl = self.lens[doc if isinstance(self.idx, BinaryIndex) else f"doc_{doc}"]
+        return idf * (tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / self.avgdl)))
+
+    def _score_query_maxscore(self, terms, topk):
+        """
+        MaxScore: listas em ordem crescente de limite superior. As de menor limite,
+        cuja soma não supera o k-ésimo score atual (θ), são "não essenciais": só
+        são consultadas (com salto via bisect) para documentos vindos das essenciais,
+        e a avaliação para assim que o score não puder mais ultrapassar θ.
+        """
+        listas = []
+        for t, qtf in Counter(terms).items():          # termo repetido conta qtf vezes
+            post = self._ms_postings(t)
+            if post: listas.append((post[0], post[1], post[2], post[3] * qtf, qtf))
+        if not listas: return []
+        listas.sort(key=lambda l: l[3])
+        acum, soma = [], 0.0                            # acum[i] = soma dos limites de 0..i
+        for l in listas:
+            soma += l[3]; acum.append(soma)
+
+        n, pos, heap, theta, ess = len(listas), [0] * len(listas), [], 0.0, 0
+        while True:
+            while ess < n and acum[ess] <= theta: ess += 1
+            if ess == n: break
+            # próximo candidato = menor doc corrente entre as listas essenciais
+            d = min((listas[i][0][pos[i]] for i in range(ess, n) if pos[i] < len(listas[i][0])), default=None)
+            if d is None: break
+            score = 0.0
+            for i in range(ess, n):
+                docs, tfs, idf, _, qtf = listas[i]
+                if pos[i] < len(docs) and docs[pos[i]] == d:
+                    score += qtf * self._bm25(idf, tfs[pos[i]], d)
+                    pos[i] += 1
+            for i in range(ess - 1, -1, -1):
+                if score + acum[i] <= theta: break      # não alcança o top-k
+                docs, tfs, idf, _, qtf = listas[i]
+                pos[i] = j = bisect_left(docs, d, pos[i])
+                if j < len(docs) and docs[j] == d:
+                    score += qtf * self._bm25(idf, tfs[j], d)
+            if len(heap) < topk: heapq.heappush(heap, (score, -d))
+            elif score > heap[0][0]: heapq.heapreplace(heap, (score, -d))
+            if len(heap) == topk: theta = heap[0][0]
+        key = (lambda d: d) if isinstance(self.idx, BinaryIndex) else (lambda d: f"doc_{d}")
+        return [(key(-nd), s) for s, nd in sorted(heap, reverse=True)]
+
+    # ---------- backend BM25F (pesos e b por campo) ----------
+    def _init_bm25f(self):
+        """Usa o tf pseudo gravado pelo indexador; com pesos/b diferentes, recalcula por termo."""
+        # os dados por campo ficam num arquivo à parte: os outros backends não pagam p/ carregá-los
+        if not isinstance(self.idx, dict) or not os.path.exists(self.args["bm25f"]):
+            raise ValueError(f"backend 'bm25f' requer o índice JSON e {self.args['bm25f']} (rode representacao_indexacao.py)")
+        with open(self.args["bm25f"], encoding="utf-8") as arq: f = json.load(arq)
+        self.f_campos = f["campos"]
+        for nome, valores in (("pesos", self.args["pesos"]), ("b_campos", self.args["b_campos"])):
+            extras = sorted(set(valores or {}) - set(self.f_campos))
+            if extras:
+                raise ValueError(f"{nome}: campo(s) {', '.join(extras)} não existem no índice "
+                                 f"(campos: {', '.join(self.f_campos)})")
+        self.f_pesos  = {**f["pesos"], **(self.args["pesos"] or {})}
+        self.f_b      = {**f["b"], **(self.args["b_campos"] or {})}
+        self.f_avg, self.f_lens, self.f_termos = f["avglen"], f["lens"], f["termos"]
+        self.f_gravado = (self.f_pesos == f["pesos"] and self.f_b == f["b"])
+        self.f_cache = {}                              # termo → (idf, [(doc, ptf)])
+
+    def _f_postings(self, t):
+        if t in self.f_cache: return self.f_cache[t]
+        entry, campos = self.idx.get(t), self.f_termos.get(t)
+        if not entry or not campos:
+            self.f_cache[t] = None
+            return None
+        if self.f_gravado:
+            pares = list(campos["ptf"].items())
+        else:
+            pares = []
+            for d, tfs in campos["campos"].items():
+                ptf = 0.0
+                for c, tf, ln in zip(self.f_campos, tfs, self.f_lens[d]):
+                    if tf: ptf += self.f_pesos[c] * tf / (1 - self.f_b[c] + self.f_b[c] * ln / self.f_avg[c])
+                pares.append((d, ptf))
+        idf = math.log1p((self.N - entry["df"] + .5)/(entry["df"] + .5))
+        self.f_cache[t] = (idf, pares)
+        return self.f_cache[t]
+
+    def _score_query_bm25f(self, terms, topk):
+        # normalização de tamanho já está no tf pseudo: só resta a saturação por k1
+        scores = defaultdict(float)
+        for t in terms:
+            post = self._f_postings(t)
+            if post is None: continue
+            idf, pares = post
+            for doc, ptf in pares:
+                scores[doc] += idf * ptf * (self.k1 + 1) / (ptf + self.k1)
+        return heapq.nlargest(topk, scores.items(), key=lambda x: (x[1], -doc_num(x[0])))
+
+    # ---------- cache de resultados ----------
+    def _verificar_indice(self):
+        """Recarrega o índice e esvazia o cache se o arquivo do índice mudou."""
+        try: assinatura = self._assinatura_arquivos()
+        except OSError: return
+        if assinatura != self.assinatura:
+            self.cache.clear()
+            self._carregar()
+
+    def close(self):
+        """Fecha o mmap do índice binário (no JSON não há o que fechar)."""
+        with self.trava:
+            if isinstance(self.idx, BinaryIndex):
+                # caches por termo podem guardar visões do mmap anterior
+                self.np_cache = self.ms_cache = self.f_cache = {}
+                self.lens = self.meta = None
+                try: self.idx.close()
+                except BufferError: pass               # alguma visão ainda viva: o GC fecha depois
+            self.idx = None
+
+    @property
+    def modelo(self):
+        """Modelo de ranking (tag de run TREC): numpy/maxscore são só implementações do BM25."""
+        return "bm25f" if self.backend == "bm25f" else "bm25"
+
+    def cache_info(self):
+        with self.trava:
+            return {"hits": self.cache_hits, "misses": self.cache_misses,
+                    "size": len(self.cache), "maxsize": self.cache_size}
 
     def _score_query(self, query, topk):
         terms = preprocess(query)
-        if not terms: return []
+        if not terms or topk <= 0: return []
+        # sob a trava, uma recarga não fecha o índice no meio do ranking de outra thread
+        with self.trava:
+            if not self.cache_size: return self._rank(terms, topk)
+            self._verificar_indice()
+            key = tuple(sorted(terms))                 # BM25 não depende da ordem dos termos
+            hit = self.cache.get(key)
+            # lista com menos de k itens já contém todos os documentos que casam
+            if hit and (topk <= hit[0] or len(hit[1]) < hit[0]):
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                return [dict(r) for r in hit[1][:topk]]   # cópias: quem chama pode alterar o score
+            self.cache_misses += 1
+            k_calc = max(topk, CACHE_TOPK_MIN)         # calcula a mais p/ servir k menores
+            res = self._rank(terms, k_calc)
+            self.cache[key] = (k_calc, res)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size: self.cache.popitem(last=False)
+            return [dict(r) for r in res[:topk]]
+
+    def _rank(self, terms, topk):
+        if self.backend == "numpy":
+            ranked = self._score_query_np(terms, topk)
+            return [{**self.meta[d], "score": round(s,3)} for d,s in ranked]
+        if self.backend == "maxscore":
+            ranked = self._score_query_maxscore(terms, topk)
+            return [{**self.meta[d], "score": round(s,3)} for d,s in ranked]
+        if self.backend == "bm25f":
+            ranked = self._score_query_bm25f(terms, topk)
+            return [{**self.meta[d], "score": round(s,3)} for d,s in ranked]
         scores = defaultdict(float)
         for t in terms:
             entry = self.idx.get(t)
@@ -49,14 +339,49 @@ class SearchEngine:
                 dl = self.lens[doc]
                 denom = tf + self.k1 * (1 - self.b + self.b * dl / self.avgdl)
                 scores[doc] += idf * (tf * (self.k1 + 1) / denom)
-        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:topk]
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], _ordem_doc(x[0])))[:topk]
         return [{**self.meta[d], "score": round(s,3)} for d,s in ranked]
 
     # API pública
     def search(self, query, topk=10):   return self._score_query(query, topk)
-    def batch (self, iterable, topk=10):
+    def batch (self, iterable, topk=10, workers=1, chunksize=16):
+        """Gera (consulta, resultados) na ordem de entrada; workers>1 usa multiprocessing."""
+        if workers > 1:
+            # lê só o começo do iterável (pode ser um arquivo) p/ saber se o lote compensa os processos
+            it = iter(iterable)
+            inicio = list(islice(it, MIN_LOTE_PARALELO))
+            iterable = chain(inicio, it)
+            if len(inicio) == MIN_LOTE_PARALELO:
+                yield from self._batch_parallel(iterable, topk, workers, chunksize)
+                return
         for q in iterable: yield q.strip(), self._score_query(q, topk)
 
+    def _batch_parallel(self, iterable, topk, workers, chunksize):
+        global _WORKER_ENGINE
+        # com fork os workers herdam o índice já carregado (copy-on-write);
+        # sem fork, cada worker reabre o índice (.bin via mmap compartilha o page cache)
+        metodos = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in metodos else None)
+        _WORKER_ENGINE = self
+        try:
+            with ctx.Pool(workers, initializer=_init_batch_worker, initargs=(self.args,)) as pool:
+                yield from pool.imap(_batch_query, ((q, topk) for q in iterable), chunksize)
+        finally:
+            _WORKER_ENGINE = None
+
+# ---------- lote paralelo (workers) ----------
+MIN_LOTE_PARALELO = 64     # lotes menores que isso não compensam abrir processos
+_WORKER_ENGINE = None
+
+def _init_batch_worker(args):
+    global _WORKER_ENGINE
+    if _WORKER_ENGINE is None: _WORKER_ENGINE = SearchEngine(**args)
+    else: _WORKER_ENGINE.trava = threading.RLock()   # com fork, a trava copiada pode estar presa por outra thread
+
+def _batch_query(item):
+    q, topk = item
+    return q.strip(), _WORKER_ENGINE._score_query(q, topk)
+
 # ---------- helpers de saída ----------
 def print_table(res):
     head = ["Score","Marca","Modelo","Ano","Preço","URL"]
@@ -80,26 +405,51 @@ def write_csv(lines, path, topk):
             w.writerow([q] + flat)
 
 # ---------- main ----------
+def par_campo(texto):
+    """'marca=2' → ("marca", 2.0), p/ --pesos e --b-campos."""
+    campo, sep, valor = texto.partition("=")
+    try:
+        valor = float(valor)
+    except ValueError:
+        valor = None
+    if not sep or not campo.strip() or valor is None or valor < 0:
+        raise argparse.ArgumentTypeError(f"esperado CAMPO=VALOR com valor numérico >= 0, recebido {texto!r}")
+    return campo.strip(), valor
+
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("query", nargs="*", help="consulta livre (pode ficar vazia p/ REPL)")
     ap.add_argument("-k","--topk", type=int, default=10, help="nº resultados")
     ap.add_argument("-f","--file", help="arquivo com uma consulta por linha")
     ap.add_argument("-o","--output", help="csv p/ salvar resultados do -f")
+    ap.add_argument("--idx", default="data/indice_bm25.json", help="índice (.json ou .bin)")
+    ap.add_argument("--backend", choices=["python","numpy","maxscore","bm25f"], default="python", help="motor de pontuação")
+    ap.add_argument("--pesos", action="append", type=par_campo, default=[], metavar="CAMPO=PESO",
+                    help="peso de um campo do bm25f; repita p/ cada campo (ex.: --pesos marca=2 --pesos modelo=3)")
+    ap.add_argument("--b-campos", action="append", type=par_campo, default=[], metavar="CAMPO=B",
+                    help="b de um campo do bm25f (0 a 1); repita p/ cada campo")
+    ap.add_argument("-j","--jobs", type=int, default=1, help="processos p/ o modo -f (0 = todos os núcleos)")
     args = ap.parse_args()
-    eng = SearchEngine()
+    if any(not 0 <= b <= 1 for _, b in args.b_campos): ap.error("--b-campos: b deve estar entre 0 e 1")
+    if (args.pesos or args.b_campos) and args.backend != "bm25f": ap.error("--pesos/--b-campos exigem --backend bm25f")
+    try:
+        eng = SearchEngine(idx=args.idx, backend=args.backend,
+                           pesos=dict(args.pesos) or None, b_campos=dict(args.b_campos) or None)
+    except ValueError as e:
+        ap.error(str(e))
 
     # 1) Modo batch (arquivo)
     if args.file:
+        jobs = args.jobs or os.cpu_count()
         with open(args.file, encoding="utf-8") as f:
-            linhas = list(eng.batch(f, topk=args.topk))
-        if args.output:
-            write_csv(linhas, args.output, args.topk)
-            print(f"✔ Resultados salvos em {args.output}")
-        else:
-            for q,res in linhas:
-                print(f"\n🔍  {q}")
-                print_table(res)
+            linhas = eng.batch(f, topk=args.topk, workers=jobs)   # gerador: grava conforme chega
+            if args.output:
+                write_csv(linhas, args.output, args.topk)
+                print(f"✔ Resultados salvos em {args.output}")
+            else:
+                for q,res in linhas:
+                    print(f"\n🔍  {q}")
+                    print_table(res)
         sys.exit()
 
     # 2) Query única pelo CLI
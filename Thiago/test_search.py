@@ -0,0 +1,36 @@
+import os
+import pytest
+from search import SearchEngine
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+IDX = os.path.join(DIR, "data", "indice_bm25.json")
+META = os.path.join(DIR, "data", "metadados_documentos.json")
+
+with open(os.path.join(DIR, "queries.txt"), encoding="utf-8") as f:
+    CONSULTAS = [q.strip() for q in f if q.strip()]
+
+
+@pytest.fixture(scope="module")
+def engines():
+    pytest.importorskip("numpy")
+    return {b: SearchEngine(idx=IDX, meta=META, backend=b, cache_size=0) for b in ("python", "numpy", "maxscore")}
+
+
+@pytest.mark.parametrize("k", [1, 5, 10, 50])
+@pytest.mark.parametrize("backend", ["numpy", "maxscore"])
+def test_mesmos_documentos_que_o_backend_python(engines, backend, k):
+    """Mesma lista de documentos (não só os mesmos scores), inclusive nos empates."""
+    for q in CONSULTAS:
+        esperado = [r["url"] for r in engines["python"].search(q, k)]
+        assert [r["url"] for r in engines[backend].search(q, k)] == esperado, q
+
+
+def test_cache_nao_muda_o_top_k():
+    """Top-k servido de um top-50 em cache é o mesmo calculado direto."""
+    pytest.importorskip("numpy")
+    com_cache = SearchEngine(idx=IDX, meta=META, backend="numpy")
+    sem_cache = SearchEngine(idx=IDX, meta=META, backend="numpy", cache_size=0)
+    for q in CONSULTAS:
+        com_cache.search(q, 50)
+        for k in (1, 5, 10):
+            assert com_cache.search(q, k) == sem_cache.search(q, k), q
@@ -0,0 +1,383 @@
+import os
+import json
+import gzip
+import hashlib
+import logging
+import threading
+from itertools import groupby
+
+# Quantidade de registros acumulados antes de forçar flush + fsync
+LOTE_FSYNC = 50
+# Compacta o log quando a fração de registros sobrescritos passa deste limite
+LIMITE_REDUNDANCIA = 0.3
+# Segmentos do arquivo de HTML são fechados ao passar deste tamanho (comprimido)
+TAMANHO_SEGMENTO = 64 * 1024 * 1024
+NIVEL_COMPRESSAO = 6
+
+
+def migrar_ids_processados(caminho_processados, caminho_ids):
+    """Converte, uma única vez, o processed_ads.json legado em um arquivo com um ID por linha
+
+    Esses IDs não são anúncios (não há dados deles): ficam fora do log e só entram no "já visto" do crawler.
+    """
+    if not os.path.exists(caminho_processados):
+        return 0
+    with open(caminho_processados, 'r', encoding='utf-8') as f:
+        ids = list(dict.fromkeys(json.load(f).get('processed_ids', [])))
+    caminho_tmp = caminho_ids + '.tmp'
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        for id_anuncio in carregar_ids_processados(caminho_ids) | set(ids):
+            f.write(f"{id_anuncio}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(caminho_tmp, caminho_ids)
+    # Removido só depois do replace: uma migração interrompida é refeita sem perder IDs
+    os.remove(caminho_processados)
+    logging.info(f"Migrados {len(ids)} IDs de {caminho_processados} para {caminho_ids}")
+    return len(ids)
+
+def carregar_ids_processados(caminho_ids):
+    """IDs legados já coletados (um por linha)"""
+    if not os.path.exists(caminho_ids):
+        return set()
+    with open(caminho_ids, 'r', encoding='utf-8') as f:
+        return {linha.strip() for linha in f if linha.strip()}
+
+
+class RegistroAnuncios:
+    """Log append-only de anúncios em JSONL (um anúncio por linha)"""
+
+    def __init__(self, caminho, lote_fsync=LOTE_FSYNC, limite_redundancia=LIMITE_REDUNDANCIA):
+        self.caminho = caminho
+        self.lote_fsync = lote_fsync
+        self.limite_redundancia = limite_redundancia
+        self.trava = threading.Lock()
+        self.arquivo = None
+        self.pendentes = 0
+        self.total_linhas = 0
+        self.ids = set()
+
+    def iterar(self):
+        """Lê o log em streaming, devolvendo um anúncio por vez"""
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            for numero, linha in enumerate(f, 1):
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError:
+                    # Linha truncada por interrupção durante a escrita
+                    logging.warning(f"Linha {numero} inválida em {self.caminho}. Ignorando.")
+
+    def carregar_ids(self):
+        """Percorre o log uma vez e registra os IDs vigentes (gravados e não removidos)"""
+        self.total_linhas = 0
+        self.ids = set()
+        for registro in self.iterar():
+            self.total_linhas += 1
+            self._registrar_id(registro)
+        return self.ids
+
+    def _registrar_id(self, registro):
+        if registro.get('removido'):
+            self.ids.discard(registro.get('id'))
+        elif registro.get('id'):
+            self.ids.add(registro['id'])
+
+    def migrar_json(self, caminho_json):
+        """Converte um anuncios.json legado (array) para o log, se o log ainda não existir"""
+        if os.path.exists(self.caminho) or not os.path.exists(caminho_json):
+            return 0
+        with open(caminho_json, 'r', encoding='utf-8') as f:
+            anuncios = json.load(f)
+        caminho_tmp = self.caminho + '.tmp'
+        with open(caminho_tmp, 'w', encoding='utf-8') as f:
+            for anuncio in anuncios:
+                f.write(json.dumps(anuncio, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(caminho_tmp, self.caminho)
+        logging.info(f"Migrados {len(anuncios)} anúncios de {caminho_json} para {self.caminho}")
+        return len(anuncios)
+
+    def adicionar(self, registro):
+        """Acrescenta um anúncio ao final do log"""
+        linha = json.dumps(registro, ensure_ascii=False) + '\n'
+        with self.trava:
+            if self.arquivo is None:
+                self._abrir_para_escrita()
+            self.arquivo.write(linha)
+            self.total_linhas += 1
+            self._registrar_id(registro)
+            self.pendentes += 1
+            if self.pendentes >= self.lote_fsync:
+                self._sincronizar()
+
+    def remover(self, id_anuncio):
+        """Marca um anúncio como removido (saiu da OLX); a indexação incremental o apaga do índice"""
+        self.adicionar({'id': id_anuncio, 'removido': True})
+
+    def _abrir_para_escrita(self):
+        # Uma linha truncada no fim do log não pode ser emendada ao próximo registro
+        termina_incompleto = False
+        if os.path.exists(self.caminho) and os.path.getsize(self.caminho) > 0:
+            with open(self.caminho, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                termina_incompleto = f.read(1) != b'\n'
+        self.arquivo = open(self.caminho, 'a', encoding='utf-8')
+        if termina_incompleto:
+            self.arquivo.write('\n')
+
+    def _sincronizar(self):
+        if self.arquivo is not None and self.pendentes:
+            self.arquivo.flush()
+            os.fsync(self.arquivo.fileno())
+            self.pendentes = 0
+
+    def sincronizar(self):
+        """Garante que os registros pendentes estejam gravados em disco"""
+        with self.trava:
+            self._sincronizar()
+
+    def precisa_compactar(self):
+        """Indica se a fração de linhas sobrescritas justifica uma compactação"""
+        if not self.total_linhas:
+            return False
+        redundantes = self.total_linhas - len(self.ids)
+        return redundantes / self.total_linhas > self.limite_redundancia
+
+    def _iterar_com_posicao(self):
+        """Como iterar, devolvendo (offset da linha em bytes, registro)"""
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, 'rb') as f:
+            posicao = 0
+            for linha in f:
+                inicio, posicao = posicao, posicao + len(linha)
+                if not linha.strip():
+                    continue
+                try:
+                    yield inicio, json.loads(linha)
+                except json.JSONDecodeError:
+                    logging.warning(f"Linha inválida no offset {inicio} de {self.caminho}. Ignorando.")
+
+    def compactar(self, offset_lido=None):
+        """Reescreve o log mantendo apenas a versão mais recente de cada anúncio (removidos saem do log)
+
+        offset_lido é a posição do log já aplicada pela indexação incremental. Os registros a partir
+        dela (inclusive remoções) são mantidos no fim do log novo, e a posição equivalente no log novo
+        é devolvida junto com o total de linhas: (mantidas, novo offset_lido).
+        """
+        with self.trava:
+            self._sincronizar()
+            if self.arquivo is not None:
+                self.arquivo.close()
+                self.arquivo = None
+
+            # 1ª passada: número da última linha de cada ID
+            ultima_linha = {}
+            for numero, (_, registro) in enumerate(self._iterar_com_posicao()):
+                if registro.get('id'):
+                    ultima_linha[registro['id']] = numero
+
+            # 2ª passada: grava somente as linhas vigentes. A ordem é mantida, então as linhas ainda
+            # não indexadas continuam depois de todas as já indexadas
+            caminho_tmp = self.caminho + '.tmp'
+            mantidas = tamanho = 0
+            novo_offset = None
+            self.ids = set()
+            with open(caminho_tmp, 'wb') as f:
+                for numero, (posicao, registro) in enumerate(self._iterar_com_posicao()):
+                    id_anuncio = registro.get('id')
+                    pendente = offset_lido is not None and posicao >= offset_lido
+                    if id_anuncio and (ultima_linha.get(id_anuncio) != numero or (registro.get('removido') and not pendente)):
+                        continue
+                    if pendente and novo_offset is None:
+                        novo_offset = tamanho
+                    linha = (json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8')
+                    f.write(linha)
+                    tamanho += len(linha)
+                    mantidas += 1
+                    self._registrar_id(registro)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(caminho_tmp, self.caminho)
+
+            logging.info(f"Log compactado: {self.total_linhas} -> {mantidas} registros")
+            self.total_linhas = mantidas
+            if offset_lido is not None and novo_offset is None:
+                novo_offset = tamanho
+            return mantidas, novo_offset
+
+    def fechar(self):
+        """Sincroniza e fecha o arquivo do log"""
+        with self.trava:
+            self._sincronizar()
+            if self.arquivo is not None:
+                self.arquivo.close()
+                self.arquivo = None
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def ler_membro(arquivo, entrada):
+    """Página de uma entrada do índice, a partir do segmento já aberto"""
+    arquivo.seek(entrada['offset'])
+    return gzip.decompress(arquivo.read(entrada['tamanho'])).decode('utf-8')
+
+def ler_membros(caminho_segmento, entradas):
+    """Lê de um segmento as páginas das entradas dadas (em ordem de offset): (entrada, html)"""
+    with open(caminho_segmento, 'rb') as f:
+        for entrada in entradas:
+            yield entrada, ler_membro(f, entrada)
+
+
+class ArquivoHtml:
+    """Arquivo de páginas HTML em segmentos gzip (um membro por página), com índice por ID e deduplicação por hash"""
+
+    def __init__(self, diretorio, tamanho_segmento=TAMANHO_SEGMENTO, nivel_compressao=NIVEL_COMPRESSAO):
+        self.diretorio = diretorio
+        self.caminho_indice = os.path.join(diretorio, 'indice.jsonl')
+        self.tamanho_segmento = tamanho_segmento
+        self.nivel_compressao = nivel_compressao
+        self.trava = threading.Lock()
+        self.arquivo = None
+        self.arquivo_indice = None
+        self.segmento_atual = 0
+        self.entradas = {}  # ID -> entrada mais recente do índice
+        self.por_hash = {}  # sha1 do HTML -> (segmento, offset, tamanho)
+        os.makedirs(diretorio, exist_ok=True)
+        self._carregar_indice()
+
+    def caminho_segmento(self, segmento):
+        return os.path.join(self.diretorio, f"segmento-{segmento:05d}.html.gz")
+
+    def _carregar_indice(self):
+        """Lê o índice; entradas que apontam além do fim do segmento (escrita interrompida) são ignoradas"""
+        tamanhos = {}
+        if not os.path.exists(self.caminho_indice):
+            return
+        with open(self.caminho_indice, 'r', encoding='utf-8') as f:
+            for numero, linha in enumerate(f, 1):
+                try:
+                    entrada = json.loads(linha)
+                except json.JSONDecodeError:
+                    logging.warning(f"Linha {numero} inválida em {self.caminho_indice}. Ignorando.")
+                    continue
+                segmento = entrada['segmento']
+                if segmento not in tamanhos:
+                    caminho = self.caminho_segmento(segmento)
+                    tamanhos[segmento] = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+                if entrada['offset'] + entrada['tamanho'] > tamanhos[segmento]:
+                    continue
+                self.entradas[entrada['id']] = entrada
+                self.por_hash[entrada['hash']] = (segmento, entrada['offset'], entrada['tamanho'])
+        if tamanhos:
+            self.segmento_atual = max(tamanhos)
+
+    def guardar(self, id_anuncio, conteudo_html, url=None, estado=None):
+        """Grava a página (se o conteúdo ainda não estiver no arquivo) e atualiza o índice. Retorna a entrada"""
+        dados = conteudo_html.encode('utf-8')
+        digest = hashlib.sha1(dados).hexdigest()
+        with self.trava:
+            atual = self.entradas.get(id_anuncio)
+            if atual is not None and atual['hash'] == digest:
+                return atual
+            local = self.por_hash.get(digest)
+            if local is None:
+                local = self._gravar_membro(gzip.compress(dados, compresslevel=self.nivel_compressao, mtime=0))
+                self.por_hash[digest] = local
+            segmento, offset, tamanho = local
+            entrada = {
+                'id': id_anuncio, 'url': url, 'estado': estado, 'hash': digest,
+                'segmento': segmento, 'offset': offset, 'tamanho': tamanho, 'bytes': len(dados),
+            }
+            if self.arquivo_indice is None:
+                self.arquivo_indice = open(self.caminho_indice, 'a', encoding='utf-8')
+            self.arquivo_indice.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+            self.arquivo_indice.flush()
+            self.entradas[id_anuncio] = entrada
+            return entrada
+
+    def _gravar_membro(self, membro):
+        # Cada página é um membro gzip independente: dá para ler só ela com seek(offset) + read(tamanho)
+        if self.arquivo is None:
+            self.arquivo = open(self.caminho_segmento(self.segmento_atual), 'ab')
+        if self.arquivo.tell() >= self.tamanho_segmento:
+            self.arquivo.close()
+            self.segmento_atual += 1
+            self.arquivo = open(self.caminho_segmento(self.segmento_atual), 'ab')
+        offset = self.arquivo.tell()
+        self.arquivo.write(membro)
+        self.arquivo.flush()
+        return self.segmento_atual, offset, len(membro)
+
+    # ---------- leitura ----------
+
+    def ler_entrada(self, entrada):
+        """Conteúdo HTML de uma entrada do índice"""
+        with open(self.caminho_segmento(entrada['segmento']), 'rb') as f:
+            return ler_membro(f, entrada)
+
+    def ler(self, id_anuncio):
+        """HTML mais recente do anúncio, ou None se não estiver no arquivo"""
+        entrada = self.entradas.get(id_anuncio)
+        return self.ler_entrada(entrada) if entrada else None
+
+    def por_segmento(self):
+        """Entradas vigentes agrupadas por segmento, em ordem de offset (leitura sequencial)"""
+        entradas = sorted(self.entradas.values(), key=lambda e: (e['segmento'], e['offset']))
+        return {segmento: list(grupo) for segmento, grupo in groupby(entradas, key=lambda e: e['segmento'])}
+
+    def iterar(self):
+        """Percorre as páginas vigentes na ordem física dos segmentos: (entrada, html)"""
+        for segmento, entradas in self.por_segmento().items():
+            yield from ler_membros(self.caminho_segmento(segmento), entradas)
+
+    def migrar_html_soltos(self, anuncios=()):
+        """Importa os arquivos ad_<id>.html antigos (com url e estado tirados do log `anuncios`) e os apaga"""
+        nomes = sorted(n for n in os.listdir(self.diretorio) if n.startswith('ad_') and n.endswith('.html'))
+        if not nomes:
+            return 0
+        metadados = {}
+        for anuncio in anuncios:
+            if anuncio.get('id') and not anuncio.get('removido'):
+                metadados[anuncio['id']] = anuncio
+        importados = 0
+        for nome in nomes:
+            id_anuncio = nome[3:-5]
+            # Uma migração interrompida já pode ter importado a página antes de apagar o arquivo
+            if id_anuncio not in self.entradas:
+                with open(os.path.join(self.diretorio, nome), 'r', encoding='utf-8') as f:
+                    anuncio = metadados.get(id_anuncio, {})
+                    self.guardar(id_anuncio, f.read(), url=anuncio.get('url'), estado=anuncio.get('estado'))
+                importados += 1
+        # Os arquivos soltos só são apagados depois que segmento e índice estão em disco
+        self.sincronizar()
+        for nome in nomes:
+            os.remove(os.path.join(self.diretorio, nome))
+        logging.info(f"Migradas {importados} páginas HTML soltas para {self.diretorio}")
+        return importados
+
+    def sincronizar(self):
+        """Garante que segmento e índice estejam gravados em disco"""
+        with self.trava:
+            for arquivo in (self.arquivo, self.arquivo_indice):
+                if arquivo is not None:
+                    arquivo.flush()
+                    os.fsync(arquivo.fileno())
+
+    def fechar(self):
+        self.sincronizar()
+        with self.trava:
+            for arquivo in (self.arquivo, self.arquivo_indice):
+                if arquivo is not None:
+                    arquivo.close()
+            self.arquivo = self.arquivo_indice = None
+
+    def __len__(self):
+        return len(self.entradas)
@@ -0,0 +1,219 @@
+# Também usado pelos indexadores do Pedro (o Pedro/Dockerfile copia este arquivo para a imagem).
+import os
+import re
+from functools import lru_cache
+import numpy as np
+
+# Um termo vira bitmap quando a lista de doc-ids (4 bytes cada) ficaria maior que N/8 bytes
+BYTES_POR_DOC = 4
+TAMANHO_CACHE_BITMAPS = 4096
+
+LISTA, BITS = 0, 1
+OPERADORES = ('AND', 'OR', 'NOT')
+
+# Quantidade de bits ligados em cada byte (popcount por tabela)
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _abrir_binario(caminho, dtype):
+    # np.memmap não abre arquivo vazio
+    if os.path.getsize(caminho) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(caminho, dtype=dtype, mode='r')
+
+
+class Bitmap:
+    """Conjunto de doc-ids inteiros em um array de bits compactado (uint8, bit menos significativo primeiro)"""
+    __slots__ = ('bits', 'n')
+
+    def __init__(self, bits, n):
+        self.bits = bits
+        self.n = n
+
+    @classmethod
+    def vazio(cls, n):
+        return cls(np.zeros((n + 7) // 8, dtype=np.uint8), n)
+
+    @classmethod
+    def de_docs(cls, docs, n):
+        bitmap = cls.vazio(n)
+        docs = np.asarray(docs, dtype=np.int64)
+        np.bitwise_or.at(bitmap.bits, docs >> 3, (1 << (docs & 7)).astype(np.uint8))
+        return bitmap
+
+    @classmethod
+    def de_mascara(cls, mascara):
+        """Converte um array booleano por doc-id (ex.: faixa do IndiceNumerico)"""
+        return cls(np.packbits(mascara, bitorder='little'), len(mascara))
+
+    def __and__(self, outro):
+        return Bitmap(self.bits & outro.bits, self.n)
+
+    def __or__(self, outro):
+        return Bitmap(self.bits | outro.bits, self.n)
+
+    def __sub__(self, outro):
+        return Bitmap(self.bits & ~outro.bits, self.n)
+
+    def __len__(self):
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def docs(self):
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.n, bitorder='little'))
+
+    def mascara(self):
+        return np.unpackbits(self.bits, count=self.n, bitorder='little').astype(bool)
+
+
+class _Cursor:
+    """Tokens de uma consulta e a posição de leitura do parser"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def proximo(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+
+class IndiceBitmap:
+    """Índice invertido sobre doc-ids inteiros, com consultas booleanas AND/OR/NOT"""
+
+    def __init__(self, ids, termos, tipos, inicios, fins, listas, bits, normalizar=None):
+        self.ids = list(ids)
+        self.n = len(self.ids)
+        self.termos = {termo: i for i, termo in enumerate(termos)}
+        self.tipos, self.inicios, self.fins = tipos, inicios, fins
+        self.listas, self.blob_bits = listas, bits
+        # Função aplicada a cada termo da consulta (ex.: stemming do valor em campo:valor)
+        self.normalizar = normalizar
+        self.universo = Bitmap.de_docs([doc for doc, id_doc in enumerate(self.ids) if id_doc], self.n)
+        self.bitmap = lru_cache(maxsize=TAMANHO_CACHE_BITMAPS)(self._decodificar)
+
+    @classmethod
+    def construir(cls, postings, ids, normalizar=None):
+        """Monta o índice a partir de pares (termo, doc-ids inteiros)"""
+        pares = sorted((termo, np.unique(np.asarray(list(docs), dtype=np.uint32))) for termo, docs in postings)
+        listas, bits = [], []
+        termos, tipos, inicios, fins = cls._containers(pares, len(ids), listas.append, bits.append)
+        return cls(
+            ids, termos, tipos, inicios, fins,
+            np.concatenate(listas) if listas else np.zeros(0, dtype=np.uint32),
+            np.concatenate(bits) if bits else np.zeros(0, dtype=np.uint8),
+            normalizar,
+        )
+
+    @classmethod
+    def construir_em_disco(cls, pares, ids, diretorio, normalizar=None):
+        """Como construir, para pares (termo, doc-ids ordenados e sem repetição) já em ordem de termo:
+        listas e bits são gravados em `diretorio` e abertos com memmap, sem juntar tudo em memória"""
+        caminho_listas = os.path.join(diretorio, 'listas.bin')
+        caminho_bits = os.path.join(diretorio, 'bits.bin')
+        with open(caminho_listas, 'wb') as f_listas, open(caminho_bits, 'wb') as f_bits:
+            termos, tipos, inicios, fins = cls._containers(pares, len(ids), lambda a: a.tofile(f_listas), lambda a: a.tofile(f_bits))
+        return cls(ids, termos, tipos, inicios, fins,
+                   _abrir_binario(caminho_listas, np.uint32), _abrir_binario(caminho_bits, np.uint8), normalizar)
+
+    @staticmethod
+    def _containers(pares, n, gravar_lista, gravar_bits):
+        """Escolhe o container de cada termo e entrega os dados a gravar_lista/gravar_bits, na ordem"""
+        bytes_bitmap = (n + 7) // 8
+        termos, tipos, inicios, fins = [], [], [], []
+        tamanho_listas = tamanho_bits = 0
+        for termo, docs in pares:
+            termos.append(termo)
+            # Escolha do container por termo, como no roaring: lista para termos raros, bits para frequentes
+            if len(docs) * BYTES_POR_DOC > bytes_bitmap:
+                tipos.append(BITS)
+                inicios.append(tamanho_bits)
+                gravar_bits(Bitmap.de_docs(docs, n).bits)
+                tamanho_bits += bytes_bitmap
+                fins.append(tamanho_bits)
+            else:
+                tipos.append(LISTA)
+                inicios.append(tamanho_listas)
+                gravar_lista(np.asarray(docs, dtype=np.uint32))
+                tamanho_listas += len(docs)
+                fins.append(tamanho_listas)
+        return termos, np.array(tipos, dtype=np.uint8), np.array(inicios, dtype=np.int64), np.array(fins, dtype=np.int64)
+
+    def _decodificar(self, termo):
+        i = self.termos.get(termo)
+        if i is None:
+            return Bitmap.vazio(self.n)
+        inicio, fim = self.inicios[i], self.fins[i]
+        if self.tipos[i] == BITS:
+            return Bitmap(self.blob_bits[inicio:fim], self.n)
+        return Bitmap.de_docs(self.listas[inicio:fim], self.n)
+
+    # ---------- consultas ----------
+
+    def consultar(self, expressao):
+        """Avalia uma expressão como 'marca:honda AND (cambio:automat OR NOT cor:pret)'"""
+        tokens = re.findall(r'\(|\)|[^\s()]+', expressao)
+        if not tokens:
+            return Bitmap.vazio(self.n)
+        # O estado do parser é local à chamada: o mesmo índice atende várias threads
+        cursor = _Cursor(tokens)
+        resultado = self._ou(cursor)
+        if cursor.pos < len(tokens):
+            raise ValueError(f"Consulta inválida perto de '{tokens[cursor.pos]}'")
+        return resultado
+
+    def _ou(self, cursor):
+        resultado = self._e(cursor)
+        while cursor.proximo() == 'OR':
+            cursor.pos += 1
+            resultado = resultado | self._e(cursor)
+        return resultado
+
+    def _e(self, cursor):
+        # Termos lado a lado sem operador também são combinados com AND
+        resultado = self._fator(cursor)
+        while cursor.proximo() not in (None, ')', 'OR'):
+            if cursor.proximo() == 'AND':
+                cursor.pos += 1
+            resultado = resultado & self._fator(cursor)
+        return resultado
+
+    def _fator(self, cursor):
+        token = cursor.proximo()
+        cursor.pos += 1
+        if token == 'NOT':
+            return self.universo - self._fator(cursor)
+        if token == '(':
+            resultado = self._ou(cursor)
+            if cursor.proximo() != ')':
+                raise ValueError("Consulta inválida: ')' esperado")
+            cursor.pos += 1
+            return resultado
+        if token is None or token == ')' or token in OPERADORES:
+            raise ValueError(f"Consulta inválida: termo esperado, encontrado '{token}'")
+        if token not in self.termos and self.normalizar:
+            token = self.normalizar(token)
+            if token is None:
+                return Bitmap.vazio(self.n)
+        return self.bitmap(token)
+
+    def ids_do_bitmap(self, bitmap):
+        return [self.ids[doc] for doc in bitmap.docs()]
+
+    # ---------- persistência ----------
+
+    def salvar(self, caminho):
+        caminho_tmp = caminho + '.tmp'
+        termos = sorted(self.termos, key=self.termos.get)
+        with open(caminho_tmp, 'wb') as f:
+            np.savez_compressed(
+                f, ids=np.array([i or '' for i in self.ids], dtype=str), termos=np.array(termos, dtype=str),
+                tipos=self.tipos, inicios=self.inicios, fins=self.fins, listas=self.listas, bits=self.blob_bits,
+            )
+        os.replace(caminho_tmp, caminho)
+
+    @classmethod
+    def carregar(cls, caminho, normalizar=None):
+        with np.load(caminho) as dados:
+            return cls(
+                [i or None for i in dados['ids'].tolist()], dados['termos'].tolist(),
+                dados['tipos'], dados['inicios'], dados['fins'], dados['listas'], dados['bits'], normalizar,
+            )
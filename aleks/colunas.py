@@ -0,0 +1,148 @@
+import os
+import numpy as np
+
+# Campos numéricos armazenados em colunas (doc values)
+CAMPOS_NUMERICOS = ('preco', 'quilometragem', 'ano')
+
+
+# Conversão dos valores brutos da OLX para números
+def valor_preco(preco):
+    if not preco:
+        return None
+    preco = str(preco).replace('R$', '').replace('.', '').replace(',', '.').strip()
+    try:
+        return float(preco)
+    except Exception:
+        return None
+
+def valor_km(km):
+    if not km:
+        return None
+    km = str(km).replace('.', '').replace('km', '').strip()
+    try:
+        return int(km)
+    except Exception:
+        return None
+
+def valor_ano(ano):
+    if not ano:
+        return None
+    try:
+        return int(ano)
+    except Exception:
+        return None
+
+CONVERSORES = {'preco': valor_preco, 'quilometragem': valor_km, 'ano': valor_ano}
+
+
+class IndiceNumerico:
+    """Colunas numéricas por doc-id inteiro, com cópia ordenada para consultas por faixa"""
+
+    def __init__(self, ids=(), valores=None):
+        # Dicionário de doc-ids: posição no array <-> ID do anúncio
+        self.ids = list(ids)
+        self.doc_por_id = {id_anuncio: doc for doc, id_anuncio in enumerate(self.ids) if id_anuncio}
+        self.valores = valores or {campo: np.full(len(self.ids), np.nan) for campo in CAMPOS_NUMERICOS}
+        self._ordenar()
+
+    @classmethod
+    def construir(cls, anuncios):
+        """Monta as colunas a partir de um iterável de anúncios (uma passada)"""
+        ids, colunas = [], {campo: [] for campo in CAMPOS_NUMERICOS}
+        for anuncio in anuncios:
+            ids.append(anuncio['id'])
+            for campo in CAMPOS_NUMERICOS:
+                valor = CONVERSORES[campo](anuncio.get(campo))
+                colunas[campo].append(np.nan if valor is None else valor)
+        return cls(ids, {campo: np.array(v, dtype=np.float64) for campo, v in colunas.items()})
+
+    def _ordenar(self):
+        # Para cada campo: doc-ids ordenados pelo valor (sem os ausentes) e os valores nessa ordem
+        self.ordem, self.ordenados = {}, {}
+        for campo, coluna in self.valores.items():
+            presentes = np.flatnonzero(~np.isnan(coluna))
+            ordem = presentes[np.argsort(coluna[presentes], kind='stable')]
+            self.ordem[campo] = ordem
+            self.ordenados[campo] = coluna[ordem]
+
+    def __len__(self):
+        return len(self.doc_por_id)
+
+    def atualizar(self, alterados):
+        """Aplica anúncios novos/alterados (ID -> anúncio) e removidos (ID -> None)"""
+        novos_ids, novos_valores = [], {campo: [] for campo in CAMPOS_NUMERICOS}
+        for id_anuncio, anuncio in alterados.items():
+            doc = self.doc_por_id.get(id_anuncio)
+            if anuncio is None:
+                # O doc-id não é reaproveitado: a posição fica vazia (sem ID e sem valores)
+                if doc is not None:
+                    del self.doc_por_id[id_anuncio]
+                    self.ids[doc] = None
+                    for coluna in self.valores.values():
+                        coluna[doc] = np.nan
+                continue
+            valores = {campo: CONVERSORES[campo](anuncio.get(campo)) for campo in CAMPOS_NUMERICOS}
+            if doc is None:
+                self.doc_por_id[id_anuncio] = len(self.ids) + len(novos_ids)
+                novos_ids.append(id_anuncio)
+                for campo, valor in valores.items():
+                    novos_valores[campo].append(np.nan if valor is None else valor)
+            else:
+                for campo, valor in valores.items():
+                    self.valores[campo][doc] = np.nan if valor is None else valor
+        if novos_ids:
+            self.ids.extend(novos_ids)
+            for campo in CAMPOS_NUMERICOS:
+                self.valores[campo] = np.concatenate([self.valores[campo], np.array(novos_valores[campo], dtype=np.float64)])
+        self._ordenar()
+
+    # ---------- consultas ----------
+
+    def intervalo(self, campo, minimo=None, maximo=None):
+        """Bitmap (array booleano por doc-id) dos anúncios com minimo <= campo <= maximo"""
+        ordenados = self.ordenados[campo]
+        inicio = 0 if minimo is None else np.searchsorted(ordenados, minimo, side='left')
+        fim = len(ordenados) if maximo is None else np.searchsorted(ordenados, maximo, side='right')
+        bitmap = np.zeros(len(self.ids), dtype=bool)
+        bitmap[self.ordem[campo][inicio:fim]] = True
+        return bitmap
+
+    def bitmap_ids(self, ids):
+        """Converte uma lista de postings (IDs de anúncio) em bitmap, para cruzar com as faixas"""
+        bitmap = np.zeros(len(self.ids), dtype=bool)
+        docs = [self.doc_por_id[i] for i in ids if i in self.doc_por_id]
+        bitmap[docs] = True
+        return bitmap
+
+    def filtrar(self, postings=(), **faixas):
+        """IDs que estão em todos os postings e em todas as faixas, ex.: preco=(35000, 52000)"""
+        bitmap = np.ones(len(self.ids), dtype=bool)
+        for campo, (minimo, maximo) in faixas.items():
+            bitmap &= self.intervalo(campo, minimo, maximo)
+        for ids in postings:
+            bitmap &= self.bitmap_ids(ids)
+        return self.ids_do_bitmap(bitmap)
+
+    def ids_do_bitmap(self, bitmap):
+        return [self.ids[doc] for doc in np.flatnonzero(bitmap)]
+
+    def valor(self, campo, id_anuncio):
+        doc = self.doc_por_id.get(id_anuncio)
+        if doc is None or np.isnan(self.valores[campo][doc]):
+            return None
+        return float(self.valores[campo][doc])
+
+    # ---------- persistência ----------
+
+    def salvar(self, caminho):
+        caminho_tmp = caminho + '.tmp'
+        with open(caminho_tmp, 'wb') as f:
+            np.savez(f, ids=np.array([i or '' for i in self.ids], dtype=str), **self.valores)
+        os.replace(caminho_tmp, caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        with np.load(caminho) as dados:
+            ids = [i or None for i in dados['ids'].tolist()]
+            valores = {campo: dados[campo].astype(np.float64) for campo in CAMPOS_NUMERICOS}
+        return cls(ids, valores)
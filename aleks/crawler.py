@@ -13,65 +13,65 @@ from urllib.parse import urlparse, parse_qs, urljoin
 import cloudscraper
 import backoff
 import re
+import threading
+from html import unescape
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from limitador import LimitadoresPorHost
+from armazenamento import RegistroAnuncios, ArquivoHtml, migrar_ids_processados, carregar_ids_processados
+from extracao import ExtratorAnuncios
+from revalidacao import AgendaRevalidacao
+from fronteira import FronteiraRastreamento, LISTAGEM, ANUNCIO
 
-# Configuração de logging
+# Configuração de logging (o arquivo fica em data/, junto dos dados, e não no diretório de onde o script é chamado)
+DIRETORIO_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+os.makedirs(DIRETORIO_LOG, exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler("crawler.log"),
+        logging.FileHandler(os.path.join(DIRETORIO_LOG, "crawler.log")),
         logging.StreamHandler()
     ]
 )
 
-# Constantes para seletores HTML
-TITULO_SELECTOR = 'h1.olx-text--title-large, h1.olx-text--title-xlarge, h1.olx-ad-title, span[data-testid="ad-title"]'
-DETALHES_CONTAINER_SELECTOR = 'div.ad__sc-2h9gkk-0.dLQbjb'
-DETALHES_ALTERNATIVOS_SELECTOR_1 = 'div[data-ds-component="DS-AdDetails"] div[data-testid="ad-properties-item"]'
-DETALHES_ALTERNATIVOS_SELECTOR_2 = 'div[data-testid="ad-properties"] div[data-testid="ad-properties-item"], div[data-testid="properties-card"] div[data-testid="ad-properties-item"]'
-PRECO_CONTAINER_SELECTOR = 'div#price-box-container'
-PRECO_SPAN_SELECTOR = 'span.olx-text--title-large, span[class*="title-large"]'
-PRECO_ALTERNATIVO_SELECTOR = 'div[data-testid="ad-price-wrapper"] span, span[data-ds-component="DS-Text"][class*="olx-text--title"]'
-PRECO_REGEX_PATTERN = r'R\$\s*[\d.,]+'
-
 # Constantes para tempo de espera (em segundos)
-TEMPO_ESPERA_REQUISICAO = (0.2, 2)
 TEMPO_ESPERA_SESSAO_INICIAL = (2, 5)
 TEMPO_ESPERA_CATEGORIA = (3, 7)
-TEMPO_ESPERA_APOS_BLOQUEIO = (120, 300)
-TEMPO_ESPERA_APOS_403 = (60, 180)
-TEMPO_ESPERA_ENTRE_ANUNCIOS = (1, 3)
 TEMPO_ESPERA_PROXIMA_PAGINA = (15, 30)
-TEMPO_ESPERA_PROXIMO_ESTADO = (60, 180)
-TEMPO_ESPERA_ERROS_CONSECUTIVOS = (300, 600)  # 5-10 minutos
-TEMPO_ESPERA_SEM_ANUNCIOS = (60, 120)
+TEMPO_ESPERA_ERROS_CONSECUTIVOS = (300, 600)  # 5-10 minutos (só o estado com erros fica parado)
+TEMPO_ESPERA_NOVA_TENTATIVA = 30  # dobra a cada falha do mesmo item da fronteira
+
+# Orçamento de requisições por host: a taxa inicial sobe com respostas saudáveis
+# e cai pela metade a cada bloqueio (controle AIMD do limitador)
+REQUISICOES_POR_SEGUNDO = 1.0
+RAJADA_MAXIMA = 2
+MAX_REQUISICOES_PARALELAS = 1  # 1 = modo sequencial (uma requisição por vez, no ritmo do limitador)
 
-# Seletores para links de anúncios
-SELETORES_ANUNCIOS_PRIMARIOS = [
-    'a[data-testid="adcard-link"]',  # Novo seletor principal da OLX (2024)
-    'a.AdCard_link__4c7W6',  # Seletor de classe do card de anúncio
-    'a[href*="/autos-e-pecas/carros-vans-e-utilitarios/"][href*="-"]', # Links de anúncios específicos
-    'a[data-testid="ad-card-link"]',  # Outro seletor possível
-    'div[data-testid="listing-card"] a', # Seletor alternativo
-    'a[data-ds-component="DS-Link"][href*="/item"]', # Formato de link
-    'div[data-testid="ad-card"] a',
-    'section[data-ds-component="DS-AdCard"] a',
-    'div[data-ds-component="DS-AdCard"] a'
-]
+# Sinais de bloqueio: status HTTP e marcadores de páginas de bloqueio/captcha servidas com 200
+STATUS_BLOQUEIO = {403: 'http_403', 429: 'http_429'}
+MARCADORES_BLOQUEIO = {
+    'Access Denied': 'acesso_negado',
+    'Forbidden': 'acesso_negado',
+    'cf_chl_opt': 'captcha',
+    '<title>Just a moment...</title>': 'captcha',
+    'geo.captcha-delivery.com': 'captcha',
+}
 
-SELETORES_ANUNCIOS_ALTERNATIVOS = [
-    'a[href*="/item/"]',  # Links de item genérico
-    'a[data-lurker-detail="list_id"]',  # Seletor antigo
-    'a[href*="olx.com.br/autos-e-pecas/carros"]',  # Links diretos para carros
-    'a.olx-ad-card__link-wrapper',  # Classe específica de cards
-    'a[href*="carros-vans-e-utilitarios/"]'  # Padrão de URL para carros
-]
+# Modo de atualização: máximo de anúncios conhecidos revisitados por execução
+MAX_REVALIDACOES = 500
 
-# Lista de marcas comuns para extração do título
-MARCAS_COMUNS = ['honda', 'toyota', 'volkswagen', 'vw', 'fiat', 'chevrolet', 'ford', 'hyundai', 'nissan', 'renault']
+# Links de anúncios: uma única passada de regex sobre o HTML da listagem pega
+# todos os href de <a> e aplica todos os padrões de URL de anúncio de uma vez
+# (substitui a cascata de seletores CSS do BeautifulSoup)
+PADRAO_HREF_LINK = re.compile(r'''<a\b[^>]*?\shref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+# Só páginas de detalhe: o caminho termina no ID numérico do anúncio (ex.: .../chevrolet-onix-2020-1234567890),
+# o que descarta paginação (?o=2), filtros e links de navegação que todo <a> da listagem também traz
+PADRAO_URL_ANUNCIO = re.compile(
+    r'(?:/item|/anuncio|/d|/carros-vans-e-utilitarios)/(?:[^?#\s]*?[-/])?(?:id-)?\d{6,}/?(?:[?#]|$)'
+)
 
 class OlxCrawler:
-    def __init__(self):
+    def __init__(self, max_paralelo=MAX_REQUISICOES_PARALELAS, requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO):
         # Mapeamento de siglas de estados para nomes completos
         self.estados = {
             'ac': 'Acre',
@@ -109,12 +109,34 @@ class OlxCrawler:
         self.diretorio_dados = os.path.join(self.diretorio_script, "data")
         self.diretorio_html = os.path.join(self.diretorio_dados, "html")
         self.arquivo_json = os.path.join(self.diretorio_dados, "anuncios.json")
+        self.arquivo_jsonl = os.path.join(self.diretorio_dados, "anuncios.jsonl")
+        self.arquivo_debug = os.path.join(self.diretorio_dados, "debug_extracao.txt")
+        self.arquivo_metricas = os.path.join(self.diretorio_dados, "metricas_crawler.json")
         
         self.anuncios_processados = set()  
-        self.dados_coletados = []  
-        
-        self.sessao = self._criar_sessao_http()
-        
+        self.registro_anuncios = RegistroAnuncios(self.arquivo_jsonl)
+        # Páginas dos anúncios em segmentos gzip com índice por ID (em vez de um .html por anúncio)
+        self.arquivo_html = ArquivoHtml(self.diretorio_html)
+        # ETag/Last-Modified, impressão do conteúdo e histórico de preço para revisitar anúncios conhecidos
+        self.revalidacao = AgendaRevalidacao(os.path.join(self.diretorio_dados, "revalidacao.jsonl"))
+        # Fila persistente de páginas de listagem e anúncios: uma interrupção retoma do mesmo ponto
+        self.fronteira = FronteiraRastreamento(os.path.join(self.diretorio_dados, "fronteira.db"))
+        self.erros_por_estado = {}
+        self.parar = threading.Event()
+        self.extrator = ExtratorAnuncios()
+        self.trava_dados = threading.Lock()
+        
+        # Modo concorrente: anúncios de uma página são baixados em paralelo.
+        # Em qualquer modo o ritmo é dado por um token bucket por host, com taxa ajustada pelos bloqueios observados
+        self.max_paralelo = max(1, int(max_paralelo))
+        self.limitadores = LimitadoresPorHost(requisicoes_por_segundo, RAJADA_MAXIMA)
+        
+        # Uma sessão HTTP por thread (sessões do requests/cloudscraper não são thread-safe);
+        # reiniciar a sessão só troca a geração, e cada thread recria a sua na próxima requisição
+        self.sessoes_por_thread = threading.local()
+        self.geracao_sessao = 0
+        
+        # Cookies compartilhados entre as threads, sempre acessados sob trava_dados
         self.cookies = self._obter_cookies_iniciais()
         
         self._criar_diretorios()
@@ -132,6 +154,20 @@ class OlxCrawler:
             delay=10
         )
     
+    @property
+    def sessao(self):
+        """Sessão HTTP da thread atual, recriada se a sessão foi reiniciada desde a última requisição"""
+        local = self.sessoes_por_thread
+        if getattr(local, 'geracao', None) != self.geracao_sessao:
+            local.sessao = self._criar_sessao_http()
+            local.geracao = self.geracao_sessao
+        return local.sessao
+    
+    def reiniciar_sessoes(self):
+        """Descarta as sessões HTTP de todas as threads (cada uma cria outra na próxima requisição)"""
+        with self.trava_dados:
+            self.geracao_sessao += 1
+    
     def _obter_cookies_iniciais(self):
         """Retorna os cookies iniciais para a sessão"""
         return {
@@ -150,56 +186,63 @@ class OlxCrawler:
     
     def _carregar_dados_salvos(self):
         """Carrega dados de execuções anteriores"""
-        self._carregar_anuncios_processados()
         self._carregar_dados_coletados()
     
     def _carregar_anuncios_processados(self):
-        """Carrega IDs de anúncios já processados anteriormente"""
+        """IDs do processed_ads.json de execuções antigas: convertidos uma vez para ids_processados.txt,
+        fora do log de anúncios, e usados só para não coletar esses anúncios de novo"""
         arquivo_processados = os.path.join(self.diretorio_dados, "processed_ads.json")
-        if os.path.exists(arquivo_processados):
-            try:
-                with open(arquivo_processados, 'r', encoding='utf-8') as f:
-                    dados = json.load(f)
-                    self.anuncios_processados = set(dados.get("processed_ids", []))
-                logging.info(f"Carregados {len(self.anuncios_processados)} anúncios processados anteriormente.")
-            except Exception as e:
-                logging.error(f"Erro ao carregar anúncios processados: {e}")
-                self.anuncios_processados = set()
+        arquivo_ids = os.path.join(self.diretorio_dados, "ids_processados.txt")
+        try:
+            migrar_ids_processados(arquivo_processados, arquivo_ids)
+            self.anuncios_processados.update(carregar_ids_processados(arquivo_ids))
+        except Exception as e:
+            logging.error(f"Erro ao carregar anúncios processados: {e}")
     
     def _carregar_dados_coletados(self):
-        """Carrega dados de anúncios já coletados anteriormente"""
-        if os.path.exists(self.arquivo_json):
-            try:
-                with open(self.arquivo_json, 'r', encoding='utf-8') as f:
-                    self.dados_coletados = json.load(f)
-                logging.info(f"Carregados {len(self.dados_coletados)} anúncios do arquivo JSON.")
-            except Exception as e:
-                logging.error(f"Erro ao carregar dados dos anúncios: {e}")
-                self.dados_coletados = []
-    
-    def salvar_dados(self):
-        """Salva todos os dados coletados em arquivos"""
-        self._salvar_anuncios_processados()
-        self._salvar_dados_coletados()
-    
-    def _salvar_anuncios_processados(self):
-        """Salva a lista de IDs de anúncios processados"""
-        arquivo_processados = os.path.join(self.diretorio_dados, "processed_ads.json")
+        """Carrega em streaming os IDs dos anúncios já gravados no log JSONL"""
         try:
-            with open(arquivo_processados, 'w', encoding='utf-8') as f:
-                json.dump({"processed_ids": list(self.anuncios_processados)}, f)
-            logging.info(f"Salvos {len(self.anuncios_processados)} IDs de anúncios processados.")
+            # Execuções antigas gravavam um único array em anuncios.json
+            self.registro_anuncios.migrar_json(self.arquivo_json)
+            # e os IDs já processados em processed_ads.json
+            self._carregar_anuncios_processados()
+            # e um arquivo ad_<id>.html por anúncio em data/html
+            self.arquivo_html.migrar_html_soltos(self.registro_anuncios.iterar())
+            ids_gravados = self.registro_anuncios.carregar_ids()
+            self.anuncios_processados.update(ids_gravados)
+            logging.info(f"Carregados {len(ids_gravados)} anúncios do log JSONL.")
+            
+            # A compactação troca o arquivo do log: é um passo explícito, que também atualiza o estado do indexador
+            if self.registro_anuncios.precisa_compactar():
+                logging.info("Log com muitos registros sobrescritos. Com o crawler parado, rode: python processamento.py --compactar")
         except Exception as e:
-            logging.error(f"Erro ao salvar anúncios processados: {e}")
+            logging.error(f"Erro ao carregar dados dos anúncios: {e}")
     
-    def _salvar_dados_coletados(self):
-        """Salva os dados coletados dos anúncios em JSON"""
+    @property
+    def modo_concorrente(self):
+        """Indica se os anúncios são baixados em paralelo"""
+        return self.max_paralelo > 1
+    
+    def salvar_dados(self):
+        """Garante que os anúncios acrescentados ao log estejam gravados em disco"""
         try:
-            with open(self.arquivo_json, 'w', encoding='utf-8') as f:
-                json.dump(self.dados_coletados, f, ensure_ascii=False, indent=2)
-            logging.info(f"Salvos {len(self.dados_coletados)} anúncios no arquivo JSON.")
+            self.registro_anuncios.sincronizar()
+            logging.info(f"Log sincronizado com {len(self.registro_anuncios)} anúncios.")
         except Exception as e:
             logging.error(f"Erro ao salvar dados dos anúncios: {e}")
+        self.salvar_metricas_requisicoes()
+    
+    def salvar_metricas_requisicoes(self):
+        """Registra a taxa atual e as taxas de bloqueio de cada host"""
+        metricas = self.limitadores.metricas()
+        for host, dados in metricas.items():
+            logging.info(f"{host}: {dados['taxa_atual']} req/s, {dados['bloqueios']} bloqueios em {dados['requisicoes']} "
+                         f"respostas (recente: {dados['taxa_bloqueio_recente']:.1%}), {dados['cortes']} cortes de taxa")
+        try:
+            with open(self.arquivo_metricas, 'w', encoding='utf-8') as f:
+                json.dump(metricas, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logging.error(f"Erro ao salvar métricas de requisições: {e}")
     
     def gerar_headers_http(self):
         """Gera cabeçalhos HTTP aleatórios para evitar detecção"""
@@ -223,41 +266,49 @@ class OlxCrawler:
             'Referer': 'https://www.google.com/'
         }
     
+    def fazer_requisicao(self, url, headers_extras=None, status_esperados=()):
+        """Realiza uma requisição HTTP com tratamento de erros e backoff"""
+        try:
+            return self._requisitar(url, headers_extras, status_esperados)
+        except Exception as e:
+            return self._tratar_erro_requisicao(e, url)
+    
+    # Só falhas de rede/transporte são repetidas aqui; bloqueios são tratados pelo controle de taxa
     @backoff.on_exception(
         backoff.expo,
-        (requests.exceptions.RequestException, Exception),
+        requests.exceptions.RequestException,
         max_tries=5,
         max_time=300
     )
-    def fazer_requisicao(self, url):
-        """Realiza uma requisição HTTP com tratamento de erros e backoff"""
-        tempo_espera = random.uniform(*TEMPO_ESPERA_REQUISICAO)
-        logging.info(f"Aguardando {tempo_espera:.2f}s antes da requisição...")
-        time.sleep(tempo_espera)
-        
+    def _requisitar(self, url, headers_extras, status_esperados):
         headers = self.gerar_headers_http()
+        if headers_extras:
+            headers.update(headers_extras)
         
-        try:
-            self._inicializar_sessao_se_necessario(headers)
+        self._inicializar_sessao_se_necessario(headers)
+        if not self.modo_concorrente:
             self._visitar_categoria_intermediaria(headers)
-            
-            logging.info(f"Acessando URL: {url}")
-            response = self.sessao.get(
-                url, 
-                headers=headers, 
-                cookies=self.cookies,
-                timeout=45
-            )
-            
-            return self._processar_resposta_http(response, url)
-                
-        except Exception as e:
-            return self._tratar_erro_requisicao(e, url)
+        
+        self.limitadores.aguardar(url)
+        logging.info(f"Acessando URL: {url}")
+        response = self.sessao.get(
+            url, 
+            headers=headers, 
+            cookies=self._copiar_cookies(),
+            timeout=45
+        )
+        
+        return self._processar_resposta_http(response, url, status_esperados)
+    
+    def _copiar_cookies(self):
+        with self.trava_dados:
+            return dict(self.cookies)
     
     def _inicializar_sessao_se_necessario(self, headers):
         """Inicializa a sessão com cookies se necessário"""
         if 'olx.com.br' not in self.sessao.cookies.get_dict():
             logging.info("Inicializando sessão com página inicial...")
+            self.limitadores.aguardar('https://www.olx.com.br/')
             self.sessao.get('https://www.olx.com.br/', headers=headers, timeout=30)
             time.sleep(random.uniform(*TEMPO_ESPERA_SESSAO_INICIAL))
     
@@ -266,31 +317,56 @@ class OlxCrawler:
         if random.random() > 0.5:
             url_categoria = 'https://www.olx.com.br/autos-e-pecas'
             logging.info(f"Acessando categoria intermediária: {url_categoria}")
+            self.limitadores.aguardar(url_categoria)
             self.sessao.get(url_categoria, headers=headers, timeout=30)
             time.sleep(random.uniform(*TEMPO_ESPERA_CATEGORIA))
     
-    def _processar_resposta_http(self, response, url):
-        """Processa a resposta HTTP e verifica possíveis bloqueios"""
+    def _processar_resposta_http(self, response, url, status_esperados=()):
+        """Processa a resposta HTTP, verifica possíveis bloqueios e alimenta o controle de taxa do host"""
+        controlador = self.limitadores.controlador(url)
+        motivo = self._detectar_bloqueio(response)
+        if motivo:
+            # Corta a taxa do host e pausa as próximas requisições a ele (todas as threads)
+            pausa = controlador.registrar_bloqueio(motivo, self._ler_retry_after(response))
+            logging.error(f"Bloqueio detectado ({motivo}) em {url}. Taxa reduzida para {controlador.limitador.taxa:.2f} req/s, "
+                          f"pausa de {pausa:.0f}s.")
+            return None
+        
         if response.status_code == 200:
-            self.cookies.update(response.cookies.get_dict())
-            
-            # Verifica se é um bloqueio disfarçado como página 200
-            if 'Access Denied' in response.text or 'Forbidden' in response.text:
-                logging.warning("Recebido bloqueio disfarçado como página 200")
-                raise Exception("Bloqueio de acesso detectado")
+            controlador.registrar_sucesso()
+            cookies_resposta = response.cookies.get_dict()
+            with self.trava_dados:
+                self.cookies.update(cookies_resposta)
             
             # Verifica se a página de listagem tem anúncios
             if 'carros-vans-e-utilitarios' in url and '?' in url:
                 self._verificar_presenca_anuncios(response)
             
+            return response
+        elif response.status_code in status_esperados:
+            # Ex.: 304 de uma requisição condicional ou 404/410 de anúncio removido
+            controlador.registrar_sucesso()
             return response
         else:
             logging.warning(f"Resposta não-200: {response.status_code} para URL: {url}")
-            if response.status_code == 403:
-                logging.error("Bloqueio detectado! Esperando tempo maior...")
-                time.sleep(random.uniform(*TEMPO_ESPERA_APOS_403))
             return None
     
+    def _detectar_bloqueio(self, response):
+        """Motivo do bloqueio (403/429 ou página de bloqueio/captcha com status 200), ou None"""
+        if response.status_code in STATUS_BLOQUEIO:
+            return STATUS_BLOQUEIO[response.status_code]
+        if response.status_code == 200:
+            texto = response.text
+            for marcador, motivo in MARCADORES_BLOQUEIO.items():
+                if marcador in texto:
+                    return motivo
+        return None
+    
+    def _ler_retry_after(self, response):
+        """Segundos pedidos pelo servidor no cabeçalho Retry-After (só o formato numérico)"""
+        valor = (response.headers.get('Retry-After') or '').strip()
+        return float(valor) if valor.isdigit() else None
+    
     def _verificar_presenca_anuncios(self, response):
         """Verifica se a página de listagem contém cards de anúncios"""
         soup = BeautifulSoup(response.text, 'lxml')
@@ -308,8 +384,6 @@ class OlxCrawler:
     def _tratar_erro_requisicao(self, exception, url):
         """Trata exceções durante requisições HTTP"""
         logging.error(f"Erro na requisição para {url}: {exception}")
-        if "Bloqueio de acesso detectado" in str(exception):
-            time.sleep(random.uniform(*TEMPO_ESPERA_APOS_BLOQUEIO))
         return None
     
     def extrair_id_anuncio(self, url_anuncio):
@@ -347,259 +421,77 @@ class OlxCrawler:
                 break
         return prefixo_numerico
     
-    def salvar_html_anuncio(self, id_anuncio, conteudo_html):
-        """Salva o conteúdo HTML de um anúncio em arquivo"""
+    def salvar_html_anuncio(self, id_anuncio, conteudo_html, url_anuncio=None, estado=None):
+        """Salva o conteúdo HTML de um anúncio no arquivo de páginas"""
         if not id_anuncio:
             return False
         
-        nome_arquivo = os.path.join(self.diretorio_html, f"ad_{id_anuncio}.html")
         try:
-            with open(nome_arquivo, 'w', encoding='utf-8') as f:
-                f.write(conteudo_html)
+            self.arquivo_html.guardar(
+                id_anuncio, conteudo_html, url=url_anuncio,
+                estado=estado or self.estados.get(self.estado_atual, self.estado_atual)
+            )
             return True
         except Exception as e:
             logging.error(f"Erro ao salvar HTML do anúncio {id_anuncio}: {e}")
             return False
     
-    def extrair_dados_anuncio(self, url_anuncio, conteudo_html):
+    def extrair_dados_anuncio(self, url_anuncio, conteudo_html, id_anuncio=None, estado=None):
         """Extrai todos os dados estruturados de um anúncio a partir do HTML"""
-        id_anuncio = self.extrair_id_anuncio(url_anuncio)
-        soup = BeautifulSoup(conteudo_html, 'html.parser')
+        id_anuncio = id_anuncio or self.extrair_id_anuncio(url_anuncio)
         
         # Inicializa estrutura básica de dados do anúncio
         dados_anuncio = {
             "id": id_anuncio,
             "url": url_anuncio,
             "data_extracao": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "estado": self.estados.get(self.estado_atual, self.estado_atual)
+            "estado": estado or self.estados.get(self.estado_atual, self.estado_atual)
         }
         
         try:
             logging.info(f"Iniciando extração de dados para anúncio {id_anuncio}")
             
-            # Extração de detalhes do veículo
-            self._extrair_detalhes_veiculo(soup, dados_anuncio)
-            
-            # Extração de preço
-            self._extrair_preco_anuncio(soup, dados_anuncio)
+            # Estado JSON embutido primeiro; detalhes e preço pelo DOM só se faltar algo
+            estrategias = self.extrator.extrair(conteudo_html, dados_anuncio)
             
             # Verificação da qualidade dos dados extraídos
             if dados_anuncio.get('modelo') == "Modelo não encontrado":
-                self._salvar_debug_extracao(id_anuncio, conteudo_html)
+                self._salvar_debug_extracao(id_anuncio)
             
-            logging.info(f"Dados extraídos com sucesso para anúncio {id_anuncio}: {dados_anuncio.get('modelo')} - {dados_anuncio.get('preco', 'N/A')}")
+            logging.info(f"Dados extraídos com sucesso para anúncio {id_anuncio} ({estrategias}): {dados_anuncio.get('modelo')} - {dados_anuncio.get('preco', 'N/A')}")
             return dados_anuncio
             
         except Exception as e:
             logging.error(f"Erro ao extrair dados do anúncio {id_anuncio}: {e}")
-            self._salvar_debug_erro(id_anuncio, conteudo_html)
+            self._salvar_debug_erro(id_anuncio, e)
             return dados_anuncio
-
-    def _extrair_detalhes_veiculo(self, soup, dados_anuncio):
-        """Extrai os detalhes do veículo (marca, ano, km, etc)"""
-        # Extração pela seção de detalhes principal
-        secao_detalhes = soup.select_one('div#details')
-        containers_detalhes = []
-        
-        if secao_detalhes:
-            logging.info("Seção de detalhes encontrada pelo ID")
-            containers_detalhes = secao_detalhes.select(DETALHES_CONTAINER_SELECTOR)
-        
-        if containers_detalhes:
-            # Processa cada container de detalhes
-            self._processar_containers_detalhes(containers_detalhes, dados_anuncio)
-        else:
-            # Tenta métodos alternativos se não encontrar os containers padrão
-            self._tentar_extrair_detalhes_alternativos(soup, dados_anuncio)
     
-    def _processar_containers_detalhes(self, containers, dados_anuncio):
-        """Processa os containers de detalhes do veículo"""
-        logging.info(f"Encontrados {len(containers)} containers de detalhes do anúncio")
-        
-        for container in containers:
-            try:
-                # Extrai etiqueta (label) e valor de cada detalhe
-                elemento_label = container.select_one('span[data-variant="overline"]')
-                if not elemento_label:
-                    continue
-                
-                texto_label = elemento_label.text.strip().lower()
-                logging.info(f"Processando detalhe: {texto_label}")
-                
-                elemento_valor = container.select_one('a.olx-link, span.ekhFnR, span:not([data-variant])')
-                if not elemento_valor:
-                    continue
-                
-                texto_valor = elemento_valor.text.strip()
-                
-                # Mapeia os diferentes tipos de detalhes para as chaves do dicionário
-                if 'marca' in texto_label:
-                    dados_anuncio['marca'] = texto_valor
-                    logging.info(f"Marca encontrada: {texto_valor}")
-                elif 'modelo' in texto_label:
-                    dados_anuncio['modelo'] = texto_valor
-                    logging.info(f"Modelo encontrado nos detalhes: {texto_valor}")
-                elif 'tipo de veículo' in texto_label:
-                    dados_anuncio['tipo_veiculo'] = texto_valor
-                    logging.info(f"Tipo de veículo: {texto_valor}")
-                elif 'ano' in texto_label:
-                    dados_anuncio['ano'] = texto_valor
-                    logging.info(f"Ano: {texto_valor}")
-                elif 'quilometragem' in texto_label:
-                    dados_anuncio['quilometragem'] = texto_valor
-                    logging.info(f"Quilometragem: {texto_valor}")
-                elif 'potência do motor' in texto_label:
-                    dados_anuncio['potencia'] = texto_valor
-                    logging.info(f"Potência do motor: {texto_valor}")
-                elif 'combustível' in texto_label:
-                    dados_anuncio['combustivel'] = texto_valor
-                    logging.info(f"Combustível: {texto_valor}")
-                elif 'câmbio' in texto_label:
-                    dados_anuncio['cambio'] = texto_valor
-                    logging.info(f"Câmbio: {texto_valor}")
-                elif 'direção' in texto_label or 'tipo de direção' in texto_label:
-                    dados_anuncio['direcao'] = texto_valor
-                    logging.info(f"Direção: {texto_valor}")
-                elif 'cor' in texto_label:
-                    dados_anuncio['cor'] = texto_valor
-                    logging.info(f"Cor: {texto_valor}")
-                elif 'portas' in texto_label:
-                    dados_anuncio['portas'] = texto_valor
-                    logging.info(f"Portas: {texto_valor}")
-                elif 'final de placa' in texto_label:
-                    dados_anuncio['final_placa'] = texto_valor
-                    logging.info(f"Final de placa: {texto_valor}")
-                elif 'gnv' in texto_label:
-                    dados_anuncio['gnv'] = texto_valor
-                    logging.info(f"Possui GNV: {texto_valor}")
-                elif 'categoria' in texto_label:
-                    dados_anuncio['categoria'] = texto_valor
-                    logging.info(f"Categoria: {texto_valor}")
-            except Exception as erro_detalhe:
-                logging.error(f"Erro ao extrair detalhe: {erro_detalhe}")
-    
-    def _tentar_extrair_detalhes_alternativos(self, soup, dados_anuncio):
-        """Tenta métodos alternativos para extrair detalhes do veículo"""
-        logging.warning("Detalhes não encontrados na seção principal, tentando métodos alternativos")
-        
-        # Tenta pelos seletores alternativos
-        elementos_detalhe = soup.select(DETALHES_ALTERNATIVOS_SELECTOR_1)
-        if not elementos_detalhe:
-            elementos_detalhe = soup.select(DETALHES_ALTERNATIVOS_SELECTOR_2)
-        
-        if elementos_detalhe:
-            self._processar_elementos_detalhe_alternativos(elementos_detalhe, dados_anuncio)
-        
-        # Tenta extrair a marca do breadcrumb
-        self._extrair_marca_do_breadcrumb(soup, dados_anuncio)
-        
-        # Se ainda não tiver marca, tentar extrair do título
-        self._tentar_extrair_marca_do_titulo(dados_anuncio)
-    
-    def _processar_elementos_detalhe_alternativos(self, elementos_detalhe, dados_anuncio):
-        """Processa os elementos de detalhe em formato alternativo"""
-        logging.info(f"Encontrados {len(elementos_detalhe)} elementos de detalhes alternativos")
-        for detalhe in elementos_detalhe:
-            try:
-                label = detalhe.select_one('span.olx-text--caption')
-                valor = detalhe.select_one('span.olx-text--body-large, span.olx-text--body, span:not(.olx-text--caption), a')
-                
-                if label and valor:
-                    texto_label = label.text.strip().lower()
-                    texto_valor = valor.text.strip()
-                    
-                    if 'marca' in texto_label:
-                        dados_anuncio['marca'] = texto_valor
-                    elif 'modelo' in texto_label and not dados_anuncio.get('modelo'):
-                        dados_anuncio['modelo'] = texto_valor
-                    # Outros mapeamentos de detalhes poderiam ser adicionados aqui
-            except Exception as e:
-                logging.error(f"Erro ao extrair detalhe alternativo: {e}")
-    
-    def _extrair_marca_do_breadcrumb(self, soup, dados_anuncio):
-        """Tenta extrair a marca do veículo do breadcrumb da página"""
-        breadcrumb = soup.select('ol[data-testid="breadcrumb"] li a')
-        if breadcrumb and len(breadcrumb) >= 3:
-            possivel_marca = breadcrumb[2].text.strip()
-            dados_anuncio['marca'] = possivel_marca
-            logging.info(f"Marca extraída do breadcrumb: {possivel_marca}")
-    
-    def _tentar_extrair_marca_do_titulo(self, dados_anuncio):
-        """Tenta extrair a marca do veículo a partir do título/modelo"""
-        if not dados_anuncio.get('marca') and dados_anuncio.get('modelo'):
-            primeira_palavra = dados_anuncio['modelo'].split()[0]
-            if primeira_palavra.lower() in MARCAS_COMUNS:
-                dados_anuncio['marca'] = primeira_palavra
-                logging.info(f"Marca extraída do título: {primeira_palavra}")
-            else:
-                dados_anuncio['marca'] = "Marca não encontrada"
+    def reextrair_anuncio(self, id_anuncio):
+        """Extrai de novo os dados de um anúncio a partir do HTML arquivado, sem requisição"""
+        entrada = self.arquivo_html.entradas.get(id_anuncio)
+        if entrada is None:
+            return None
+        conteudo_html = self.arquivo_html.ler_entrada(entrada)
+        return self.extrair_dados_anuncio(entrada['url'], conteudo_html, id_anuncio=id_anuncio, estado=entrada['estado'])
     
-    def _extrair_preco_anuncio(self, soup, dados_anuncio):
-        """Extrai o preço do anúncio usando várias estratégias"""
-        try:
-            logging.info("Extraindo preço do anúncio...")
-            
-            # Estratégia 1: Container específico de preço
-            container_preco = soup.select_one(PRECO_CONTAINER_SELECTOR)
-            if container_preco:
-                logging.info("Encontrado container de preço específico")
-                span_preco = container_preco.select_one(PRECO_SPAN_SELECTOR)
-                
-                if span_preco and 'R$' in span_preco.text:
-                    preco_valor = span_preco.text.strip()
-                    logging.info(f"Preço encontrado no price-box-container: {preco_valor}")
-                    dados_anuncio['preco'] = preco_valor
-                else:
-                    # Busca por regex de preço no container
-                    texto_preco = re.search(PRECO_REGEX_PATTERN, container_preco.text)
-                    if texto_preco:
-                        preco_valor = texto_preco.group(0).strip()
-                        logging.info(f"Preço encontrado com regex no price-box-container: {preco_valor}")
-                        dados_anuncio['preco'] = preco_valor
-            else:
-                # Estratégia 2: Seletores alternativos
-                self._extrair_preco_por_seletores_alternativos(soup, dados_anuncio)
-        
-        except Exception as e:
-            logging.error(f"Erro ao extrair preço: {e}")
-            dados_anuncio['preco'] = "Erro na extração"
-    
-    def _extrair_preco_por_seletores_alternativos(self, soup, dados_anuncio):
-        """Extrai preço usando seletores alternativos e busca por padrão de preço"""
-        elemento_preco = soup.select_one(PRECO_ALTERNATIVO_SELECTOR)
-        if elemento_preco and 'R$' in elemento_preco.text:
-            preco_valor = elemento_preco.text.strip()
-            logging.info(f"Preço encontrado no elemento alternativo: {preco_valor}")
-            dados_anuncio['preco'] = preco_valor
-        else:
-            # Busca por padrão de preço em qualquer elemento
-            padrao_preco = re.compile(PRECO_REGEX_PATTERN)
-            for elemento in soup.find_all(['span', 'div', 'p']):
-                if elemento.text and padrao_preco.search(elemento.text):
-                    preco_valor = padrao_preco.search(elemento.text).group(0).strip()
-                    logging.info(f"Preço encontrado com regex: {preco_valor}")
-                    dados_anuncio['preco'] = preco_valor
-                    break
-            else:
-                logging.warning("Preço não encontrado no anúncio")
-                dados_anuncio['preco'] = "Preço não encontrado"
+    def _salvar_debug_extracao(self, id_anuncio):
+        """Registra o anúncio com extração incompleta (o HTML já está no arquivo de páginas)"""
+        self._registrar_debug(id_anuncio, "extracao_incompleta")
+        logging.warning(f"Falha na extração completa de dados para anúncio {id_anuncio}. ID registrado para debug.")
     
-    def _salvar_debug_extracao(self, id_anuncio, conteudo_html):
-        """Salva HTML para debug quando falha na extração do modelo"""
-        arquivo_debug = os.path.join(self.diretorio_dados, f"debug_extraction_{id_anuncio}.html")
-        with open(arquivo_debug, 'w', encoding='utf-8') as f:
-            f.write(conteudo_html)
-        logging.warning(f"Falha na extração completa de dados para anúncio {id_anuncio}. HTML salvo para debug.")
+    def _salvar_debug_erro(self, id_anuncio, erro):
+        """Registra o anúncio cuja extração gerou erro (o HTML já está no arquivo de páginas)"""
+        self._registrar_debug(id_anuncio, f"erro: {erro}")
     
-    def _salvar_debug_erro(self, id_anuncio, conteudo_html):
-        """Salva HTML para debug quando ocorre erro na extração"""
-        arquivo_debug = os.path.join(self.diretorio_dados, f"debug_error_{id_anuncio}.html")
-        with open(arquivo_debug, 'w', encoding='utf-8') as f:
-            f.write(conteudo_html)
+    def _registrar_debug(self, id_anuncio, motivo):
+        with self.trava_dados:
+            with open(self.arquivo_debug, 'a', encoding='utf-8') as f:
+                f.write(f"{id_anuncio}\t{motivo}\n")
     
-    def processar_anuncio(self, url_anuncio):
+    def processar_anuncio(self, url_anuncio, estado=None):
         """Processa um anúncio: baixa HTML, extrai e salva dados"""
         id_anuncio = self.extrair_id_anuncio(url_anuncio)
+        nome_estado = self.estados.get(estado, estado)
         
         if not id_anuncio:
             logging.warning(f"Não foi possível extrair ID para URL: {url_anuncio}")
@@ -613,44 +505,110 @@ class OlxCrawler:
         if not response:
             return False
         
-        html_salvo = self.salvar_html_anuncio(id_anuncio, response.text)
+        html_salvo = self.salvar_html_anuncio(id_anuncio, response.text, url_anuncio, estado=nome_estado)
         
-        dados_anuncio = self.extrair_dados_anuncio(url_anuncio, response.text)
+        dados_anuncio = self.extrair_dados_anuncio(url_anuncio, response.text, id_anuncio=id_anuncio, estado=nome_estado)
         
         if html_salvo:
-            self.anuncios_processados.add(id_anuncio)
-            self.dados_coletados.append(dados_anuncio)
+            self.registro_anuncios.adicionar(dados_anuncio)
+            self.revalidacao.registrar_coleta(
+                id_anuncio, url_anuncio, dados_anuncio,
+                response.headers.get('ETag'), response.headers.get('Last-Modified')
+            )
+            with self.trava_dados:
+                self.anuncios_processados.add(id_anuncio)
             logging.info(f"Anúncio {id_anuncio} processado e salvo com sucesso.")
             return True
         
         return False
     
-    def extrair_links_anuncios(self, conteudo_html):
+    def revalidar_anuncio(self, id_anuncio, url_anuncio):
+        """Revisita um anúncio conhecido com requisição condicional. Retorna (resultado, bytes baixados)"""
+        response = self.fazer_requisicao(
+            url_anuncio,
+            headers_extras=self.revalidacao.cabecalhos_condicionais(id_anuncio),
+            status_esperados=(304, 404, 410)
+        )
+        if response is None:
+            return "erro", 0
+        
+        if response.status_code == 304:
+            self.revalidacao.registrar_nao_modificado(id_anuncio)
+            return "nao_modificado", 0
+        
+        if response.status_code in (404, 410):
+            logging.info(f"Anúncio {id_anuncio} não está mais disponível ({response.status_code}).")
+            self.registro_anuncios.remover(id_anuncio)
+            self.revalidacao.remover(id_anuncio)
+            return "removido", 0
+        
+        registro = self.revalidacao.registros.get(id_anuncio) or {}
+        dados_anuncio = self.extrair_dados_anuncio(url_anuncio, response.text, id_anuncio=id_anuncio, estado=registro.get('estado'))
+        preco_anterior = (registro.get('precos') or [[None, None]])[-1][1]
+        mudou = self.revalidacao.registrar_coleta(
+            id_anuncio, url_anuncio, dados_anuncio,
+            response.headers.get('ETag'), response.headers.get('Last-Modified')
+        )
+        if not mudou:
+            return "inalterado", len(response.content)
+        
+        # Nova versão do anúncio: vai para o log (a indexação incremental a substitui) e para o arquivo de páginas
+        self.salvar_html_anuncio(id_anuncio, response.text, url_anuncio, estado=registro.get('estado'))
+        self.registro_anuncios.adicionar(dados_anuncio)
+        if dados_anuncio.get('preco') != preco_anterior:
+            logging.info(f"Preço do anúncio {id_anuncio}: {preco_anterior} -> {dados_anuncio.get('preco')}")
+        return "alterado", len(response.content)
+    
+    def atualizar_anuncios(self, max_requisicoes=MAX_REVALIDACOES):
+        """Revisita os anúncios conhecidos cuja revisita venceu, os mais atrasados primeiro"""
+        semeados = self.revalidacao.semear(self.registro_anuncios.iterar())
+        if semeados:
+            logging.info(f"{semeados} anúncios do log agendados para revalidação.")
+        
+        vencidos = self.revalidacao.vencidos(max_requisicoes)
+        logging.info(f"Revalidando {len(vencidos)} de {len(self.revalidacao)} anúncios conhecidos")
+        resultados = {}
+        bytes_baixados = 0
+        
+        def contabilizar(resultado):
+            nonlocal bytes_baixados
+            resultados[resultado[0]] = resultados.get(resultado[0], 0) + 1
+            bytes_baixados += resultado[1]
+        
+        try:
+            if self.modo_concorrente:
+                with ThreadPoolExecutor(max_workers=self.max_paralelo) as executor:
+                    futuros = [executor.submit(self.revalidar_anuncio, id_anuncio, url) for id_anuncio, url in vencidos]
+                    for futuro in tqdm(as_completed(futuros), total=len(futuros), desc="Revalidação"):
+                        try:
+                            contabilizar(futuro.result())
+                        except Exception as e:
+                            logging.error(f"Erro ao revalidar anúncio em paralelo: {e}")
+                            contabilizar(("erro", 0))
+            else:
+                for id_anuncio, url in tqdm(vencidos, desc="Revalidação"):
+                    contabilizar(self.revalidar_anuncio(id_anuncio, url))
+        except KeyboardInterrupt:
+            logging.info("Interrompido pelo usuário.")
+        finally:
+            self.salvar_dados()
+            self.registro_anuncios.fechar()
+            self.arquivo_html.fechar()
+            self.revalidacao.fechar()
+            logging.info(f"Revalidação finalizada: {resultados}, {bytes_baixados / 1024:.1f} KB baixados.")
+        return resultados
+    
+    def extrair_links_anuncios(self, conteudo_html, url_base=None):
         """Extrai links de anúncios de uma página de listagem"""
-        soup = BeautifulSoup(conteudo_html, 'lxml')
-        links_anuncio = []
         logging.info("Extraindo links de anúncios da página...")
+        url_base = url_base or self.base_url_template.format(estado=self.estado_atual)
         
-        # Tenta os seletores primários primeiro
-        for seletor in SELETORES_ANUNCIOS_PRIMARIOS:
-            elementos_anuncio = soup.select(seletor)
-            if elementos_anuncio:
-                logging.info(f"Encontrados {len(elementos_anuncio)} links usando seletor: {seletor}")
-                for elemento in elementos_anuncio:
-                    href = elemento.get('href')
-                    if href:
-                        url_completa = urljoin("https://www.olx.com.br", href)
-                        links_anuncio.append(url_completa)
-                if links_anuncio:  # Se encontrou links, interrompe a busca
-                    break
-        
-        # Se não encontrou com seletores primários, tenta seletores alternativos
-        if not links_anuncio:
-            self._tentar_seletores_alternativos(soup, links_anuncio)
-        
-        # Último recurso: busca por padrões de URL em todos os links
-        if not links_anuncio:
-            self._buscar_links_por_padrao_url(soup, links_anuncio)
+        # Uma passada pelo HTML: todos os href de <a>, depois os padrões de URL de anúncio
+        links_anuncio = []
+        for duplas, simples, sem_aspas in PADRAO_HREF_LINK.findall(conteudo_html):
+            href = unescape(duplas or simples or sem_aspas)
+            if href:
+                links_anuncio.append(urljoin(url_base, href))
         
         # Filtrar links únicos e válidos
         links_unicos = self._filtrar_links_unicos_validos(links_anuncio)
@@ -659,58 +617,26 @@ class OlxCrawler:
         
         # Se não encontrou nenhum link, salva debug
         if not links_unicos:
-            self._salvar_debug_links_nao_encontrados(conteudo_html, soup)
+            self._salvar_debug_links_nao_encontrados(conteudo_html, BeautifulSoup(conteudo_html, 'lxml'))
         
         return links_unicos
     
-    def _tentar_seletores_alternativos(self, soup, links_anuncio):
-        """Tenta encontrar links de anúncios usando seletores alternativos"""
-        logging.info("Usando seletores alternativos para encontrar links...")
-        
-        for seletor in SELETORES_ANUNCIOS_ALTERNATIVOS:
-            elementos = soup.select(seletor)
-            if elementos:
-                logging.info(f"Encontrados {len(elementos)} links usando seletor alternativo: {seletor}")
-                for elemento in elementos:
-                    href = elemento.get('href')
-                    if href:
-                        url_completa = urljoin(self.base_url_template.format(estado=self.estado_atual), href)
-                        links_anuncio.append(url_completa)
-                if links_anuncio:  # Se encontrou links, interrompe a busca
-                    break
-    
-    def _buscar_links_por_padrao_url(self, soup, links_anuncio):
-        """Busca por links que correspondam a padrões de URL de anúncios"""
-        logging.info("Último recurso: buscando todos os links e filtrando por padrões relevantes...")
-        todos_links = soup.find_all('a', href=True)
-        
-        for link in todos_links:
-            href = link['href']
-            # Verifica se o link corresponde a padrões de URL de anúncios
-            if (
-                '/item/' in href or 
-                ('/autos-e-pecas/carros-vans-e-utilitarios/' in href and not href.endswith('carros-vans-e-utilitarios/')) or
-                ('/anuncio/' in href) or
-                ('/d/' in href and 'carros' in href)
-            ):
-                url_completa = urljoin(self.base_url_template.format(estado=self.estado_atual), href)
-                links_anuncio.append(url_completa)
-    
     def _filtrar_links_unicos_validos(self, links_anuncio):
-        """Filtra lista de links para manter apenas os únicos e válidos"""
-        links_unicos = []
-        for url in links_anuncio:
-            # Verifica se o link é válido segundo os critérios
-            eh_valido = (
-                '/item/' in url or 
-                '/anuncio/' in url or
-                ('/d/' in url and 'carros' in url) or
-                ('/autos-e-pecas/carros-vans-e-utilitarios/' in url and not url.endswith('carros-vans-e-utilitarios/'))
-            )
-            if eh_valido and url not in links_unicos:
-                links_unicos.append(url)
-        
-        return links_unicos
+        """Filtra lista de links para manter apenas os únicos e válidos (na ordem da página)"""
+        return [url for url in dict.fromkeys(links_anuncio) if PADRAO_URL_ANUNCIO.search(url)]
+    
+    def _descartar_links_ja_processados(self, links_anuncio):
+        """Remove links de anúncios já processados (ou repetidos com outra URL) antes de enfileirar"""
+        ids_links = [(url, self.extrair_id_anuncio(url)) for url in links_anuncio]
+        vistos = set()
+        links_novos = []
+        # Só a consulta ao conjunto fica sob a trava (sem copiar os anúncios já processados a cada página)
+        with self.trava_dados:
+            for url, id_anuncio in ids_links:
+                if id_anuncio and id_anuncio not in vistos and id_anuncio not in self.anuncios_processados:
+                    vistos.add(id_anuncio)
+                    links_novos.append(url)
+        return links_novos
     
     def _salvar_debug_links_nao_encontrados(self, conteudo_html, soup):
         """Salva informações de debug quando nenhum link de anúncio é encontrado"""
@@ -731,155 +657,157 @@ class OlxCrawler:
                     f.write(f"Href: {container.get('href')}\n")
                 f.write(f"Links: {len(container.select('a'))}\n\n")
     
-    def construir_url_proxima_pagina(self, pagina_atual):
-        """Constrói a URL da próxima página a partir da página atual"""
-        proxima_pagina = pagina_atual + 1
-        
-        # Usa a URL base do estado atual
-        url_base = self.base_url_template.format(estado=self.estado_atual)
-        
-        # Constrói URL com parâmetro de paginação
-        url_proxima = f"{url_base}?o={proxima_pagina}"
-        
-        logging.info(f"Próxima página construída manualmente: {url_proxima}")
-        return url_proxima
-    
-    def rastrear_estado(self, estado, max_paginas=100):
-        """Executa o rastreamento para um estado específico"""
-        self.estado_atual = estado
+    def construir_url_pagina(self, estado, pagina):
+        """Constrói a URL de uma página de listagem do estado"""
         url_base = self.base_url_template.format(estado=estado)
-        pagina_atual = 1
-        url_atual = url_base
-        total_anuncios_processados = 0
-        erros_consecutivos = 0
-        
-        nome_estado = self.estados.get(estado, estado)
-        logging.info(f"Iniciando crawler para o estado: {nome_estado}")
-        
-        try:
-            while pagina_atual <= max_paginas:
-                logging.info(f"Processando página {pagina_atual} de {nome_estado}: {url_atual}")
-                
-                response = self.fazer_requisicao(url_atual)
-                if not response:
-                    erros_consecutivos += 1
-                    logging.error(f"Não foi possível acessar a página {pagina_atual}")
-                    
-                    if erros_consecutivos >= 3:
-                        self._tratar_muitos_erros_consecutivos(estado, pagina_atual, url_base)
-                        erros_consecutivos = 0
-                        continue
-                    else:
-                        time.sleep(random.uniform(30, 60))  # Espera 30-60 segundos antes de tentar novamente
-                        continue
-                
-                erros_consecutivos = 0  # Reinicia contador de erros após sucesso
-                
-                links_anuncio = self.extrair_links_anuncios(response.text)
-                logging.info(f"Encontrados {len(links_anuncio)} anúncios na página {pagina_atual} de {nome_estado}")
-                
-                if not links_anuncio:
-                    pagina_atual = self._tratar_pagina_sem_anuncios(estado, pagina_atual, url_base)
-                    url_atual = f"{url_base}?o={pagina_atual}"
-                    continue
-                
-                total_anuncios_processados = self._processar_anuncios_da_pagina(
-                    links_anuncio, pagina_atual, nome_estado, total_anuncios_processados
-                )
-                
-                url_proxima = self.construir_url_proxima_pagina(pagina_atual)
-                if not url_proxima or url_proxima == url_atual:
-                    logging.info(f"Nenhuma próxima página encontrada para {nome_estado}. Finalizando.")
-                    break
-                
-                url_atual = url_proxima
-                pagina_atual += 1
-                
-                tempo_espera = random.uniform(*TEMPO_ESPERA_PROXIMA_PAGINA)
-                logging.info(f"Aguardando {tempo_espera:.2f}s antes de acessar a próxima página...")
-                time.sleep(tempo_espera)
-                
-                self.salvar_dados()
-                
-        except KeyboardInterrupt:
-            logging.info("Interrompido pelo usuário.")
-            return total_anuncios_processados
-        except Exception as e:
-            logging.error(f"Erro durante o rastreamento do estado {nome_estado}: {e}", exc_info=True)
-            return total_anuncios_processados
-        
-        logging.info(f"Rastreamento do estado {nome_estado} finalizado. Total de anúncios processados: {total_anuncios_processados}")
-        return total_anuncios_processados
+        return url_base if pagina <= 1 else f"{url_base}?o={pagina}"
     
-    def _tratar_muitos_erros_consecutivos(self, estado, pagina_atual, url_base):
-        """Trata situação de muitos erros consecutivos"""
-        logging.error("Muitos erros consecutivos. Pausando por um período maior...")
-        time.sleep(random.uniform(*TEMPO_ESPERA_ERROS_CONSECUTIVOS))
-        
-        logging.info("Reiniciando sessão...")
-        self.sessao = self._criar_sessao_http()
-        
-        # Em caso de muitos erros, tentar URL alternativa
-        if pagina_atual > 1:
-            return f"{url_base}?o={pagina_atual}"
+    def _item_listagem(self, estado, pagina, nao_antes=0):
+        # Anúncios de uma página saem antes da página seguinte; estados diferentes se intercalam por página
+        return (self.construir_url_pagina(estado, pagina), LISTAGEM, estado, pagina, pagina + 0.5, nao_antes)
     
-    def _tratar_pagina_sem_anuncios(self, estado, pagina_atual, url_base):
-        """Trata situação de página sem anúncios"""
-        logging.warning(f"Nenhum anúncio encontrado na página {pagina_atual}. Salvando para análise.")
-        
-        with open(f"debug_page_{estado}_{pagina_atual}.html", "w", encoding="utf-8") as f:
-            f.write(self.fazer_requisicao(f"{url_base}?o={pagina_atual}").text)
+    def _processar_listagem(self, item, max_paginas):
+        """Baixa uma página de listagem, enfileira seus anúncios novos e a página seguinte"""
+        estado, pagina, url = item['estado'], item['pagina'], item['url']
+        nome_estado = self.estados.get(estado, estado)
+        logging.info(f"Processando página {pagina} de {nome_estado}: {url}")
         
-        time.sleep(random.uniform(*TEMPO_ESPERA_SEM_ANUNCIOS))
-        return pagina_atual + 1
-    
-    def _processar_anuncios_da_pagina(self, links_anuncio, pagina_atual, nome_estado, total_processados):
-        """Processa todos os anúncios de uma página"""
-        for url_anuncio in tqdm(links_anuncio, desc=f"{nome_estado} - Página {pagina_atual}"):
-            sucesso = self.processar_anuncio(url_anuncio)
-            if sucesso:
-                total_processados += 1
-            
-            if total_processados % 10 == 0:
-                self.salvar_dados()
+        response = self.fazer_requisicao(url)
+        if not response:
+            logging.error(f"Não foi possível acessar a página {pagina} de {nome_estado}")
+            self._registrar_falha(item)
+            return
+        with self.trava_dados:
+            self.erros_por_estado[estado] = 0
+        
+        links_anuncio = self.extrair_links_anuncios(response.text, url_base=url)
+        logging.info(f"Encontrados {len(links_anuncio)} anúncios na página {pagina} de {nome_estado}")
+        links_novos = self._descartar_links_ja_processados(links_anuncio)
+        if len(links_novos) < len(links_anuncio):
+            logging.info(f"{len(links_anuncio) - len(links_novos)} anúncios já processados ignorados na página {pagina}")
+        
+        self.fronteira.adicionar([(link, ANUNCIO, estado, pagina, pagina, 0) for link in links_novos])
+        if not links_anuncio:
+            # Página sem nenhum anúncio: a listagem do estado acabou, não há página seguinte
+            logging.info(f"Fim da listagem de {nome_estado} na página {pagina}")
+        elif pagina < max_paginas:
+            # A página seguinte fica na fila com horário mínimo em vez de um sleep
+            proxima = self._item_listagem(estado, pagina + 1, time.time() + random.uniform(*TEMPO_ESPERA_PROXIMA_PAGINA))
+            self.fronteira.adicionar([proxima], reabrir=True)
+        self.fronteira.concluir(url)
+    
+    def _processar_item_anuncio(self, item):
+        """Processa um anúncio da fronteira. Retorna True se foi coletado"""
+        sucesso = self.processar_anuncio(item['url'], estado=item['estado'])
+        id_anuncio = self.extrair_id_anuncio(item['url'])
+        if sucesso or not id_anuncio or id_anuncio in self.anuncios_processados:
+            self.fronteira.concluir(item['url'])
+        else:
+            self._registrar_falha(item)
+        return sucesso
+    
+    def _registrar_falha(self, item):
+        """Reagenda o item com espera exponencial; muitos erros seguidos adiam só o estado do item"""
+        estado = item['estado']
+        self.fronteira.falhar(item['url'], TEMPO_ESPERA_NOVA_TENTATIVA * 2 ** item['tentativas'] * random.uniform(1, 2))
+        with self.trava_dados:
+            self.erros_por_estado[estado] = self.erros_por_estado.get(estado, 0) + 1
+            muitos_erros = self.erros_por_estado[estado] >= 3
+            if muitos_erros:
+                self.erros_por_estado[estado] = 0
+        if muitos_erros:
+            espera = random.uniform(*TEMPO_ESPERA_ERROS_CONSECUTIVOS)
+            logging.error(f"Muitos erros consecutivos em {self.estados.get(estado, estado)}. Adiando o estado por {espera:.0f}s.")
+            self.fronteira.adiar_estado(estado, espera)
+            logging.info("Reiniciando sessão...")
+            self.reiniciar_sessoes()
+    
+    def _trabalhar_fronteira(self, max_paginas):
+        """Retira itens elegíveis da fronteira até ela esvaziar. Retorna quantos anúncios foram coletados"""
+        coletados = 0
+        while not self.parar.is_set():
+            item = self.fronteira.proximo()
+            if item is None:
+                espera = self.fronteira.espera()
+                if espera is None:
+                    if not self.fronteira.pendentes():
+                        break
+                    espera = 1.0  # outra thread ainda processa um item que pode gerar novos
+                # Nada elegível agora: espera o próximo horário mínimo
+                time.sleep(min(max(espera, 0.1), 5.0))
+                continue
             
-            time.sleep(random.uniform(*TEMPO_ESPERA_ENTRE_ANUNCIOS))
-        
-        return total_processados
-
+            try:
+                if item['tipo'] == LISTAGEM:
+                    self._processar_listagem(item, max_paginas)
+                    continue
+                if self._processar_item_anuncio(item):
+                    coletados += 1
+                    if coletados % 10 == 0:
+                        self.salvar_dados()
+            except Exception as e:
+                logging.error(f"Erro ao processar {item['url']}: {e}", exc_info=True)
+                self._registrar_falha(item)
+        return coletados
+    
     def rastrear(self, estados=None, max_paginas=100):
-        """Executa o crawler para uma lista de estados"""
+        """Executa o crawler para uma lista de estados a partir da fronteira persistente"""
         if estados is None:
             estados = ['sp']  # Por padrão, apenas São Paulo
         
         total_geral = 0
         
         try:
+            # Estados sem nada pendente começam uma nova rodada pela página 1; os demais retomam de onde pararam
+            novos = []
             for estado in estados:
-                if estado.lower() in self.estados:
-                    anuncios_processados = self.rastrear_estado(estado.lower(), max_paginas)
-                    total_geral += anuncios_processados
-                    
-                    # Pausa entre estados para reduzir a chance de detecção
-                    tempo_espera = random.uniform(*TEMPO_ESPERA_PROXIMO_ESTADO)
-                    logging.info(f"Concluído estado {self.estados.get(estado.lower())}. Aguardando {tempo_espera:.2f}s antes do próximo estado...")
-                    time.sleep(tempo_espera)
-                else:
+                if estado.lower() not in self.estados:
                     logging.warning(f"Estado {estado} não reconhecido. Ignorando.")
+                elif not self.fronteira.pendentes(estado.lower()):
+                    novos.append(self._item_listagem(estado.lower(), 1))
+            self.fronteira.adicionar(novos, reabrir=True)
+            logging.info(f"Fronteira: {self.fronteira.contagens()}")
+            
+            if not self.modo_concorrente:
+                total_geral = self._trabalhar_fronteira(max_paginas)
+            else:
+                # Cada thread retira da fronteira o que estiver elegível; um estado adiado não trava os outros
+                executor = ThreadPoolExecutor(max_workers=self.max_paralelo)
+                try:
+                    futuros = [executor.submit(self._trabalhar_fronteira, max_paginas) for _ in range(self.max_paralelo)]
+                    for futuro in as_completed(futuros):
+                        total_geral += futuro.result()
+                except KeyboardInterrupt:
+                    self.parar.set()
+                    raise
+                finally:
+                    executor.shutdown(wait=True)
         
         except KeyboardInterrupt:
-            logging.info("Interrompido pelo usuário.")
+            logging.info("Interrompido pelo usuário. A fronteira retoma deste ponto na próxima execução.")
         except Exception as e:
             logging.error(f"Erro durante o rastreamento: {e}", exc_info=True)
         finally:
             self.salvar_dados()
-            logging.info(f"Rastreamento de todos estados finalizado. Total de anúncios processados: {total_geral}")
+            self.registro_anuncios.fechar()
+            self.arquivo_html.fechar()
+            self.revalidacao.fechar()
+            logging.info(f"Taxa de acerto das estratégias de extração: {json.dumps(self.extrator.estatisticas(), ensure_ascii=False)}")
+            logging.info(f"Rastreamento finalizado. Total de anúncios processados: {total_geral}. Fronteira: {self.fronteira.contagens()}")
+            self.fronteira.fechar()
 
 # Para executar o crawler
 if __name__ == "__main__":
     try:
-        crawler = OlxCrawler()
-        estados = ['sp', 'rj', 'mg', 'ba', 'sc']
-        crawler.rastrear(estados=estados, max_paginas=100)
+        crawler = OlxCrawler(
+            max_paralelo=int(os.environ.get('MAX_PARALELO', MAX_REQUISICOES_PARALELAS)),
+            requisicoes_por_segundo=float(os.environ.get('REQUISICOES_POR_SEGUNDO', REQUISICOES_POR_SEGUNDO))
+        )
+        if os.environ.get('MODO') == 'atualizar':
+            # Revisita anúncios já coletados (preço, vendidos) em vez de buscar novos
+            crawler.atualizar_anuncios(int(os.environ.get('MAX_REVALIDACOES', MAX_REVALIDACOES)))
+        else:
+            estados = ['sp', 'rj', 'mg', 'ba', 'sc']
+            crawler.rastrear(estados=estados, max_paginas=100)
     except Exception as e:
         logging.error(f"Erro ao executar crawler: {e}", exc_info=True)
\ No newline at end of file
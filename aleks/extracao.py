@@ -0,0 +1,321 @@
+import json
+import logging
+import re
+import threading
+from collections import Counter
+from html import unescape
+from bs4 import BeautifulSoup
+
+# Seletores das páginas de anúncio
+TITULO_SELECTOR = 'h1.olx-text--title-large, h1.olx-text--title-xlarge, h1.olx-ad-title, span[data-testid="ad-title"]'
+DETALHES_CONTAINER_SELECTOR = 'div.ad__sc-2h9gkk-0.dLQbjb'
+DETALHES_ALTERNATIVOS_SELECTOR_1 = 'div[data-ds-component="DS-AdDetails"] div[data-testid="ad-properties-item"]'
+DETALHES_ALTERNATIVOS_SELECTOR_2 = 'div[data-testid="ad-properties"] div[data-testid="ad-properties-item"], div[data-testid="properties-card"] div[data-testid="ad-properties-item"]'
+PRECO_CONTAINER_SELECTOR = 'div#price-box-container'
+PRECO_SPAN_SELECTOR = 'span.olx-text--title-large, span[class*="title-large"]'
+PRECO_ALTERNATIVO_SELECTOR = 'div[data-testid="ad-price-wrapper"] span, span[data-ds-component="DS-Text"][class*="olx-text--title"]'
+PRECO_REGEX_PATTERN = r'R\$\s*[\d.,]+'
+PADRAO_PRECO = re.compile(PRECO_REGEX_PATTERN)
+
+# Estado embutido na página (Next.js / dataLayer): lido com uma regex e json.loads, sem montar o DOM
+PADRAO_NEXT_DATA = re.compile(r'<script[^>]*\bid="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL)
+PADRAO_INITIAL_DATA = re.compile(r'<script[^>]*\bid="initial-data"[^>]*\bdata-json="([^"]*)"', re.DOTALL)
+PADRAO_DATA_LAYER = re.compile(r'dataLayer\s*=\s*(\[.*?\])\s*;?\s*</script>', re.DOTALL)
+
+# Rótulo do detalhe na página -> chave do anúncio (a ordem importa: o primeiro rótulo contido vence)
+CAMPOS_POR_ROTULO = [
+    ('marca', 'marca'),
+    ('modelo', 'modelo'),
+    ('tipo de veículo', 'tipo_veiculo'),
+    ('ano', 'ano'),
+    ('quilometragem', 'quilometragem'),
+    ('potência do motor', 'potencia'),
+    ('combustível', 'combustivel'),
+    ('câmbio', 'cambio'),
+    ('direção', 'direcao'),
+    ('cor', 'cor'),
+    ('portas', 'portas'),
+    ('final de placa', 'final_placa'),
+    ('gnv', 'gnv'),
+    ('categoria', 'categoria'),
+]
+
+# Lista de marcas comuns para extração do título
+MARCAS_COMUNS = ['honda', 'toyota', 'volkswagen', 'vw', 'fiat', 'chevrolet', 'ford', 'hyundai', 'nissan', 'renault']
+
+
+def campo_do_rotulo(rotulo):
+    """Chave do anúncio correspondente ao rótulo de um detalhe (ou None)"""
+    rotulo = rotulo.strip().lower()
+    for trecho, campo in CAMPOS_POR_ROTULO:
+        if trecho in rotulo:
+            return campo
+    return None
+
+def formatar_preco(preco):
+    """Normaliza o preço para o formato da página ('R$ 45.000')"""
+    if isinstance(preco, (int, float)) or (isinstance(preco, str) and preco.strip().isdigit()):
+        return f"R$ {int(float(preco)):,}".replace(',', '.')
+    if isinstance(preco, str) and PADRAO_PRECO.search(preco):
+        return PADRAO_PRECO.search(preco).group(0).strip()
+    return None
+
+
+class ExtratorAnuncios:
+    """Extrai os dados de páginas de anúncio da OLX, tentando primeiro a estratégia que funcionou por último"""
+
+    def __init__(self, usar_json=True):
+        self.usar_json = usar_json
+        # Estratégias de cada grupo em níveis de precisão, tentados sempre na mesma ordem.
+        # Só dentro de um nível a última que acertou vai para a frente: uma estratégia menos
+        # precisa (ex.: a varredura de preço) nunca passa na frente de uma mais precisa
+        self.ordem = {
+            'detalhes': [['principal'], ['alternativo_1', 'alternativo_2']],
+            'preco': [['container'], ['alternativo'], ['varredura']],
+        }
+        self.tentativas = Counter()
+        self.acertos = Counter()
+        self.trava = threading.Lock()
+
+    def extrair(self, conteudo_html, dados_anuncio):
+        """Preenche dados_anuncio com detalhes e preço. Retorna as estratégias usadas"""
+        usadas = {}
+        if self.usar_json:
+            estado = self._extrair_estado_json(conteudo_html)
+            if estado is not None:
+                usadas['json'] = estado[0]
+                self._aplicar_estado_json(estado[1], dados_anuncio)
+
+        # O DOM só é montado se o estado embutido não trouxe tudo
+        soup = None
+        if not dados_anuncio.get('modelo') and not dados_anuncio.get('marca'):
+            soup = BeautifulSoup(conteudo_html, 'lxml')
+            usadas['detalhes'] = self._extrair_detalhes_veiculo(soup, dados_anuncio)
+        if not dados_anuncio.get('preco'):
+            soup = soup or BeautifulSoup(conteudo_html, 'lxml')
+            usadas['preco'] = self._extrair_preco_anuncio(soup, dados_anuncio)
+        return usadas
+
+    # ---------- estratégias com cache da última que funcionou ----------
+
+    def _tentar(self, grupo, estrategias, *args):
+        """Executa as estratégias do grupo, nível a nível e na ordem aprendida do nível, até uma retornar True"""
+        for nivel in self.ordem[grupo]:
+            with self.trava:
+                nomes = list(nivel)
+            for nome in nomes:
+                with self.trava:
+                    self.tentativas[(grupo, nome)] += 1
+                if estrategias[nome](*args):
+                    with self.trava:
+                        self.acertos[(grupo, nome)] += 1
+                        if nivel[0] != nome:
+                            nivel.remove(nome)
+                            nivel.insert(0, nome)
+                    return nome
+        return None
+
+    def _registrar(self, grupo, nome, acertou):
+        with self.trava:
+            self.tentativas[(grupo, nome)] += 1
+            if acertou:
+                self.acertos[(grupo, nome)] += 1
+
+    def estatisticas(self):
+        """Tentativas, acertos e taxa de acerto de cada estratégia"""
+        with self.trava:
+            return {
+                f"{grupo}.{nome}": {
+                    'tentativas': tentativas,
+                    'acertos': self.acertos[(grupo, nome)],
+                    'taxa_acerto': round(self.acertos[(grupo, nome)] / tentativas, 3),
+                }
+                for (grupo, nome), tentativas in sorted(self.tentativas.items())
+            }
+
+    # ---------- caminho rápido: estado JSON embutido ----------
+
+    def _extrair_estado_json(self, conteudo_html):
+        """(origem, objeto) do primeiro estado JSON embutido que contenha o anúncio"""
+        for origem, padrao in (('next_data', PADRAO_NEXT_DATA), ('initial_data', PADRAO_INITIAL_DATA), ('data_layer', PADRAO_DATA_LAYER)):
+            encontrado = padrao.search(conteudo_html)
+            acertou = False
+            if encontrado:
+                try:
+                    texto = encontrado.group(1)
+                    dados = json.loads(unescape(texto) if origem == 'initial_data' else texto)
+                    anuncio = self._buscar_anuncio(dados)
+                    acertou = anuncio is not None
+                except ValueError as e:
+                    logging.debug(f"Estado JSON inválido em {origem}: {e}")
+            self._registrar('json', origem, acertou)
+            if acertou:
+                return origem, anuncio
+        return None
+
+    def _buscar_anuncio(self, dados):
+        """Primeiro objeto com a lista de propriedades (ou preço) do anúncio, em profundidade"""
+        pilha = [dados]
+        candidato = None
+        while pilha:
+            no = pilha.pop()
+            if isinstance(no, dict):
+                if isinstance(no.get('properties'), list):
+                    return no
+                if candidato is None and ('priceValue' in no or 'adDetail' in no):
+                    candidato = no.get('adDetail', no)
+                pilha.extend(no.values())
+            elif isinstance(no, list):
+                pilha.extend(no)
+        return candidato
+
+    def _aplicar_estado_json(self, anuncio, dados_anuncio):
+        for propriedade in anuncio.get('properties') or []:
+            if not isinstance(propriedade, dict):
+                continue
+            campo = campo_do_rotulo(str(propriedade.get('label', '')))
+            valor = propriedade.get('value')
+            if campo and valor not in (None, ''):
+                dados_anuncio[campo] = str(valor).strip()
+        for chave in ('priceValue', 'price'):
+            preco = formatar_preco(anuncio.get(chave))
+            if preco:
+                dados_anuncio['preco'] = preco
+                break
+
+    # ---------- detalhes do veículo pelo DOM ----------
+
+    def _extrair_detalhes_veiculo(self, soup, dados_anuncio):
+        """Extrai os detalhes do veículo (marca, ano, km, etc)"""
+        estrategia = self._tentar('detalhes', {
+            'principal': self._detalhes_principal,
+            'alternativo_1': lambda s, d: self._detalhes_alternativos(s, d, DETALHES_ALTERNATIVOS_SELECTOR_1),
+            'alternativo_2': lambda s, d: self._detalhes_alternativos(s, d, DETALHES_ALTERNATIVOS_SELECTOR_2),
+        }, soup, dados_anuncio)
+
+        if estrategia != 'principal':
+            logging.warning("Detalhes não encontrados na seção principal, usando breadcrumb e título")
+            # Tenta extrair a marca do breadcrumb
+            self._extrair_marca_do_breadcrumb(soup, dados_anuncio)
+            # Se ainda não tiver marca, tentar extrair do título
+            self._tentar_extrair_marca_do_titulo(dados_anuncio)
+        return estrategia
+
+    def _detalhes_principal(self, soup, dados_anuncio):
+        secao_detalhes = soup.select_one('div#details')
+        if not secao_detalhes:
+            return False
+        containers = secao_detalhes.select(DETALHES_CONTAINER_SELECTOR)
+        if not containers:
+            return False
+        logging.info(f"Encontrados {len(containers)} containers de detalhes do anúncio")
+
+        for container in containers:
+            try:
+                # Extrai etiqueta (label) e valor de cada detalhe
+                elemento_label = container.select_one('span[data-variant="overline"]')
+                if not elemento_label:
+                    continue
+                elemento_valor = container.select_one('a.olx-link, span.ekhFnR, span:not([data-variant])')
+                if not elemento_valor:
+                    continue
+
+                campo = campo_do_rotulo(elemento_label.text)
+                if campo:
+                    dados_anuncio[campo] = elemento_valor.text.strip()
+                    logging.debug(f"{campo}: {dados_anuncio[campo]}")
+            except Exception as erro_detalhe:
+                logging.error(f"Erro ao extrair detalhe: {erro_detalhe}")
+        return True
+
+    def _detalhes_alternativos(self, soup, dados_anuncio, seletor):
+        elementos_detalhe = soup.select(seletor)
+        if not elementos_detalhe:
+            return False
+        logging.info(f"Encontrados {len(elementos_detalhe)} elementos de detalhes alternativos")
+
+        for detalhe in elementos_detalhe:
+            try:
+                label = detalhe.select_one('span.olx-text--caption')
+                valor = detalhe.select_one('span.olx-text--body-large, span.olx-text--body, span:not(.olx-text--caption), a')
+
+                if label and valor:
+                    texto_label = label.text.strip().lower()
+                    texto_valor = valor.text.strip()
+
+                    if 'marca' in texto_label:
+                        dados_anuncio['marca'] = texto_valor
+                    elif 'modelo' in texto_label and not dados_anuncio.get('modelo'):
+                        dados_anuncio['modelo'] = texto_valor
+                    # Outros mapeamentos de detalhes poderiam ser adicionados aqui
+            except Exception as e:
+                logging.error(f"Erro ao extrair detalhe alternativo: {e}")
+        return True
+
+    def _extrair_marca_do_breadcrumb(self, soup, dados_anuncio):
+        """Tenta extrair a marca do veículo do breadcrumb da página"""
+        breadcrumb = soup.select('ol[data-testid="breadcrumb"] li a')
+        if breadcrumb and len(breadcrumb) >= 3:
+            possivel_marca = breadcrumb[2].text.strip()
+            dados_anuncio['marca'] = possivel_marca
+            logging.info(f"Marca extraída do breadcrumb: {possivel_marca}")
+
+    def _tentar_extrair_marca_do_titulo(self, dados_anuncio):
+        """Tenta extrair a marca do veículo a partir do título/modelo"""
+        if not dados_anuncio.get('marca') and dados_anuncio.get('modelo'):
+            primeira_palavra = dados_anuncio['modelo'].split()[0]
+            if primeira_palavra.lower() in MARCAS_COMUNS:
+                dados_anuncio['marca'] = primeira_palavra
+                logging.info(f"Marca extraída do título: {primeira_palavra}")
+            else:
+                dados_anuncio['marca'] = "Marca não encontrada"
+
+    # ---------- preço pelo DOM ----------
+
+    def _extrair_preco_anuncio(self, soup, dados_anuncio):
+        """Extrai o preço do anúncio usando várias estratégias"""
+        try:
+            estrategia = self._tentar('preco', {
+                'container': self._preco_container,
+                'alternativo': self._preco_alternativo,
+                'varredura': self._preco_varredura,
+            }, soup, dados_anuncio)
+            if estrategia is None:
+                logging.warning("Preço não encontrado no anúncio")
+                dados_anuncio['preco'] = "Preço não encontrado"
+            return estrategia
+        except Exception as e:
+            logging.error(f"Erro ao extrair preço: {e}")
+            dados_anuncio['preco'] = "Erro na extração"
+            return None
+
+    def _preco_container(self, soup, dados_anuncio):
+        container_preco = soup.select_one(PRECO_CONTAINER_SELECTOR)
+        if not container_preco:
+            return False
+        span_preco = container_preco.select_one(PRECO_SPAN_SELECTOR)
+        if span_preco and 'R$' in span_preco.text:
+            dados_anuncio['preco'] = span_preco.text.strip()
+            return True
+        # Busca por regex de preço no container
+        texto_preco = PADRAO_PRECO.search(container_preco.text)
+        if texto_preco:
+            dados_anuncio['preco'] = texto_preco.group(0).strip()
+            return True
+        return False
+
+    def _preco_alternativo(self, soup, dados_anuncio):
+        elemento_preco = soup.select_one(PRECO_ALTERNATIVO_SELECTOR)
+        if elemento_preco and 'R$' in elemento_preco.text:
+            dados_anuncio['preco'] = elemento_preco.text.strip()
+            return True
+        return False
+
+    def _preco_varredura(self, soup, dados_anuncio):
+        # Busca por padrão de preço em qualquer elemento
+        for elemento in soup.find_all(['span', 'div', 'p']):
+            encontrado = PADRAO_PRECO.search(elemento.text) if elemento.text else None
+            if encontrado:
+                dados_anuncio['preco'] = encontrado.group(0).strip()
+                return True
+        return False
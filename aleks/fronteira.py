@@ -0,0 +1,118 @@
+import time
+import sqlite3
+import threading
+
+# Itens que falham mais vezes que isso saem da fila
+MAX_TENTATIVAS = 5
+
+LISTAGEM, ANUNCIO = 'listagem', 'anuncio'
+PENDENTE, EM_ANDAMENTO, CONCLUIDO, FALHOU = 'pendente', 'em_andamento', 'concluido', 'falhou'
+
+
+class FronteiraRastreamento:
+    """Fila persistente (SQLite) de páginas de listagem e anúncios, com prioridade, tentativas e horário mínimo"""
+
+    def __init__(self, caminho, max_tentativas=MAX_TENTATIVAS):
+        self.caminho = caminho
+        self.max_tentativas = max_tentativas
+        self.trava = threading.Lock()
+        # Uma conexão compartilhada pelas threads, sempre usada sob a trava
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        self.conexao.execute('''
+            CREATE TABLE IF NOT EXISTS fronteira (
+                url TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                estado TEXT,
+                pagina INTEGER,
+                prioridade REAL NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                nao_antes REAL NOT NULL DEFAULT 0,
+                situacao TEXT NOT NULL DEFAULT 'pendente',
+                atualizado REAL
+            )
+        ''')
+        self.conexao.execute('CREATE INDEX IF NOT EXISTS idx_elegiveis ON fronteira (situacao, prioridade, nao_antes)')
+        # Itens que estavam sendo processados quando o crawler parou voltam para a fila
+        with self.trava:
+            self.conexao.execute('UPDATE fronteira SET situacao = ? WHERE situacao = ?', (PENDENTE, EM_ANDAMENTO))
+
+    def adicionar(self, itens, reabrir=False):
+        """Enfileira itens (url, tipo, estado, pagina, prioridade, nao_antes).
+        Com reabrir=True, itens já concluídos voltam para a fila (páginas de listagem de uma nova rodada)"""
+        agora = time.time()
+        linhas = [(url, tipo, estado, pagina, prioridade, nao_antes, agora) for url, tipo, estado, pagina, prioridade, nao_antes in itens]
+        sql = '''INSERT INTO fronteira (url, tipo, estado, pagina, prioridade, nao_antes, atualizado) VALUES (?, ?, ?, ?, ?, ?, ?)'''
+        if reabrir:
+            sql += ''' ON CONFLICT(url) DO UPDATE SET situacao = 'pendente', tentativas = 0, prioridade = excluded.prioridade,
+                       nao_antes = excluded.nao_antes, atualizado = excluded.atualizado
+                       WHERE situacao != 'em_andamento' '''
+        else:
+            sql += ' ON CONFLICT(url) DO NOTHING'
+        with self.trava:
+            self.conexao.execute('BEGIN')
+            self.conexao.executemany(sql, linhas)
+            self.conexao.execute('COMMIT')
+
+    def proximo(self):
+        """Retira o item elegível de menor prioridade (marcando-o em andamento), ou None"""
+        agora = time.time()
+        with self.trava:
+            linha = self.conexao.execute(
+                '''SELECT url, tipo, estado, pagina, tentativas FROM fronteira
+                   WHERE situacao = ? AND nao_antes <= ? ORDER BY prioridade, nao_antes LIMIT 1''',
+                (PENDENTE, agora)
+            ).fetchone()
+            if linha is None:
+                return None
+            self.conexao.execute('UPDATE fronteira SET situacao = ?, atualizado = ? WHERE url = ?', (EM_ANDAMENTO, agora, linha[0]))
+        return dict(zip(('url', 'tipo', 'estado', 'pagina', 'tentativas'), linha))
+
+    def concluir(self, url):
+        with self.trava:
+            self.conexao.execute('UPDATE fronteira SET situacao = ?, atualizado = ? WHERE url = ?', (CONCLUIDO, time.time(), url))
+
+    def falhar(self, url, atraso):
+        """Devolve o item à fila para depois de `atraso` segundos, ou o descarta após o máximo de tentativas"""
+        agora = time.time()
+        with self.trava:
+            self.conexao.execute(
+                '''UPDATE fronteira SET tentativas = tentativas + 1, atualizado = ?, nao_antes = ?,
+                   situacao = CASE WHEN tentativas + 1 >= ? THEN ? ELSE ? END WHERE url = ?''',
+                (agora, agora + atraso, self.max_tentativas, FALHOU, PENDENTE, url)
+            )
+
+    def adiar_estado(self, estado, atraso):
+        """Empurra todos os itens pendentes de um estado (ex.: bloqueado) sem parar os demais"""
+        with self.trava:
+            self.conexao.execute(
+                'UPDATE fronteira SET nao_antes = MAX(nao_antes, ?) WHERE estado = ? AND situacao = ?',
+                (time.time() + atraso, estado, PENDENTE)
+            )
+
+    def pendentes(self, estado=None):
+        """Quantidade de itens ainda por fazer (pendentes ou em andamento)"""
+        sql = 'SELECT COUNT(*) FROM fronteira WHERE situacao IN (?, ?)'
+        parametros = [PENDENTE, EM_ANDAMENTO]
+        if estado is not None:
+            sql += ' AND estado = ?'
+            parametros.append(estado)
+        with self.trava:
+            return self.conexao.execute(sql, parametros).fetchone()[0]
+
+    def espera(self):
+        """Segundos até o próximo item pendente ficar elegível (None se não há pendentes)"""
+        with self.trava:
+            nao_antes = self.conexao.execute('SELECT MIN(nao_antes) FROM fronteira WHERE situacao = ?', (PENDENTE,)).fetchone()[0]
+        return None if nao_antes is None else max(0.0, nao_antes - time.time())
+
+    def contagens(self):
+        """Quantidade de itens por tipo e situação"""
+        with self.trava:
+            linhas = self.conexao.execute('SELECT tipo, situacao, COUNT(*) FROM fronteira GROUP BY tipo, situacao').fetchall()
+        return {f"{tipo}.{situacao}": quantidade for tipo, situacao, quantidade in linhas}
+
+    def fechar(self):
+        with self.trava:
+            self.conexao.close()
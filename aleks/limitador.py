@@ -0,0 +1,167 @@
+import time
+import threading
+from collections import Counter, deque
+from urllib.parse import urlparse
+
+# Controle adaptativo (AIMD) da taxa de cada host
+TAXA_MINIMA = 0.1           # requisições por segundo
+TAXA_MAXIMA = 5.0
+INCREMENTO_TAXA = 0.05      # somado à taxa a cada resposta saudável
+FATOR_REDUCAO = 0.5         # multiplica a taxa a cada bloqueio (403/429/captcha)
+INTERVALO_MINIMO_CORTE = 5  # bloqueios de requisições que já estavam em voo não cortam de novo
+PAUSA_BLOQUEIO = 30         # segundos; dobra a cada bloqueio seguido
+PAUSA_MAXIMA = 600
+JANELA_METRICAS = 200       # respostas usadas na taxa de bloqueio recente
+
+
+def _validar_taxa(taxa):
+    taxa = float(taxa)
+    if not taxa > 0:
+        raise ValueError(f"Taxa de requisições deve ser maior que zero (recebido {taxa})")
+    return taxa
+
+
+class LimitadorTaxa:
+    """Token bucket thread-safe que limita a quantidade de requisições por segundo"""
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = _validar_taxa(taxa)
+        self.capacidade = float(capacidade) if capacidade else max(1.0, self.taxa)
+        self.tokens = self.capacidade
+        self.ultima_recarga = time.monotonic()
+        self.trava = threading.Lock()
+
+    def _recarregar(self):
+        """Repõe os tokens proporcionalmente ao tempo decorrido desde a última recarga"""
+        agora = time.monotonic()
+        decorrido = agora - self.ultima_recarga
+        self.tokens = min(self.capacidade, self.tokens + decorrido * self.taxa)
+        self.ultima_recarga = agora
+
+    def adquirir(self):
+        """Bloqueia até haver um token disponível e o consome. Retorna o tempo esperado"""
+        tempo_esperado = 0.0
+        while True:
+            with self.trava:
+                self._recarregar()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return tempo_esperado
+                espera = (1 - self.tokens) / self.taxa
+            time.sleep(espera)
+            tempo_esperado += espera
+
+    def ajustar_taxa(self, taxa):
+        """Troca a taxa de reposição (os tokens acumulados até agora usam a taxa antiga)"""
+        taxa = _validar_taxa(taxa)
+        with self.trava:
+            self._recarregar()
+            self.taxa = taxa
+
+    def pausar(self, segundos):
+        """Esvazia o balde de forma que o próximo token só saia depois de `segundos`"""
+        with self.trava:
+            self._recarregar()
+            self.tokens = min(self.tokens, 1 - segundos * self.taxa)
+
+
+class ControladorAIMD:
+    """Ajusta a taxa de um LimitadorTaxa: aumento aditivo com respostas saudáveis, corte multiplicativo em bloqueios"""
+
+    def __init__(self, limitador, taxa_minima=TAXA_MINIMA, taxa_maxima=TAXA_MAXIMA, incremento=INCREMENTO_TAXA,
+                 fator_reducao=FATOR_REDUCAO, pausa_bloqueio=PAUSA_BLOQUEIO, janela=JANELA_METRICAS):
+        self.limitador = limitador
+        self.taxa_minima = taxa_minima
+        self.taxa_maxima = taxa_maxima
+        self.incremento = incremento
+        self.fator_reducao = fator_reducao
+        self.pausa_bloqueio = pausa_bloqueio
+        self.trava = threading.Lock()
+        self.recentes = deque(maxlen=janela)  # 1 = bloqueio, 0 = resposta saudável
+        self.requisicoes = 0
+        self.bloqueios = 0
+        self.bloqueios_seguidos = 0
+        self.cortes = 0
+        self.ultimo_corte = float('-inf')
+        self.motivos = Counter()
+
+    def registrar_sucesso(self):
+        with self.trava:
+            self.requisicoes += 1
+            self.recentes.append(0)
+            self.bloqueios_seguidos = 0
+            # Aplicada sob a trava: duas threads não calculam a partir da mesma taxa e se sobrescrevem
+            self.limitador.ajustar_taxa(min(self.taxa_maxima, self.limitador.taxa + self.incremento))
+
+    def registrar_bloqueio(self, motivo, espera_servidor=None):
+        """Corta a taxa e pausa o host. Retorna a pausa aplicada, em segundos"""
+        agora = time.monotonic()
+        with self.trava:
+            self.requisicoes += 1
+            self.bloqueios += 1
+            self.bloqueios_seguidos += 1
+            self.recentes.append(1)
+            self.motivos[motivo] += 1
+            cortar = agora - self.ultimo_corte >= INTERVALO_MINIMO_CORTE
+            if cortar:
+                self.ultimo_corte = agora
+                self.cortes += 1
+                self.limitador.ajustar_taxa(max(self.taxa_minima, self.limitador.taxa * self.fator_reducao))
+            # Retry-After do servidor, se houver; senão pausa exponencial nos bloqueios seguidos
+            pausa = espera_servidor or min(PAUSA_MAXIMA, self.pausa_bloqueio * 2 ** (self.bloqueios_seguidos - 1))
+        self.limitador.pausar(pausa)
+        return pausa
+
+    def metricas(self):
+        with self.trava:
+            return {
+                'taxa_atual': round(self.limitador.taxa, 3),
+                'requisicoes': self.requisicoes,
+                'bloqueios': self.bloqueios,
+                'taxa_bloqueio': round(self.bloqueios / self.requisicoes, 4) if self.requisicoes else 0.0,
+                'taxa_bloqueio_recente': round(sum(self.recentes) / len(self.recentes), 4) if self.recentes else 0.0,
+                'cortes': self.cortes,
+                'motivos': dict(self.motivos),
+            }
+
+
+class LimitadoresPorHost:
+    """Mantém um token bucket independente para cada host acessado"""
+
+    def __init__(self, requisicoes_por_segundo, rajada=None):
+        self.requisicoes_por_segundo = _validar_taxa(requisicoes_por_segundo)
+        self.rajada = rajada
+        self.limitadores = {}
+        self.controladores = {}
+        self.trava = threading.Lock()
+
+    def obter(self, url):
+        """Retorna o limitador do host da URL, criando-o se necessário"""
+        host = urlparse(url).netloc
+        with self.trava:
+            limitador = self.limitadores.get(host)
+            if limitador is None:
+                limitador = LimitadorTaxa(self.requisicoes_por_segundo, self.rajada)
+                self.limitadores[host] = limitador
+            return limitador
+
+    def aguardar(self, url):
+        """Aguarda o orçamento de requisições do host da URL"""
+        return self.obter(url).adquirir()
+
+    def controlador(self, url):
+        """Retorna o controlador AIMD do host da URL, criando-o se necessário"""
+        limitador = self.obter(url)
+        host = urlparse(url).netloc
+        with self.trava:
+            controlador = self.controladores.get(host)
+            if controlador is None:
+                controlador = ControladorAIMD(limitador)
+                self.controladores[host] = controlador
+            return controlador
+
+    def metricas(self):
+        """Taxa atual e taxas de bloqueio de cada host"""
+        with self.trava:
+            controladores = dict(self.controladores)
+        return {host: controlador.metricas() for host, controlador in controladores.items()}
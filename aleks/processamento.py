@@ -1,13 +1,25 @@
 import os
 import json
+import argparse
 import time
 import sys
 import psutil
-from collections import defaultdict
+import heapq
+import shutil
+import tempfile
+from collections import defaultdict, deque
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import nltk
 from nltk.corpus import stopwords
 from nltk.stem import RSLPStemmer
 import string
+import numpy as np
+from colunas import IndiceNumerico, CAMPOS_NUMERICOS, CONVERSORES, valor_preco, valor_km, valor_ano
+from bitmaps import Bitmap, IndiceBitmap
+from armazenamento import RegistroAnuncios
 
 # Baixar recursos do NLTK se necessário
 nltk.download('stopwords', quiet=True)
@@ -17,11 +29,28 @@ nltk.download('rslp', quiet=True)
 # Caminhos dos arquivos
 DIRETORIO_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 ARQUIVO_JSON = os.path.join(DIRETORIO_DADOS, 'anuncios.json')
+ARQUIVO_JSONL = os.path.join(DIRETORIO_DADOS, 'anuncios.jsonl')
 ARQUIVO_INDICE = os.path.join(DIRETORIO_DADOS, 'indice_invertido.json')
+# Indexação incremental: termos de cada anúncio (id -> termos) e posição já indexada do log
+ARQUIVO_INDICE_DIRETO = os.path.join(DIRETORIO_DADOS, 'indice_direto.jsonl')
+ARQUIVO_ESTADO = os.path.join(DIRETORIO_DADOS, 'estado_indice.json')
+# Colunas numéricas (preco, quilometragem, ano) para filtros por faixa arbitrária
+ARQUIVO_COLUNAS = os.path.join(DIRETORIO_DADOS, 'colunas_numericas.npz')
+# Índice compacto (doc-ids inteiros, listas ou bitmaps) para consultas booleanas
+ARQUIVO_INDICE_BITMAP = os.path.join(DIRETORIO_DADOS, 'indice_bitmap.npz')
 
 # Parâmetros de granularidade e chunk
 GRANULARIDADE = 'campo'  # 'anuncio' ou 'campo' (campo = marca, modelo, etc)
 TAMANHO_CHUNK = 100  # Quantidade de anúncios por chunk
+PROCESSOS = os.cpu_count() or 1  # Processos usados na indexação dos chunks
+
+# Limites dos caches de pré-processamento (valores de campo e tokens distintos)
+TAMANHO_CACHE_VALORES = 50000
+TAMANHO_CACHE_STEM = 100000
+
+# Indexação em streaming: runs ordenadas gravadas em disco a cada chunk
+FATOR_INTERCALACAO = 64  # Máximo de runs abertas ao mesmo tempo no k-way merge
+TAMANHO_BLOCO_LEITURA = 1 << 16  # Bytes lidos por vez do array JSON
 
 # Função para medir uso de memória
 def uso_memoria_mb():
@@ -34,6 +63,10 @@ class Preprocessador:
         self.stopwords = set(stopwords.words('portuguese'))
         self.stemmer = RSLPStemmer()
         self.tabela_pontuacao = str.maketrans('', '', string.punctuation)
+        # Valores como combustivel, cambio, cor e marca se repetem em milhares de
+        # anúncios: o stemming é feito uma vez por token/valor distinto
+        self.stem = lru_cache(maxsize=TAMANHO_CACHE_STEM)(self.stemmer.stem)
+        self.tokens_valor = lru_cache(maxsize=TAMANHO_CACHE_VALORES)(self._tokens_valor)
 
     def limpar_texto(self, texto):
         if not texto:
@@ -45,22 +78,84 @@ class Preprocessador:
     def analisar_lexica(self, texto):
         tokens = texto.split()
         tokens = [t for t in tokens if t not in self.stopwords]
-        tokens = [self.stemmer.stem(t) for t in tokens]
+        tokens = [self.stem(t) for t in tokens]
         return tokens
 
-# Função para carregar dados
+    def _tokens_valor(self, valor):
+        return tuple(self.analisar_lexica(self.limpar_texto(valor)))
+
+# Leitura incremental de anúncios, sem carregar o arquivo inteiro
+def ler_anuncios_streaming(caminho):
+    if caminho.endswith('.jsonl'):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for numero, linha in enumerate(f, 1):
+                if not linha.strip():
+                    continue
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError:
+                    # Linha truncada (crawler interrompido ou ainda escrevendo)
+                    print(f'Linha {numero} inválida em {caminho}. Ignorando.')
+        return
+    # Array JSON: decodifica um objeto por vez a partir de um buffer deslizante
+    decodificador = json.JSONDecoder()
+    with open(caminho, 'r', encoding='utf-8') as f:
+        buffer, pos, dentro_array, descartados = '', 0, False, 0
+        while True:
+            # Pula espaços, vírgulas e os delimitadores do array
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in ',]' or (buffer[pos] == '[' and not dentro_array)):
+                dentro_array = dentro_array or buffer[pos] == '['
+                pos += 1
+            try:
+                if pos >= len(buffer):
+                    raise ValueError
+                anuncio, fim = decodificador.raw_decode(buffer, pos)
+            except ValueError:
+                bloco = f.read(TAMANHO_BLOCO_LEITURA)
+                if not bloco:
+                    # Sobrou texto que não forma um objeto: arquivo truncado ou objeto malformado
+                    if buffer[pos:].strip():
+                        raise ValueError(f'JSON inválido em {caminho} a partir do caractere {descartados + pos}')
+                    return
+                descartados += pos
+                buffer, pos = buffer[pos:] + bloco, 0
+                continue
+            yield anuncio
+            pos = fim
+
+def anuncios_vigentes(caminho):
+    """Somente a última versão de cada anúncio, descartando os removidos"""
+    ultima_posicao = {}
+    for posicao, anuncio in enumerate(ler_anuncios_streaming(caminho)):
+        if anuncio.get('id'):
+            ultima_posicao[anuncio['id']] = posicao
+    for posicao, anuncio in enumerate(ler_anuncios_streaming(caminho)):
+        id_anuncio = anuncio.get('id')
+        if id_anuncio and ultima_posicao.get(id_anuncio) == posicao and not anuncio.get('removido'):
+            yield anuncio
+
+def gerar_chunks(anuncios, chunk_size):
+    chunk = []
+    for anuncio in anuncios:
+        chunk.append(anuncio)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Função para carregar dados (log JSONL do crawler ou array JSON legado)
 def carregar_anuncios():
+    if os.path.exists(ARQUIVO_JSONL):
+        with open(ARQUIVO_JSONL, 'r', encoding='utf-8') as f:
+            return [json.loads(linha) for linha in f if linha.strip()]
     with open(ARQUIVO_JSON, 'r', encoding='utf-8') as f:
         return json.load(f)
 
 # Função para categorizar preço em faixas
 def faixa_preco(preco):
-    if not preco:
-        return None
-    preco = str(preco).replace('R$', '').replace('.', '').replace(',', '.').strip()
-    try:
-        preco = float(preco)
-    except Exception:
+    preco = valor_preco(preco)
+    if preco is None:
         return None
     if preco < 20000:
         return '0-20k'
@@ -75,12 +170,8 @@ def faixa_preco(preco):
 
 # Função para categorizar quilometragem em faixas
 def faixa_km(km):
-    if not km:
-        return None
-    km = str(km).replace('.', '').replace('km', '').strip()
-    try:
-        km = int(km)
-    except Exception:
+    km = valor_km(km)
+    if km is None:
         return None
     if km < 50000:
         return '0-50k'
@@ -95,11 +186,8 @@ def faixa_km(km):
 
 # Função para categorizar ano em faixas
 def faixa_ano(ano):
-    if not ano:
-        return None
-    try:
-        ano = int(ano)
-    except Exception:
+    ano = valor_ano(ano)
+    if ano is None:
         return None
     if ano < 2000:
         return '-2000'
@@ -113,77 +201,616 @@ def faixa_ano(ano):
 # Função para construir índice invertido melhorado
 # Indexa todos os campos relevantes, com faixas para preço, km e ano
 
-def construir_indice_invertido(anuncios, granularidade='campo', chunk_size=100):
-    campos_texto = [
-        'marca', 'modelo', 'estado', 'categoria', 'tipo_veiculo', 'potencia',
-        'combustivel', 'cambio', 'direcao', 'cor', 'portas', 'gnv', 'final_placa'
-    ]
+CAMPOS_TEXTO = [
+    'marca', 'modelo', 'estado', 'categoria', 'tipo_veiculo', 'potencia',
+    'combustivel', 'cambio', 'direcao', 'cor', 'portas', 'gnv', 'final_placa'
+]
+
+# Um preprocessador (e seus caches) por processo
+_preprocessador = None
+
+def obter_preprocessador():
+    global _preprocessador
+    if _preprocessador is None:
+        _preprocessador = Preprocessador()
+    return _preprocessador
+
+def indexar_chunk(chunk):
+    """Constrói o índice parcial (termo -> set de IDs) de um chunk de anúncios"""
     indice = defaultdict(set)
-    preprocessador = Preprocessador()
-    total = len(anuncios)
-    for i in range(0, total, chunk_size):
-        chunk = anuncios[i:i+chunk_size]
-        for anuncio in chunk:
-            id_anuncio = anuncio.get('id')
-            # Indexação de campos textuais
-            for campo in campos_texto:
-                valor = anuncio.get(campo)
-                if valor:
-                    texto_limpo = preprocessador.limpar_texto(str(valor))
-                    tokens = preprocessador.analisar_lexica(texto_limpo)
-                    for token in tokens:
-                        indice[f'{campo}:{token}'].add(id_anuncio)
-            # Indexação de preço por faixa
-            faixa = faixa_preco(anuncio.get('preco'))
-            if faixa:
-                indice[f'preco:{faixa}'].add(id_anuncio)
-            # Indexação de quilometragem por faixa
-            faixa = faixa_km(anuncio.get('quilometragem'))
-            if faixa:
-                indice[f'quilometragem:{faixa}'].add(id_anuncio)
-            # Indexação de ano por faixa
-            faixa = faixa_ano(anuncio.get('ano'))
-            if faixa:
-                indice[f'ano:{faixa}'].add(id_anuncio)
+    preprocessador = obter_preprocessador()
+    for anuncio in chunk:
+        id_anuncio = anuncio.get('id')
+        # Indexação de campos textuais
+        for campo in CAMPOS_TEXTO:
+            valor = anuncio.get(campo)
+            if valor:
+                for token in preprocessador.tokens_valor(str(valor)):
+                    indice[f'{campo}:{token}'].add(id_anuncio)
+        # Indexação de preço por faixa
+        faixa = faixa_preco(anuncio.get('preco'))
+        if faixa:
+            indice[f'preco:{faixa}'].add(id_anuncio)
+        # Indexação de quilometragem por faixa
+        faixa = faixa_km(anuncio.get('quilometragem'))
+        if faixa:
+            indice[f'quilometragem:{faixa}'].add(id_anuncio)
+        # Indexação de ano por faixa
+        faixa = faixa_ano(anuncio.get('ano'))
+        if faixa:
+            indice[f'ano:{faixa}'].add(id_anuncio)
+    return indice
+
+def indexar_chunks(chunks, processos=1):
+    """Gera os índices parciais na ordem dos chunks, com poucos chunks em voo por vez"""
+    if processos <= 1:
+        for chunk in chunks:
+            yield indexar_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        pendentes = deque()
+        for chunk in chunks:
+            pendentes.append(executor.submit(indexar_chunk, chunk))
+            if len(pendentes) >= processos * 2:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+def construir_indice_invertido(anuncios, granularidade='campo', chunk_size=100, processos=1):
+    indice = defaultdict(set)
+    # Cada processo indexa chunks inteiros; os índices parciais são unidos aqui
+    for parcial in indexar_chunks(gerar_chunks(anuncios, chunk_size), processos):
+        for termo, ids in parcial.items():
+            indice[termo].update(ids)
     # Converte sets para listas para serialização
     return {k: list(v) for k, v in indice.items()}
 
+# Indexação em streaming (memória limitada pelo chunk)
+#
+# Cada chunk vira uma run: arquivo com linhas "termo<TAB>id<TAB>doc" ordenadas
+# (doc = doc-id inteiro, na ordem de leitura, usado pelo índice de bitmaps).
+# As runs são intercaladas (k-way merge) em grupos de até FATOR_INTERCALACAO
+# e o índice final é escrito termo a termo, sem montar o dicionário em memória.
+
+def gravar_run(parcial, doc_por_id, diretorio, numero):
+    caminho = os.path.join(diretorio, f'run_{numero:06d}.tsv')
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for termo in sorted(parcial):
+            for id_anuncio in sorted(parcial[termo]):
+                f.write(f'{termo}\t{id_anuncio}\t{doc_por_id[id_anuncio]}\n')
+    return caminho
+
+def ler_run(caminho):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            termo, id_anuncio, doc = linha.rstrip('\n').split('\t')
+            yield termo, id_anuncio, doc
+
+def intercalar_runs(runs, diretorio, numero_inicial):
+    """Reduz a lista de runs até caber em um único k-way merge"""
+    numero = numero_inicial
+    while len(runs) > FATOR_INTERCALACAO:
+        novas_runs = []
+        for i in range(0, len(runs), FATOR_INTERCALACAO):
+            grupo = runs[i:i + FATOR_INTERCALACAO]
+            caminho = os.path.join(diretorio, f'run_{numero:06d}.tsv')
+            numero += 1
+            with open(caminho, 'w', encoding='utf-8') as f:
+                for termo, id_anuncio, doc in heapq.merge(*(ler_run(r) for r in grupo)):
+                    f.write(f'{termo}\t{id_anuncio}\t{doc}\n')
+            for r in grupo:
+                os.remove(r)
+            novas_runs.append(caminho)
+        runs = novas_runs
+    return runs
+
+def escrever_termos(termos, caminho_indice):
+    """Grava o índice invertido a partir de pares (termo, lista de IDs) em ordem de termo, um termo por linha"""
+    total_termos = 0
+    caminho_tmp = caminho_indice + '.tmp'
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        f.write('{')
+        for termo, ids in termos:
+            f.write(',\n  ' if total_termos else '\n  ')
+            f.write(json.dumps(termo, ensure_ascii=False) + ': ' + json.dumps(ids, ensure_ascii=False))
+            total_termos += 1
+        f.write('\n}\n' if total_termos else '}\n')
+    os.replace(caminho_tmp, caminho_indice)
+    return total_termos
+
+def ler_indice(caminho_indice):
+    """Lê o índice gravado por escrever_termos termo a termo: (termo, lista de IDs), em ordem de termo"""
+    with open(caminho_indice, 'r', encoding='utf-8') as f:
+        for linha in f:
+            linha = linha.strip().rstrip(',')
+            if linha in ('', '{', '}', '{}'):
+                continue
+            yield next(iter(json.loads('{' + linha + '}').items()))
+
+def escrever_indice(runs, caminho_indice, ao_fechar_termo=None):
+    """Escreve o JSON final (termo -> lista de IDs) a partir das runs ordenadas;
+    ao_fechar_termo(termo, docs) recebe os doc-ids inteiros de cada termo"""
+    def termos():
+        for termo, linhas in groupby(heapq.merge(*(ler_run(r) for r in runs)), key=itemgetter(0)):
+            ids, docs = [], []
+            for _, id_anuncio, doc in linhas:
+                if not ids or id_anuncio != ids[-1]:
+                    ids.append(id_anuncio)
+                    docs.append(int(doc))
+            if ao_fechar_termo:
+                ao_fechar_termo(termo, docs)
+            yield termo, ids
+    return escrever_termos(termos(), caminho_indice)
+
+class PostingsEmDisco:
+    """Doc-ids de cada termo gravados em sequência num arquivo; em memória ficam só o termo e onde ele termina"""
+
+    def __init__(self, diretorio):
+        self.caminho = os.path.join(diretorio, 'postings.bin')
+        self.arquivo = open(self.caminho, 'wb')
+        self.termos, self.limites = [], [0]
+
+    def guardar(self, termo, docs):
+        np.sort(np.asarray(docs, dtype=np.uint32)).tofile(self.arquivo)
+        self.termos.append(termo)
+        self.limites.append(self.limites[-1] + len(docs))
+
+    def pares(self):
+        """(termo, doc-ids ordenados) na ordem gravada, lidos por memmap"""
+        self.arquivo.close()
+        postings = np.memmap(self.caminho, dtype=np.uint32, mode='r') if self.limites[-1] else np.zeros(0, dtype=np.uint32)
+        for i, termo in enumerate(self.termos):
+            yield termo, postings[self.limites[i]:self.limites[i + 1]]
+
+def termos_por_anuncio(parcial):
+    """Inverte um índice parcial (termo -> IDs) para ID -> termos"""
+    termos = defaultdict(set)
+    for termo, ids in parcial.items():
+        for id_anuncio in ids:
+            termos[id_anuncio].add(termo)
+    return termos
+
+def construir_indice_streaming(caminho_anuncios, caminho_indice, chunk_size=100, processos=1, caminho_direto=None,
+                               caminho_colunas=None, caminho_bitmap=None):
+    """Constrói o índice lendo os anúncios incrementalmente; retorna métricas por fase"""
+    fases = {}
+    pico = [uso_memoria_mb()]
+
+    def registrar_fase(nome, inicio):
+        memoria = uso_memoria_mb()
+        pico[0] = max(pico[0], memoria)
+        fases[nome] = {'tempo_segundos': round(time.time() - inicio, 2), 'memoria_mb': round(memoria, 2)}
+
+    diretorio_runs = tempfile.mkdtemp(prefix='runs_', dir=os.path.dirname(caminho_indice))
+    try:
+        # Fase 1: leitura + indexação + gravação das runs
+        # IDs e colunas numéricas também vão para disco, na ordem de leitura (= doc-id inteiro)
+        inicio = time.time()
+        runs, contagem = [], [0]
+        caminho_ids = os.path.join(diretorio_runs, 'ids.jsonl')
+        caminho_numericos = os.path.join(diretorio_runs, 'numericos.bin')
+        # ID -> doc-id dos chunks ainda em indexação (no máximo processos * 2 em voo)
+        docs_em_voo = deque()
+
+        def chunks_numerados():
+            with open(caminho_ids, 'w', encoding='utf-8') as arquivo_ids, open(caminho_numericos, 'wb') as arquivo_numericos:
+                for chunk in gerar_chunks(anuncios_vigentes(caminho_anuncios), chunk_size):
+                    doc_por_id = {}
+                    for anuncio in chunk:
+                        doc_por_id[anuncio['id']] = contagem[0]
+                        contagem[0] += 1
+                        arquivo_ids.write(json.dumps(anuncio['id'], ensure_ascii=False) + '\n')
+                    # Valores ausentes (None) viram nan, como em IndiceNumerico.construir
+                    np.array([[CONVERSORES[campo](anuncio.get(campo)) for campo in CAMPOS_NUMERICOS] for anuncio in chunk],
+                             dtype=np.float64).tofile(arquivo_numericos)
+                    docs_em_voo.append(doc_por_id)
+                    yield chunk
+
+        # O índice direto (ID -> termos) é gravado junto, para as atualizações incrementais
+        arquivo_direto = open(caminho_direto + '.tmp', 'w', encoding='utf-8') if caminho_direto else None
+        for parcial in indexar_chunks(chunks_numerados(), processos):
+            runs.append(gravar_run(parcial, docs_em_voo.popleft(), diretorio_runs, len(runs)))
+            if arquivo_direto:
+                for id_anuncio, termos in termos_por_anuncio(parcial).items():
+                    arquivo_direto.write(json.dumps({'id': id_anuncio, 'termos': sorted(termos)}, ensure_ascii=False) + '\n')
+            pico[0] = max(pico[0], uso_memoria_mb())
+        if arquivo_direto:
+            arquivo_direto.close()
+            os.replace(caminho_direto + '.tmp', caminho_direto)
+        registrar_fase('indexacao_runs', inicio)
+
+        # Fase 2: intercalações intermediárias (apenas se houver runs demais)
+        inicio = time.time()
+        total_runs = len(runs)
+        runs = intercalar_runs(runs, diretorio_runs, total_runs)
+        registrar_fase('intercalacao', inicio)
+
+        # Fase 3: k-way merge final direto para o JSON
+        # Os doc-ids de cada termo vão para o disco (PostingsEmDisco), para o índice de bitmaps
+        inicio = time.time()
+        postings = PostingsEmDisco(diretorio_runs) if caminho_bitmap else None
+        total_termos = escrever_indice(runs, caminho_indice, postings.guardar if postings else None)
+        registrar_fase('escrita_indice', inicio)
+
+        if caminho_colunas or caminho_bitmap:
+            with open(caminho_ids, 'r', encoding='utf-8') as f:
+                ids = [json.loads(linha) for linha in f]
+
+        # Fase 4: colunas numéricas, na mesma ordem de leitura dos anúncios
+        if caminho_colunas:
+            inicio = time.time()
+            valores = np.fromfile(caminho_numericos, dtype=np.float64).reshape(-1, len(CAMPOS_NUMERICOS))
+            IndiceNumerico(ids, {campo: valores[:, i].copy() for i, campo in enumerate(CAMPOS_NUMERICOS)}).salvar(caminho_colunas)
+            registrar_fase('colunas_numericas', inicio)
+
+        # Fase 5: índice de bitmaps, lendo os postings gravados na fase 3
+        if caminho_bitmap:
+            inicio = time.time()
+            IndiceBitmap.construir_em_disco(postings.pares(), ids, diretorio_runs).salvar(caminho_bitmap)
+            registrar_fase('indice_bitmap', inicio)
+    finally:
+        shutil.rmtree(diretorio_runs, ignore_errors=True)
+
+    return {
+        'total_anuncios': contagem[0],
+        'total_termos_indice': total_termos,
+        'total_runs': total_runs,
+        'fases': fases,
+        'pico_memoria_mb': round(pico[0], 2),
+    }
+
+# Indexação incremental
+#
+# O estado guarda o offset (em bytes) já indexado do log anuncios.jsonl e o
+# último ID lido. Uma atualização lê só o final do log, compara os termos de
+# cada anúncio novo/alterado com o índice direto e aplica a diferença no
+# índice invertido. Registros {"id": ..., "removido": true} apagam o anúncio.
+# Se o log foi reescrito (compactação) ou a fonte é o array JSON legado, o
+# arquivo inteiro é comparado com o índice direto, sem reconstruir o índice:
+# IDs que sumiram da fonte também são removidos.
+
+def carregar_estado(caminho_estado):
+    if not os.path.exists(caminho_estado):
+        return None
+    with open(caminho_estado, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def salvar_estado(caminho_estado, estado):
+    caminho_tmp = caminho_estado + '.tmp'
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False, indent=2)
+    os.replace(caminho_tmp, caminho_estado)
+
+def estado_do_log(caminho_anuncios, offset, ultimo_id):
+    stat = os.stat(caminho_anuncios)
+    return {
+        'arquivo': os.path.basename(caminho_anuncios),
+        'inode': stat.st_ino,
+        'offset': offset,
+        'ultimo_id': ultimo_id,
+        'atualizado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+def ler_log_a_partir(caminho, offset):
+    """Lê as linhas completas do log a partir de um offset; retorna (registros, novo offset)"""
+    registros = []
+    with open(caminho, 'rb') as f:
+        f.seek(offset)
+        for linha in f:
+            # Linha ainda sendo escrita pelo crawler: fica para a próxima atualização
+            if not linha.endswith(b'\n'):
+                break
+            offset += len(linha)
+            if not linha.strip():
+                continue
+            try:
+                registros.append(json.loads(linha))
+            except json.JSONDecodeError:
+                print(f'Linha inválida no offset {offset - len(linha)} de {caminho}. Ignorando.')
+    return registros, offset
+
+def log_indexado(estado, caminho_anuncios):
+    """Indica se o estado aponta para este log (mesmo arquivo, mesmo inode, sem ter encolhido)"""
+    if estado is None or not caminho_anuncios.endswith('.jsonl') or not os.path.exists(caminho_anuncios):
+        return False
+    stat = os.stat(caminho_anuncios)
+    return (estado.get('arquivo') == os.path.basename(caminho_anuncios) and estado.get('inode') == stat.st_ino
+            and stat.st_size >= estado.get('offset', 0))
+
+def carregar_indice_direto(caminho_direto, ids=None):
+    """ID -> set de termos; a última linha de cada ID prevalece. Com `ids`, guarda só esses anúncios"""
+    direto = {}
+    if os.path.exists(caminho_direto):
+        with open(caminho_direto, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    registro = json.loads(linha)
+                    if ids is not None and registro['id'] not in ids:
+                        continue
+                    if registro.get('removido'):
+                        direto.pop(registro['id'], None)
+                    else:
+                        direto[registro['id']] = set(registro['termos'])
+    return direto
+
+def aplicar_diferenca(termos, adicionar, remover):
+    """Intercala o índice lido em ordem de termo com a diferença (termo -> IDs a incluir/excluir);
+    termos que ficam sem IDs saem do índice"""
+    def aplicar(termo, ids):
+        return sorted((set(ids) | adicionar.get(termo, set())) - remover.get(termo, set()))
+
+    alterados = iter(sorted(adicionar.keys() | remover.keys()))
+    proximo = next(alterados, None)
+    for termo, ids in termos:
+        # Termos novos, que ainda não estavam no índice
+        while proximo is not None and proximo < termo:
+            novos = aplicar(proximo, ())
+            if novos:
+                yield proximo, novos
+            proximo = next(alterados, None)
+        if proximo == termo:
+            ids = aplicar(termo, ids)
+            proximo = next(alterados, None)
+        if ids:
+            yield termo, ids
+    while proximo is not None:
+        novos = aplicar(proximo, ())
+        if novos:
+            yield proximo, novos
+        proximo = next(alterados, None)
+
+def atualizar_indice_incremental(caminho_anuncios, caminho_indice, caminho_direto, caminho_estado,
+                                 chunk_size=100, processos=1, caminho_colunas=None, caminho_bitmap=None):
+    """Aplica no índice existente apenas os anúncios novos, alterados ou removidos"""
+    estado = carregar_estado(caminho_estado)
+    if estado is None or not os.path.exists(caminho_indice) or not os.path.exists(caminho_direto):
+        return None
+
+    # Fase 1: anúncios a reindexar (ID -> anúncio, ou None se removido)
+    inicio = time.time()
+    modo_log = log_indexado(estado, caminho_anuncios)
+    alterados = {}
+    if modo_log:
+        registros, offset = ler_log_a_partir(caminho_anuncios, estado['offset'])
+    else:
+        registros, offset = ler_anuncios_streaming(caminho_anuncios), os.path.getsize(caminho_anuncios)
+    ultimo_id = estado.get('ultimo_id')
+    for registro in registros:
+        id_anuncio = registro.get('id')
+        if id_anuncio:
+            alterados[id_anuncio] = None if registro.get('removido') else registro
+            ultimo_id = id_anuncio
+
+    # Lendo só o final do log, basta o índice direto dos anúncios alterados
+    direto = carregar_indice_direto(caminho_direto, alterados.keys() if modo_log else None)
+    if not modo_log:
+        # Fonte reescrita: o que não aparece mais nela foi removido
+        for id_anuncio in direto.keys() - alterados.keys():
+            alterados[id_anuncio] = None
+    tempo_leitura = time.time() - inicio
+
+    # Fase 2: termos atuais de cada anúncio e diferença para o índice direto
+    inicio = time.time()
+    termos_novos = defaultdict(set)
+    anuncios = [a for a in alterados.values() if a is not None]
+    for parcial in indexar_chunks(gerar_chunks(anuncios, chunk_size), processos):
+        for id_anuncio, termos in termos_por_anuncio(parcial).items():
+            termos_novos[id_anuncio] = termos
+
+    adicionar, remover = defaultdict(set), defaultdict(set)
+    contagem = {'novos': 0, 'alterados': 0, 'removidos': 0, 'inalterados': 0}
+    mudancas_direto = []
+    for id_anuncio, anuncio in alterados.items():
+        antigos = direto.get(id_anuncio)
+        novos = termos_novos.get(id_anuncio, set()) if anuncio is not None else None
+        if novos == antigos or (novos is None and antigos is None):
+            contagem['inalterados'] += 1
+            continue
+        if anuncio is None:
+            contagem['removidos'] += 1
+        elif antigos is None:
+            contagem['novos'] += 1
+        else:
+            contagem['alterados'] += 1
+        for termo in (antigos or set()) - (novos or set()):
+            remover[termo].add(id_anuncio)
+        for termo in (novos or set()) - (antigos or set()):
+            adicionar[termo].add(id_anuncio)
+        mudancas_direto.append((id_anuncio, novos))
+    tempo_indexacao = time.time() - inicio
+
+    # Fase 3: aplica a diferença no índice invertido e no índice direto
+    # O índice é lido e regravado termo a termo (memória limitada ao maior termo mais a diferença)
+    inicio = time.time()
+    colunas = None
+    if caminho_colunas and os.path.exists(caminho_colunas):
+        # Colunas numéricas: valores de preço/km/ano podem mudar sem alterar as faixas
+        colunas = IndiceNumerico.carregar(caminho_colunas)
+        colunas.atualizar(alterados)
+        colunas.salvar(caminho_colunas)
+    if mudancas_direto:
+        diretorio_tmp = tempfile.mkdtemp(prefix='delta_', dir=os.path.dirname(caminho_indice))
+        try:
+            termos = aplicar_diferenca(ler_indice(caminho_indice), adicionar, remover)
+            # O índice de bitmaps usa os doc-ids das colunas e é regravado junto, pelos postings em disco
+            postings = PostingsEmDisco(diretorio_tmp) if colunas is not None and caminho_bitmap else None
+            if postings:
+                termos = ((termo, postings.guardar(termo, [colunas.doc_por_id[i] for i in ids]) or ids) for termo, ids in termos)
+            total_termos = escrever_termos(termos, caminho_indice)
+            if postings:
+                IndiceBitmap.construir_em_disco(postings.pares(), colunas.ids, diretorio_tmp).salvar(caminho_bitmap)
+        finally:
+            shutil.rmtree(diretorio_tmp, ignore_errors=True)
+        # Índice direto também é append-only, com o mesmo marcador de remoção do log
+        with open(caminho_direto, 'a', encoding='utf-8') as f:
+            for id_anuncio, novos in mudancas_direto:
+                registro = {'id': id_anuncio, 'removido': True} if novos is None else {'id': id_anuncio, 'termos': sorted(novos)}
+                f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    else:
+        total_termos = estado.get('total_termos_indice')
+    for id_anuncio, novos in mudancas_direto:
+        if novos is None:
+            direto.pop(id_anuncio, None)
+        else:
+            direto[id_anuncio] = novos
+    tempo_escrita = time.time() - inicio
+
+    if modo_log:
+        total_anuncios = estado.get('total_anuncios', 0) + contagem['novos'] - contagem['removidos']
+    else:
+        # Índice direto sem redundância após uma releitura completa da fonte
+        total_anuncios = len(direto)
+        caminho_tmp = caminho_direto + '.tmp'
+        with open(caminho_tmp, 'w', encoding='utf-8') as f:
+            for id_anuncio, termos in direto.items():
+                f.write(json.dumps({'id': id_anuncio, 'termos': sorted(termos)}, ensure_ascii=False) + '\n')
+        os.replace(caminho_tmp, caminho_direto)
+
+    novo_estado = estado_do_log(caminho_anuncios, offset, ultimo_id)
+    novo_estado.update({'total_anuncios': total_anuncios, 'total_termos_indice': total_termos})
+    salvar_estado(caminho_estado, novo_estado)
+
+    return {
+        'modo': 'log' if modo_log else 'comparacao_completa',
+        'registros_lidos': len(alterados),
+        **contagem,
+        'total_anuncios': total_anuncios,
+        'total_termos_indice': total_termos,
+        'fases': {
+            'leitura': {'tempo_segundos': round(tempo_leitura, 2), 'memoria_mb': round(uso_memoria_mb(), 2)},
+            'indexacao': {'tempo_segundos': round(tempo_indexacao, 2), 'memoria_mb': round(uso_memoria_mb(), 2)},
+            'escrita_indice': {'tempo_segundos': round(tempo_escrita, 2), 'memoria_mb': round(uso_memoria_mb(), 2)},
+        },
+    }
+
+def compactar_log(caminho_anuncios, caminho_estado):
+    """Compacta o log (não rode junto com o crawler) e leva o estado incremental para o log novo:
+    a próxima atualização continua lendo só o que ainda não foi indexado"""
+    estado = carregar_estado(caminho_estado)
+    indexado = log_indexado(estado, caminho_anuncios)
+    registro = RegistroAnuncios(caminho_anuncios)
+    registro.carregar_ids()
+    mantidas, offset = registro.compactar(estado['offset'] if indexado else None)
+    if indexado:
+        estado.update(estado_do_log(caminho_anuncios, offset, estado.get('ultimo_id')))
+        salvar_estado(caminho_estado, estado)
+    return mantidas
+
+def reconstruir_indice(caminho_anuncios, chunk_size=100, processos=1):
+    """Reconstrução completa, gravando também o índice direto e o estado incremental"""
+    # Offset tirado antes da leitura: o que o crawler gravar depois é relido na próxima atualização
+    offset = os.path.getsize(caminho_anuncios)
+    resultado = construir_indice_streaming(caminho_anuncios, ARQUIVO_INDICE, chunk_size=chunk_size,
+                                           processos=processos, caminho_direto=ARQUIVO_INDICE_DIRETO,
+                                           caminho_colunas=ARQUIVO_COLUNAS, caminho_bitmap=ARQUIVO_INDICE_BITMAP)
+    estado = estado_do_log(caminho_anuncios, offset, None)
+    estado.update({'total_anuncios': resultado['total_anuncios'], 'total_termos_indice': resultado['total_termos_indice']})
+    salvar_estado(ARQUIVO_ESTADO, estado)
+    return resultado
+
+# Consultas booleanas sobre o índice de bitmaps
+def normalizar_termo(termo):
+    """'cambio:automático' -> 'cambio:automat' (mesmo pré-processamento da indexação)"""
+    campo, _, valor = termo.rpartition(':')
+    tokens = obter_preprocessador().tokens_valor(valor)
+    if not tokens:
+        return None
+    return f'{campo}:{tokens[0]}' if campo else tokens[0]
+
+def consultar_indice(expressao, faixas=None, caminho_bitmap=ARQUIVO_INDICE_BITMAP, caminho_colunas=ARQUIVO_COLUNAS):
+    """IDs que satisfazem a expressão booleana e as faixas numéricas (campo -> (mínimo, máximo))"""
+    indice = IndiceBitmap.carregar(caminho_bitmap, normalizar=normalizar_termo)
+    resultado = indice.consultar(expressao) if expressao else indice.universo
+    if faixas:
+        colunas = IndiceNumerico.carregar(caminho_colunas)
+        for campo, (minimo, maximo) in faixas.items():
+            resultado = resultado & Bitmap.de_mascara(colunas.intervalo(campo, minimo, maximo))
+    return indice.ids_do_bitmap(resultado)
+
 # Função principal
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Indexação dos anúncios da OLX')
+    parser.add_argument('--incremental', action='store_true',
+                        help='indexa apenas anúncios novos, alterados ou removidos desde a última execução')
+    parser.add_argument('--compactar', action='store_true',
+                        help='compacta o anuncios.jsonl (com o crawler parado) mantendo a atualização incremental')
+    parser.add_argument('--consulta', metavar='EXPRESSAO',
+                        help="consulta o índice em vez de indexar, ex.: 'marca:honda AND NOT cambio:manual'")
+    for campo in ('preco', 'quilometragem', 'ano'):
+        parser.add_argument(f'--{campo}', nargs=2, type=float, metavar=('MIN', 'MAX'),
+                            help=f'faixa de {campo} na consulta (use nan para deixar um lado aberto)')
+    args = parser.parse_args()
+
+    if args.consulta is not None:
+        faixas = {campo: tuple(None if v != v else v for v in getattr(args, campo))
+                  for campo in ('preco', 'quilometragem', 'ano') if getattr(args, campo)}
+        t0 = time.perf_counter()
+        ids = consultar_indice(args.consulta, faixas)
+        print(f'{len(ids)} anúncios encontrados em {(time.perf_counter() - t0) * 1000:.2f} ms')
+        for id_anuncio in ids[:20]:
+            print(f'  {id_anuncio}')
+        sys.exit(0)
+
+    if args.compactar:
+        mantidas = compactar_log(ARQUIVO_JSONL, ARQUIVO_ESTADO)
+        print(f'Log compactado: {mantidas} registros em {ARQUIVO_JSONL}')
+        sys.exit(0)
+
     print('Iniciando processamento...')
     t0 = time.time()
     mem0 = uso_memoria_mb()
 
-    anuncios = carregar_anuncios()
-    print(f'Total de anúncios carregados: {len(anuncios)}')
-
-    indice = construir_indice_invertido(anuncios, granularidade=GRANULARIDADE, chunk_size=TAMANHO_CHUNK)
+    caminho_anuncios = ARQUIVO_JSONL if os.path.exists(ARQUIVO_JSONL) else ARQUIVO_JSON
+    print(f'Lendo anúncios em streaming de {caminho_anuncios}')
 
-    # Salvar índice invertido
-    with open(ARQUIVO_INDICE, 'w', encoding='utf-8') as f:
-        json.dump(indice, f, ensure_ascii=False, indent=2)
+    resultado = None
+    if args.incremental:
+        resultado = atualizar_indice_incremental(caminho_anuncios, ARQUIVO_INDICE, ARQUIVO_INDICE_DIRETO, ARQUIVO_ESTADO,
+                                                 chunk_size=TAMANHO_CHUNK, processos=PROCESSOS, caminho_colunas=ARQUIVO_COLUNAS,
+                                                 caminho_bitmap=ARQUIVO_INDICE_BITMAP)
+        if resultado is None:
+            print('Estado incremental não encontrado. Fazendo a indexação completa.')
+        else:
+            print(f'Atualização incremental ({resultado["modo"]}): {resultado["novos"]} novos, '
+                  f'{resultado["alterados"]} alterados, {resultado["removidos"]} removidos, '
+                  f'{resultado["inalterados"]} inalterados')
+    if resultado is None:
+        resultado = reconstruir_indice(caminho_anuncios, chunk_size=TAMANHO_CHUNK, processos=PROCESSOS)
 
     t1 = time.time()
     mem1 = uso_memoria_mb()
     tamanho_indice = os.path.getsize(ARQUIVO_INDICE) / 1024  # KB
+    tamanho_bitmap = os.path.getsize(ARQUIVO_INDICE_BITMAP) / 1024 if os.path.exists(ARQUIVO_INDICE_BITMAP) else 0
 
+    print(f'Total de anúncios processados: {resultado["total_anuncios"]}')
     print(f'Processamento concluído em {t1-t0:.2f} segundos.')
-    print(f'Uso de memória: {mem1-mem0:.2f} MB')
-    print(f'Tamanho do índice invertido: {tamanho_indice:.2f} KB')
-    print(f'Granularidade: {GRANULARIDADE}, Chunk: {TAMANHO_CHUNK}')
-    print(f'Total de termos no índice: {len(indice)}')
+    print(f'Uso de memória: {mem1-mem0:.2f} MB (pico: {resultado.get("pico_memoria_mb", mem1):.2f} MB)')
+    print(f'Tamanho do índice invertido: {tamanho_indice:.2f} KB (bitmaps: {tamanho_bitmap:.2f} KB)')
+    print(f'Granularidade: {GRANULARIDADE}, Chunk: {TAMANHO_CHUNK}, Processos: {PROCESSOS}')
+    print(f'Total de termos no índice: {resultado["total_termos_indice"]}')
+    for fase, dados in resultado['fases'].items():
+        print(f'  {fase}: {dados["tempo_segundos"]:.2f} s, {dados["memoria_mb"]:.2f} MB')
 
     # Salvar métricas em arquivo JSON
     ARQUIVO_METRICAS = os.path.join(DIRETORIO_DADOS, 'metricas_processamento.json')
     metricas = {
         'tempo_processamento_segundos': round(t1-t0, 2),
         'uso_memoria_mb': round(mem1-mem0, 2),
+        'pico_memoria_mb': resultado.get('pico_memoria_mb', round(mem1, 2)),
         'tamanho_indice_kb': round(tamanho_indice, 2),
+        'tamanho_indice_bitmap_kb': round(tamanho_bitmap, 2),
         'granularidade': GRANULARIDADE,
         'chunk': TAMANHO_CHUNK,
-        'total_termos_indice': len(indice),
-        'total_anuncios': len(anuncios)
+        'processos': PROCESSOS,
+        'modo': 'incremental' if 'modo' in resultado else 'completo',
+        'total_runs': resultado.get('total_runs', 0),
+        'total_termos_indice': resultado['total_termos_indice'],
+        'total_anuncios': resultado['total_anuncios'],
+        'fases': resultado['fases']
     }
+    for chave in ('novos', 'alterados', 'removidos', 'inalterados'):
+        if chave in resultado:
+            metricas[chave] = resultado[chave]
     with open(ARQUIVO_METRICAS, 'w', encoding='utf-8') as f:
         json.dump(metricas, f, ensure_ascii=False, indent=2)
-    print(f'Métricas salvas em {ARQUIVO_METRICAS}') 
\ No newline at end of file
+    print(f'Métricas salvas em {ARQUIVO_METRICAS}')
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from tqdm import tqdm
+from armazenamento import ArquivoHtml, RegistroAnuncios, ler_membro
+from extracao import ExtratorAnuncios
+
+# Reextração offline: relê as páginas do arquivo de HTML, extrai os dados de novo
+# (ex.: depois de corrigir um seletor) e acrescenta ao log as versões que mudaram, sem nenhuma requisição
+
+DIRETORIO_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DIRETORIO_HTML = os.path.join(DIRETORIO_DADOS, 'html')
+ARQUIVO_JSON = os.path.join(DIRETORIO_DADOS, 'anuncios.json')
+ARQUIVO_JSONL = os.path.join(DIRETORIO_DADOS, 'anuncios.jsonl')
+ARQUIVO_DEBUG = os.path.join(DIRETORIO_DADOS, 'debug_extracao.txt')
+ARQUIVO_METRICAS = os.path.join(DIRETORIO_DADOS, 'metricas_reextracao.json')
+PROCESSOS = os.cpu_count() or 1
+TAMANHO_LOTE = 500  # páginas por tarefa enviada a um processo
+
+# Um extrator por processo (o cache de estratégias vale para todos os lotes do processo)
+_extrator = None
+
+
+def reextrair_lote(caminho_segmento, entradas):
+    """Extrai os anúncios de um lote de entradas de um mesmo segmento (executa no processo filho)"""
+    global _extrator
+    if _extrator is None:
+        _extrator = ExtratorAnuncios()
+    inicio = time.perf_counter()
+    registros, falhas, incompletos = [], [], []
+    estrategias = Counter()
+    with open(caminho_segmento, 'rb') as f:
+        for entrada in entradas:
+            dados_anuncio = {
+                "id": entrada['id'],
+                "url": entrada['url'],
+                "data_extracao": None,
+                "estado": entrada['estado']
+            }
+            try:
+                usadas = _extrator.extrair(ler_membro(f, entrada), dados_anuncio)
+            except Exception as e:
+                falhas.append((entrada['id'], f"erro: {e}"))
+                continue
+            estrategias.update(f"{grupo}.{nome}" for grupo, nome in usadas.items())
+            if not dados_anuncio.get('marca') and not dados_anuncio.get('modelo'):
+                incompletos.append((entrada['id'], "extracao_incompleta"))
+            registros.append(dados_anuncio)
+    return {
+        'pid': os.getpid(),
+        'paginas': len(entradas),
+        'segundos': time.perf_counter() - inicio,
+        'registros': registros,
+        'falhas': falhas,
+        'incompletos': incompletos,
+        'estrategias': estrategias,
+    }
+
+def versoes_atuais(registro):
+    """Última versão de cada anúncio do log e os IDs removidos"""
+    atuais, removidos = {}, set()
+    for anuncio in registro.iterar():
+        id_anuncio = anuncio.get('id')
+        if anuncio.get('removido'):
+            atuais.pop(id_anuncio, None)
+            removidos.add(id_anuncio)
+        else:
+            atuais[id_anuncio] = anuncio
+            removidos.discard(id_anuncio)
+    return atuais, removidos
+
+def registrar_reextraidos(registro, atuais, reextraidos, removidos):
+    """Acrescenta ao log só os anúncios cuja reextração mudou algum campo (a última linha de cada ID vale)
+
+    O log não é reescrito: a indexação incremental continua do offset em que parou e lê só as versões novas.
+    """
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    total = 0
+    for id_anuncio, anuncio in reextraidos.items():
+        if id_anuncio in removidos and id_anuncio not in atuais:
+            continue
+        # Campos que a reextração não trouxe (url/estado de páginas migradas, a data da coleta
+        # da página em vez da data da reextração) vêm da versão anterior do log
+        anterior = atuais.get(id_anuncio, {})
+        for campo, valor in anterior.items():
+            if anuncio.get(campo) is None:
+                anuncio[campo] = valor
+        anuncio['data_extracao'] = anuncio.get('data_extracao') or agora
+        if anuncio != anterior:
+            registro.adicionar(anuncio)
+            total += 1
+    registro.fechar()
+    return total
+
+def reextrair(diretorio_html=DIRETORIO_HTML, caminho_log=ARQUIVO_JSONL, processos=PROCESSOS, tamanho_lote=TAMANHO_LOTE):
+    """Reextrai todas as páginas arquivadas em paralelo e atualiza o log. Retorna as métricas"""
+    inicio = time.perf_counter()
+    # O log antigo (ou o anuncios.json legado) dá a ordem, a data de coleta, url/estado e os anúncios removidos
+    registro = RegistroAnuncios(caminho_log)
+    registro.migrar_json(ARQUIVO_JSON)
+    arquivo = ArquivoHtml(diretorio_html)
+    arquivo.migrar_html_soltos(registro.iterar())
+    tarefas = [
+        (arquivo.caminho_segmento(segmento), entradas[i:i + tamanho_lote])
+        for segmento, entradas in arquivo.por_segmento().items()
+        for i in range(0, len(entradas), tamanho_lote)
+    ]
+    total_paginas = len(arquivo)
+    print(f'{total_paginas} páginas arquivadas em {len(tarefas)} lotes, {processos} processos')
+
+    reextraidos = {}
+    falhas, incompletos = [], []
+    estrategias = Counter()
+    por_processo = defaultdict(lambda: {'paginas': 0, 'segundos': 0.0})
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = [executor.submit(reextrair_lote, caminho, entradas) for caminho, entradas in tarefas]
+        with tqdm(total=total_paginas, unit='pág', desc='Reextração') as progresso:
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                for anuncio in resultado['registros']:
+                    reextraidos[anuncio['id']] = anuncio
+                falhas.extend(resultado['falhas'])
+                incompletos.extend(resultado['incompletos'])
+                estrategias.update(resultado['estrategias'])
+                processo = por_processo[resultado['pid']]
+                processo['paginas'] += resultado['paginas']
+                processo['segundos'] += resultado['segundos']
+                progresso.update(resultado['paginas'])
+                progresso.set_postfix(falhas=len(falhas), incompletos=len(incompletos))
+    tempo_extracao = time.perf_counter() - inicio
+
+    atuais, removidos = versoes_atuais(registro)
+    # Ordem estável (a do índice do arquivo), independente da ordem em que os lotes terminaram
+    reextraidos = {id_anuncio: reextraidos[id_anuncio] for id_anuncio in arquivo.entradas if id_anuncio in reextraidos}
+    total_atualizados = registrar_reextraidos(registro, atuais, reextraidos, removidos)
+
+    if falhas or incompletos:
+        with open(ARQUIVO_DEBUG, 'a', encoding='utf-8') as f:
+            for id_anuncio, motivo in falhas + incompletos:
+                f.write(f"{id_anuncio}\t{motivo}\n")
+
+    tempo_total = time.perf_counter() - inicio
+    return {
+        'total_paginas': total_paginas,
+        'total_reextraidos': len(reextraidos),
+        'total_atualizados': total_atualizados,
+        'falhas': len(falhas),
+        'incompletos': len(incompletos),
+        'processos': processos,
+        'tamanho_lote': tamanho_lote,
+        'tempo_extracao_segundos': round(tempo_extracao, 2),
+        'tempo_total_segundos': round(tempo_total, 2),
+        'paginas_por_segundo': round(total_paginas / tempo_extracao, 1) if tempo_extracao else 0,
+        'por_processo': {
+            str(pid): {
+                'paginas': dados['paginas'],
+                'segundos': round(dados['segundos'], 2),
+                'paginas_por_segundo': round(dados['paginas'] / dados['segundos'], 1) if dados['segundos'] else 0,
+            }
+            for pid, dados in por_processo.items()
+        },
+        'estrategias': dict(estrategias.most_common()),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reextrai os anúncios a partir do HTML arquivado (não rode junto com o crawler)')
+    parser.add_argument('--processos', type=int, default=PROCESSOS, help='processos de extração')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='páginas por tarefa')
+    args = parser.parse_args()
+
+    metricas = reextrair(processos=max(1, args.processos), tamanho_lote=max(1, args.lote))
+
+    print(f'Páginas reextraídas: {metricas["total_reextraidos"]} de {metricas["total_paginas"]} '
+          f'({metricas["paginas_por_segundo"]} páginas/s)')
+    print(f'Falhas: {metricas["falhas"]}, extrações incompletas: {metricas["incompletos"]}')
+    print(f'{metricas["total_atualizados"]} anúncios mudaram e foram acrescentados ao log '
+          f'em {metricas["tempo_total_segundos"]:.2f} segundos.')
+    for pid, dados in metricas['por_processo'].items():
+        print(f'  processo {pid}: {dados["paginas"]} páginas, {dados["paginas_por_segundo"]} páginas/s')
+    for estrategia, quantidade in metricas['estrategias'].items():
+        print(f'  {estrategia}: {quantidade}')
+
+    with open(ARQUIVO_METRICAS, 'w', encoding='utf-8') as f:
+        json.dump(metricas, f, ensure_ascii=False, indent=2)
+    print(f'Métricas salvas em {ARQUIVO_METRICAS}')
@@ -0,0 +1,152 @@
+import json
+import time
+import heapq
+import hashlib
+import threading
+from datetime import datetime
+from armazenamento import RegistroAnuncios
+
+# Intervalo de revisita: base ajustada pela idade do anúncio e pela taxa de mudança observada
+INTERVALO_BASE_HORAS = 24
+INTERVALO_MINIMO_HORAS = 6
+INTERVALO_MAXIMO_HORAS = 14 * 24
+DIAS_ENVELHECIMENTO = 30  # a cada 30 dias de idade o intervalo base dobra
+# Campos que mudam a cada coleta e não entram na impressão do conteúdo
+CAMPOS_FORA_DA_IMPRESSAO = ('data_extracao', 'estado')
+FORMATO_DATA = "%Y-%m-%d %H:%M:%S"
+
+
+def impressao_anuncio(dados_anuncio):
+    """Hash dos dados extraídos do anúncio, para saber se a página mudou de fato"""
+    campos = {chave: valor for chave, valor in dados_anuncio.items() if chave not in CAMPOS_FORA_DA_IMPRESSAO}
+    return hashlib.sha1(json.dumps(campos, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def intervalo_revisita(registro, agora):
+    """Segundos até a próxima visita: anúncios novos e que mudam com frequência voltam antes"""
+    idade_dias = max(0.0, (agora - registro['primeira_coleta']) / 86400)
+    taxa_mudanca = (registro['mudancas'] + 0.5) / (registro['visitas'] + 1)
+    horas = INTERVALO_BASE_HORAS * (1 + idade_dias / DIAS_ENVELHECIMENTO) * 0.5 / taxa_mudanca
+    return min(INTERVALO_MAXIMO_HORAS, max(INTERVALO_MINIMO_HORAS, horas)) * 3600
+
+def _timestamp(data):
+    try:
+        return datetime.strptime(data, FORMATO_DATA).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class AgendaRevalidacao:
+    """Validadores HTTP (ETag/Last-Modified), impressão e histórico de preço de cada anúncio, com a agenda de revisitas"""
+
+    def __init__(self, caminho):
+        # Mesmo formato do log de anúncios: uma linha por atualização, a última de cada ID vale
+        self.log = RegistroAnuncios(caminho)
+        self.registros = {}
+        self.trava = threading.Lock()
+        for registro in self.log.iterar():
+            if registro.get('removido'):
+                self.registros.pop(registro['id'], None)
+            else:
+                self.registros[registro['id']] = registro
+        self.log.carregar_ids()
+
+    def _gravar(self, registro):
+        self.registros[registro['id']] = registro
+        self.log.adicionar(registro)
+
+    def _novo_registro(self, id_anuncio, url, anuncio, primeira_coleta):
+        return {
+            'id': id_anuncio, 'url': url, 'estado': anuncio.get('estado'),
+            'etag': None, 'last_modified': None, 'impressao': impressao_anuncio(anuncio),
+            'primeira_coleta': primeira_coleta, 'ultima_visita': primeira_coleta,
+            'visitas': 0, 'mudancas': 0, 'precos': [],
+        }
+
+    def _agendar(self, registro, agora, preco=None):
+        if preco and (not registro['precos'] or registro['precos'][-1][1] != preco):
+            registro['precos'].append([datetime.fromtimestamp(agora).strftime(FORMATO_DATA), preco])
+        registro['ultima_visita'] = agora
+        registro['proxima_visita'] = agora + intervalo_revisita(registro, agora)
+        self._gravar(registro)
+
+    def semear(self, anuncios):
+        """Agenda os anúncios do log que ainda não têm estado de revalidação (coletados antes desse modo)"""
+        vigentes = {}
+        for anuncio in anuncios:
+            id_anuncio = anuncio.get('id')
+            if anuncio.get('removido'):
+                vigentes.pop(id_anuncio, None)
+            elif id_anuncio and anuncio.get('url'):
+                vigentes[id_anuncio] = anuncio
+        novos = 0
+        with self.trava:
+            for id_anuncio, anuncio in vigentes.items():
+                if id_anuncio in self.registros:
+                    continue
+                coleta = _timestamp(anuncio.get('data_extracao'))
+                registro = self._novo_registro(id_anuncio, anuncio['url'], anuncio, coleta)
+                self._agendar(registro, coleta, anuncio.get('preco'))
+                novos += 1
+        return novos
+
+    def registrar_coleta(self, id_anuncio, url, dados_anuncio, etag=None, last_modified=None, agora=None):
+        """Registra uma resposta 200 do anúncio. Retorna True se o conteúdo é novo ou mudou"""
+        agora = agora or time.time()
+        impressao = impressao_anuncio(dados_anuncio)
+        with self.trava:
+            registro = self.registros.get(id_anuncio)
+            if registro is None:
+                registro = self._novo_registro(id_anuncio, url, dados_anuncio, agora)
+                mudou = True
+            else:
+                registro = dict(registro, precos=list(registro['precos']))
+                mudou = registro['impressao'] != impressao
+                registro['visitas'] += 1
+                registro['mudancas'] += int(mudou)
+            registro.update(url=url, etag=etag, last_modified=last_modified, impressao=impressao,
+                            estado=dados_anuncio.get('estado') or registro.get('estado'))
+            self._agendar(registro, agora, dados_anuncio.get('preco'))
+        return mudou
+
+    def registrar_nao_modificado(self, id_anuncio, agora=None):
+        """Registra uma resposta 304 (ou 200 sem mudança de conteúdo já tratada pelo chamador)"""
+        with self.trava:
+            registro = self.registros.get(id_anuncio)
+            if registro is not None:
+                registro = dict(registro, visitas=registro['visitas'] + 1)
+                self._agendar(registro, agora or time.time())
+
+    def remover(self, id_anuncio):
+        """O anúncio saiu da OLX (404/410): deixa de ser revisitado"""
+        with self.trava:
+            if self.registros.pop(id_anuncio, None) is not None:
+                self.log.remover(id_anuncio)
+
+    def cabecalhos_condicionais(self, id_anuncio):
+        registro = self.registros.get(id_anuncio) or {}
+        cabecalhos = {}
+        if registro.get('etag'):
+            cabecalhos['If-None-Match'] = registro['etag']
+        if registro.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = registro['last_modified']
+        return cabecalhos
+
+    def vencidos(self, limite, agora=None):
+        """Até `limite` anúncios com revisita vencida, os mais atrasados (em relação ao próprio intervalo) primeiro"""
+        agora = agora or time.time()
+        with self.trava:
+            vencidos = [r for r in self.registros.values() if r['proxima_visita'] <= agora]
+        prioridade = lambda r: (agora - r['proxima_visita']) / max(1.0, r['proxima_visita'] - r['ultima_visita'])
+        return [(r['id'], r['url']) for r in heapq.nlargest(limite, vencidos, key=prioridade)]
+
+    def historico_precos(self, id_anuncio):
+        registro = self.registros.get(id_anuncio)
+        return list(registro['precos']) if registro else []
+
+    def fechar(self):
+        if self.log.precisa_compactar():
+            self.log.compactar()
+        self.log.fechar()
+
+    def __len__(self):
+        return len(self.registros)
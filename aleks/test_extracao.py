@@ -0,0 +1,62 @@
+from extracao import ExtratorAnuncios
+
+# Página com o container de preço e, antes dele, um texto de financiamento que a varredura pegaria
+PAGINA_COM_CONTAINER = '''<html><body>
+<p>Financie a partir de R$ 999</p>
+<div id="price-box-container"><span class="olx-text--title-large">R$ 45.000</span></div>
+<div id="details">
+  <div class="ad__sc-2h9gkk-0 dLQbjb"><span data-variant="overline">Marca</span><a class="olx-link">FIAT</a></div>
+  <div class="ad__sc-2h9gkk-0 dLQbjb"><span data-variant="overline">Ano</span><a class="olx-link">2019</a></div>
+  <div class="ad__sc-2h9gkk-0 dLQbjb"><span data-variant="overline">Câmbio</span><a class="olx-link">Manual</a></div>
+</div>
+<div data-testid="ad-properties"><div data-testid="ad-properties-item">
+  <span class="olx-text--caption">Marca</span><span class="olx-text--body">FIAT</span>
+</div></div>
+</body></html>'''
+
+# Página sem o container de preço nem a seção principal de detalhes
+PAGINA_SEM_CONTAINER = '''<html><body>
+<p>Vendo carro por R$ 30.000</p>
+<div data-testid="ad-properties"><div data-testid="ad-properties-item">
+  <span class="olx-text--caption">Marca</span><span class="olx-text--body">FORD</span>
+</div></div>
+</body></html>'''
+
+
+def extrair(extrator, html):
+    dados = {}
+    usadas = extrator.extrair(html, dados)
+    return dados, usadas
+
+
+def test_container_de_preco_em_extrator_novo():
+    dados, usadas = extrair(ExtratorAnuncios(), PAGINA_COM_CONTAINER)
+    assert dados['preco'] == 'R$ 45.000'
+    assert usadas['preco'] == 'container'
+
+
+def test_varredura_nao_passa_na_frente_do_container():
+    extrator = ExtratorAnuncios()
+    dados, usadas = extrair(extrator, PAGINA_SEM_CONTAINER)
+    assert usadas == {'detalhes': 'alternativo_2', 'preco': 'varredura'}
+    assert dados['preco'] == 'R$ 30.000'
+
+    dados, usadas = extrair(extrator, PAGINA_COM_CONTAINER)
+    assert dados['preco'] == 'R$ 45.000'
+    assert usadas['preco'] == 'container'
+
+
+def test_detalhes_alternativos_nao_passam_na_frente_da_secao_principal():
+    extrator = ExtratorAnuncios()
+    extrair(extrator, PAGINA_SEM_CONTAINER)
+
+    dados, usadas = extrair(extrator, PAGINA_COM_CONTAINER)
+    assert usadas['detalhes'] == 'principal'
+    assert (dados['marca'], dados['ano'], dados['cambio']) == ('FIAT', '2019', 'Manual')
+
+
+def test_reordena_dentro_do_mesmo_nivel():
+    extrator = ExtratorAnuncios()
+    extrair(extrator, PAGINA_SEM_CONTAINER)
+    assert extrator.ordem['detalhes'] == [['principal'], ['alternativo_2', 'alternativo_1']]
+    assert extrator.ordem['preco'] == [['container'], ['alternativo'], ['varredura']]